@@ -9,11 +9,14 @@ from tna_frontend_jinja.wtforms.helpers import WTFormsHelpers
 from werkzeug.utils import import_string
 
 from app.lib.cache import cache
+from app.lib.content import configure_content
 from app.lib.context_processor import cookie_preference, now_iso_8601
 from app.lib.db.models import db
 from app.lib.talisman import talisman
+from app.lib.template_cache import init_template_bytecode_cache, warm_up_templates
 from app.lib.template_filters import (
     convert_pence_to_pounds_string,
+    format_date,
     format_standard_printed_order_price,
     inject_unique_survey_link,
     parse_bold_text,
@@ -79,6 +82,8 @@ def create_app(config_class):
 
     WTFormsHelpers(app)
 
+    configure_content(auto_reload=app.config.get("CONTENT_AUTO_RELOAD"))
+
     app.jinja_env.trim_blocks = True
     app.jinja_env.lstrip_blocks = True
     app.jinja_env.loader = ChoiceLoader(
@@ -87,6 +92,7 @@ def create_app(config_class):
             PackageLoader("tna_frontend_jinja"),
         ]
     )
+    init_template_bytecode_cache(app)
 
     app.add_template_filter(slugify)
     app.add_template_filter(parse_markdown_links)
@@ -94,6 +100,7 @@ def create_app(config_class):
     app.add_template_filter(parse_first_birth_year_for_closed_records)
     app.add_template_filter(format_standard_printed_order_price)
     app.add_template_filter(convert_pence_to_pounds_string)
+    app.add_template_filter(format_date)
     app.add_template_filter(inject_unique_survey_link)
     app.add_template_filter(prepare_page_title)
     app.add_template_filter(prepare_page_type_for_analytics_meta_tag)
@@ -128,4 +135,7 @@ def create_app(config_class):
 
     db.init_app(app)
 
+    if app.config.get("TEMPLATE_WARM_UP"):
+        warm_up_templates(app)
+
     return app
@@ -1,5 +1,13 @@
 from enum import Enum
 
+# How dates are shown to users and in requests sent to Dynamics
+DATE_FORMAT = "%d %B %Y"
+
+# The file types and size accepted for a proof of death, whether it is uploaded
+# through the app or straight to S3
+PROOF_OF_DEATH_EXTENSIONS = ["pdf", "jpg", "jpeg", "png", "gif"]
+PROOF_OF_DEATH_MAX_SIZE = 5 * 1024 * 1024
+
 
 class MultiPageFormRoutes(Enum):
     JOURNEY_START = "main.start"
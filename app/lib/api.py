@@ -1,5 +1,7 @@
 from flask import current_app
-from requests import JSONDecodeError, Timeout, TooManyRedirects, codes, get
+from requests import JSONDecodeError, Timeout, TooManyRedirects, codes
+
+from app.lib import http_client
 
 
 class ResourceNotFound(Exception):
@@ -11,6 +13,7 @@ class ResourceForbidden(Exception):
 
 
 class JSONAPIClient:
+    upstream = ""
     api_url = ""
     params = {}
     headers = {}
@@ -29,7 +32,8 @@ class JSONAPIClient:
     def get(self, path="/"):
         url = f"{self.api_url}/{path.lstrip('/')}"
         try:
-            response = get(
+            response = http_client.get(
+                self.upstream,
                 url,
                 params=self.params,
                 headers=self.headers,
@@ -1,12 +1,21 @@
-import io
 import mimetypes
 import os
+import threading
+import time
+import tracemalloc
 import uuid
+from contextlib import contextmanager
+from typing import Iterator
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from flask import current_app
 from werkzeug.datastructures.file_storage import FileStorage
 
+from app.constants import PROOF_OF_DEATH_EXTENSIONS, PROOF_OF_DEATH_MAX_SIZE
+from app.lib.fake_aws import FAKE_CREDENTIALS, get_fake_aws_backend
+
 
 def get_boto3_session() -> boto3.session.Session:
     """
@@ -17,16 +26,95 @@ def get_boto3_session() -> boto3.session.Session:
     return boto3.session.Session(region_name=region)
 
 
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    # Clients hold pooled connections, which can't be shared with a forked
+    # worker, so each process creates its own
+    global _clients_lock
+    _clients.clear()
+    _clients_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_client(service_name: str):
+    """
+    Get this process's client for an AWS service, creating it the first time.
+    Clients are thread-safe, so one is shared by every request and thread,
+    which saves loading the service model and resolving credentials each call.
+
+    With AWS_BACKEND set to "fake", the client's requests are answered by the
+    in-process fake in app.lib.fake_aws instead of AWS.
+    """
+    config = current_app.config
+    settings = (
+        config.get("AWS_DEFAULT_REGION", "eu-west-2"),
+        config.get("AWS_MAX_POOL_CONNECTIONS"),
+        config.get("AWS_RETRY_MODE"),
+        config.get("AWS_MAX_ATTEMPTS"),
+        config.get("AWS_BACKEND"),
+        config.get("FAKE_AWS_DIR"),
+        config.get("FAKE_AWS_LATENCY"),
+        config.get("FAKE_AWS_ERROR_RATE"),
+    )
+    key = (service_name, settings)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                _, max_pool_connections, retry_mode, max_attempts, backend, *fake = (
+                    settings
+                )
+                client = get_boto3_session().client(
+                    service_name,
+                    config=Config(
+                        max_pool_connections=max_pool_connections,
+                        retries={
+                            "mode": retry_mode,
+                            "total_max_attempts": max_attempts,
+                        },
+                    ),
+                    **(FAKE_CREDENTIALS if backend == "fake" else {}),
+                )
+                if backend == "fake":
+                    client.meta.events.register(
+                        "before-send", get_fake_aws_backend(*fake)
+                    )
+                _clients[key] = client
+    return client
+
+
+def _skip_aws() -> bool:
+    """Tests don't call AWS, unless they are using the fake backend."""
+    return (
+        current_app.config.get("ENVIRONMENT_NAME") == "test"
+        and current_app.config.get("AWS_BACKEND") != "fake"
+    )
+
+
+def new_proof_of_death_key(original_filename: str) -> str:
+    """
+    A key in the holding prefix for a proof of death, with a UUID as the filename
+    and the original file's extension.
+    """
+    return _build_key_with_prefix(
+        _get_proof_of_death_holding_prefix(), str(uuid.uuid4()), original_filename
+    )
+
+
 def upload_proof_of_death(file: FileStorage) -> str | None:
     """
     Function that uploads a proof of death file to S3, with a UUID as the filename.
     """
 
-    base_filename = str(uuid.uuid4())
-    holding_prefix = _get_proof_of_death_holding_prefix()
-    key_name = _build_key_with_prefix(holding_prefix, base_filename, file.filename)
+    key_name = new_proof_of_death_key(file.filename)
 
-    if current_app.config.get("ENVIRONMENT_NAME") == "test":
+    if _skip_aws():
         return key_name
 
     bucket_name = current_app.config.get("PROOF_OF_DEATH_BUCKET_NAME")
@@ -42,26 +130,222 @@ def upload_proof_of_death(file: FileStorage) -> str | None:
     )
 
 
+def upload_spooled_proof_of_death(spool_path: str, key_name: str) -> bool:
+    """
+    Upload a proof of death which was saved to disk to be uploaded in the
+    background. This makes one attempt, and errors are raised for the
+    background job to record and retry.
+    """
+    if _skip_aws():
+        return True
+
+    bucket_name = current_app.config.get("PROOF_OF_DEATH_BUCKET_NAME")
+
+    if not bucket_name:
+        current_app.logger.error("Proof of death bucket configuration is missing.")
+        return False
+
+    content_type, _ = mimetypes.guess_type(key_name)
+    with open(spool_path, "rb") as stream, _log_peak_memory(key_name):
+        get_client("s3").upload_fileobj(
+            stream,
+            bucket_name,
+            key_name,
+            ExtraArgs={"ContentType": content_type or "application/octet-stream"},
+            Config=_transfer_config(),
+        )
+    return True
+
+
+def create_proof_of_death_upload(success_action_redirect: str) -> dict | None:
+    """
+    Create a presigned POST for the browser to upload a proof of death straight
+    to S3, under a prefix of its own in the holding prefix.
+
+    The policy only accepts a file of up to the size the upload form allows,
+    saved under that prefix, and has S3 redirect the browser back to
+    `success_action_redirect` with the key the file was saved as. A POST policy
+    can't limit the file to a list of types, so the type is checked by
+    verify_proof_of_death_upload afterwards.
+
+    Returns the URL and fields for the upload form, and the key prefix.
+    """
+    holding_prefix = _normalize_prefix(_get_proof_of_death_holding_prefix())
+    key_prefix = f"{holding_prefix}{uuid.uuid4()}/"
+    fields = {"success_action_redirect": success_action_redirect}
+
+    if _skip_aws():
+        fields["key"] = f"{key_prefix}${{filename}}"
+        return {"url": "", "fields": fields, "key_prefix": key_prefix}
+
+    bucket_name = current_app.config.get("PROOF_OF_DEATH_BUCKET_NAME")
+
+    if not bucket_name:
+        current_app.logger.error("Proof of death bucket configuration is missing.")
+        return None
+
+    try:
+        # A key ending ${filename} is only allowed to start with key_prefix
+        post = get_client("s3").generate_presigned_post(
+            Bucket=bucket_name,
+            Key=f"{key_prefix}${{filename}}",
+            Fields=fields,
+            Conditions=[
+                {"success_action_redirect": success_action_redirect},
+                ["content-length-range", 1, PROOF_OF_DEATH_MAX_SIZE],
+            ],
+            ExpiresIn=current_app.config.get("PROOF_OF_DEATH_UPLOAD_EXPIRY"),
+        )
+    except Exception as e:
+        current_app.logger.error(f"Error creating proof of death upload: {e}")
+        return None
+    return {**post, "key_prefix": key_prefix}
+
+
+def verify_proof_of_death_upload(key_name: str) -> str | None:
+    """
+    Check a proof of death the browser uploaded straight to S3 is an allowed
+    type and size, then move it to a UUID filename in the holding prefix, the
+    same as a file uploaded through the app. Files which fail the checks are
+    deleted.
+
+    Returns the key the file was moved to, or None if it can't be used.
+    """
+    holding_prefix = _normalize_prefix(_get_proof_of_death_holding_prefix())
+    upload_id, _, filename = key_name.removeprefix(holding_prefix).partition("/")
+    extension = os.path.splitext(filename)[1].lower()
+
+    if (
+        not key_name.startswith(holding_prefix)
+        or not upload_id
+        or extension.lstrip(".") not in PROOF_OF_DEATH_EXTENSIONS
+    ):
+        current_app.logger.error(
+            f"Proof of death upload {key_name} is not an allowed file type."
+        )
+        return None
+
+    destination_key = f"{holding_prefix}{upload_id}{extension}"
+
+    if _skip_aws():
+        return destination_key
+
+    bucket_name = current_app.config.get("PROOF_OF_DEATH_BUCKET_NAME")
+
+    if not bucket_name:
+        current_app.logger.error("Proof of death bucket configuration is missing.")
+        return None
+
+    s3 = get_client("s3")
+
+    try:
+        size = s3.head_object(Bucket=bucket_name, Key=key_name)["ContentLength"]
+        if not 0 < size <= PROOF_OF_DEATH_MAX_SIZE:
+            current_app.logger.error(
+                f"Proof of death upload {key_name} is {size} bytes, which is not allowed."
+            )
+            s3.delete_object(Bucket=bucket_name, Key=key_name)
+            return None
+
+        content_type, _ = mimetypes.guess_type(destination_key)
+        s3.copy_object(
+            Bucket=bucket_name,
+            Key=destination_key,
+            CopySource={"Bucket": bucket_name, "Key": key_name},
+            ContentType=content_type or "application/octet-stream",
+            MetadataDirective="REPLACE",
+        )
+        s3.delete_object(Bucket=bucket_name, Key=key_name)
+        return destination_key
+    except Exception as e:
+        current_app.logger.error(
+            f"Error verifying proof of death upload {key_name}: {e}"
+        )
+        return None
+
+
+class _UnclosableStream:
+    """
+    Pass a stream to boto3 without letting it close it when the upload ends,
+    so that it can be read again from the start if the upload is retried.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def close(self) -> None:
+        pass
+
+
+def _stream_size(stream) -> int:
+    start = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell() - start
+    stream.seek(start)
+    return size
+
+
+def _transfer_config() -> TransferConfig:
+    """Uploads larger than S3_MULTIPART_THRESHOLD are sent in parts, several at once."""
+    return TransferConfig(
+        multipart_threshold=current_app.config.get("S3_MULTIPART_THRESHOLD"),
+        multipart_chunksize=current_app.config.get("S3_MULTIPART_CHUNKSIZE"),
+        max_concurrency=current_app.config.get("S3_MAX_CONCURRENCY"),
+    )
+
+
+@contextmanager
+def _log_peak_memory(description: str):
+    """
+    Log how much memory was allocated at most while uploading, when
+    S3_UPLOAD_TRACK_MEMORY is set. tracemalloc traces the whole process and
+    slows it down, so this is for diagnosing memory use rather than for leaving on.
+    """
+    if not current_app.config.get("S3_UPLOAD_TRACK_MEMORY"):
+        yield
+        return
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        if started:
+            tracemalloc.stop()
+        current_app.logger.info(
+            f"Uploaded {description} in {(time.perf_counter() - start) * 1000:.0f}ms, "
+            f"peak memory {(peak - baseline) / 1024:.0f}KB"
+        )
+
+
 def upload_file_to_s3(
     file: FileStorage, bucket_name: str, filename_override: str | None = None
 ) -> str | None:
     """
     Generic function that takes a file and uploads it to a given S3 bucket.
 
-    We read the file into a variable so that we can check if it's empty, and also to allow for retries
-    otherwise the file gets closed and we can't re-read it.
+    The file is streamed from the request's spooled file rather than read into
+    memory, and is read again from the start for each retry.
 
     Returns file name for use in other parts of application.
     """
     if file:
-        data = file.read()
+        stream = file.stream
+        start = stream.tell()
+        size = _stream_size(stream)
 
-        if not data:
+        if not size:
             current_app.logger.error("File is empty, cannot upload to S3.")
             return None
 
-        session = get_boto3_session()
-        s3 = session.client("s3")
+        s3 = get_client("s3")
 
         filename = file.filename
 
@@ -69,16 +353,19 @@ def upload_file_to_s3(
             filename = _build_filename_with_extension(filename_override, file.filename)
 
         content_type = _determine_content_type(file, filename)
+        transfer_config = _transfer_config()
 
         for attempt in range(1, current_app.config["MAX_UPLOAD_ATTEMPTS"] + 1):
-            stream = io.BytesIO(data)
+            stream.seek(start)
             try:
-                s3.upload_fileobj(
-                    stream,
-                    bucket_name,
-                    filename,
-                    ExtraArgs={"ContentType": content_type},
-                )
+                with _log_peak_memory(f"{filename} ({size} bytes)"):
+                    s3.upload_fileobj(
+                        _UnclosableStream(stream),
+                        bucket_name,
+                        filename,
+                        ExtraArgs={"ContentType": content_type},
+                        Config=transfer_config,
+                    )
                 return filename
             except Exception as e:
                 current_app.logger.error(
@@ -100,7 +387,7 @@ def move_proof_of_death_to_submitted(key_name: str) -> bool:
     if not key_name:
         return False
 
-    if current_app.config.get("ENVIRONMENT_NAME") == "test":
+    if _skip_aws():
         return True
 
     bucket_name = current_app.config.get("PROOF_OF_DEATH_BUCKET_NAME")
@@ -110,13 +397,7 @@ def move_proof_of_death_to_submitted(key_name: str) -> bool:
         return False
 
     holding_prefix = _get_proof_of_death_holding_prefix()
-    submitted_prefix = _get_proof_of_death_submitted_prefix()
-
-    destination_key = _to_submitted_key(
-        key_name,
-        holding_prefix=holding_prefix,
-        submitted_prefix=submitted_prefix,
-    )
+    destination_key = proof_of_death_submitted_key(key_name)
 
     normalized_holding = _normalize_prefix(holding_prefix)
     source_key = key_name
@@ -126,8 +407,7 @@ def move_proof_of_death_to_submitted(key_name: str) -> bool:
     if destination_key == source_key:
         return True
 
-    session = get_boto3_session()
-    s3 = session.client("s3")
+    s3 = get_client("s3")
 
     try:
         s3.copy_object(
@@ -144,6 +424,56 @@ def move_proof_of_death_to_submitted(key_name: str) -> bool:
         return False
 
 
+def proof_of_death_holding_prefix() -> str:
+    return _normalize_prefix(_get_proof_of_death_holding_prefix())
+
+
+def proof_of_death_submitted_key(key_name: str) -> str:
+    """The key a proof of death in the holding prefix is moved to when its request is paid."""
+    return _to_submitted_key(
+        key_name,
+        holding_prefix=_get_proof_of_death_holding_prefix(),
+        submitted_prefix=_get_proof_of_death_submitted_prefix(),
+    )
+
+
+# The most keys DeleteObjects accepts at once
+S3_DELETE_OBJECTS_LIMIT = 1000
+
+
+def list_s3_objects(bucket_name: str, prefix: str) -> Iterator[list[dict]]:
+    """List the objects under a prefix a page of up to 1000 at a time."""
+    paginator = get_client("s3").get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        yield page.get("Contents", [])
+
+
+def delete_s3_objects(bucket_name: str, keys: list[str]) -> list[str]:
+    """
+    Delete objects with as few DeleteObjects calls as possible.
+    Returns the keys which couldn't be deleted.
+    """
+    s3 = get_client("s3")
+    failed = []
+    for start in range(0, len(keys), S3_DELETE_OBJECTS_LIMIT):
+        batch = keys[start : start + S3_DELETE_OBJECTS_LIMIT]
+        try:
+            response = s3.delete_objects(
+                Bucket=bucket_name,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+        except Exception as e:
+            current_app.logger.error(f"Error deleting {len(batch)} objects: {e}")
+            failed.extend(batch)
+            continue
+        for error in response.get("Errors", []):
+            current_app.logger.error(
+                f"Error deleting {error['Key']}: {error.get('Message')}"
+            )
+            failed.append(error["Key"])
+    return failed
+
+
 def _build_filename_with_extension(base_name: str, original_filename: str) -> str:
     file_extension = os.path.splitext(original_filename)[1]
     existing_extension = os.path.splitext(base_name)[1]
@@ -205,8 +535,7 @@ def send_email(to: str, subject: str, body: str) -> bool:
     Return True if email sent successfully, False otherwise.
     """
 
-    session = get_boto3_session()
-    ses = session.client("ses")
+    ses = get_client("ses")
 
     try:
         ses.send_email(
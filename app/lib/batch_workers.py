@@ -0,0 +1,111 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from flask import current_app
+
+
+def lock_next_batch_query(query, limit: int):
+    """
+    Limit a query to `limit` rows, skipping rows another worker has locked and
+    locking the rest until the transaction ends.
+
+    On SQLite, which has no row locks, FOR UPDATE SKIP LOCKED is left out and
+    callers rely on conditional updates to avoid processing a row twice.
+    """
+    return query.with_for_update(skip_locked=True).limit(limit)
+
+
+def lock_next_batch(query, limit: int) -> list:
+    return lock_next_batch_query(query, limit).all()
+
+
+class RateLimiter:
+    """Space out calls from any number of threads to no more than `rate` a second."""
+
+    def __init__(self, rate: float | None):
+        self.interval = 1 / rate if rate else 0
+        self._next_call = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self, count: int = 1) -> float:
+        """Wait until `count` more calls can be made. Returns how long it waited."""
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            call_at = max(now, self._next_call)
+            self._next_call = call_at + self.interval * count
+        time.sleep(call_at - now)
+        return call_at - now
+
+
+class RedisTokenBucket:
+    """
+    Keep calls from any number of threads, processes and hosts sharing a Redis
+    key to no more than `rate` a second on average.
+
+    The bucket holds up to a second's worth of calls. Calls can take more
+    tokens than it holds, leaving it in debt, and the caller waits until the
+    debt would have been paid off, so a caller which overdraws waits its turn
+    rather than being retried.
+    """
+
+    # Uses the Redis server's clock so every caller agrees on the time. Redis
+    # truncates numbers returned from scripts to integers, so the wait is
+    # returned as a string
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local count = tonumber(ARGV[2])
+    local clock = redis.call("TIME")
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local state = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+    local tokens = tonumber(state[1]) or rate
+    local updated_at = tonumber(state[2]) or now
+    tokens = math.min(rate, tokens + math.max(0, now - updated_at) * rate) - count
+    redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated_at", tostring(now))
+    local wait = math.max(0, -tokens / rate)
+    redis.call("EXPIRE", KEYS[1], math.ceil(wait) + 60)
+    return tostring(wait)
+    """
+
+    def __init__(self, redis, key: str, rate: float | None):
+        self.rate = rate
+        self.key = key
+        self._take = redis.register_script(self.SCRIPT)
+
+    def wait(self, count: int = 1) -> float:
+        """Wait until `count` more calls can be made. Returns how long it waited."""
+        if not self.rate:
+            return 0.0
+        delay = float(self._take(keys=[self.key], args=[self.rate, count]))
+        time.sleep(delay)
+        return delay
+
+
+def drain(run_batch: Callable[[], int], concurrency: int = 1) -> int:
+    """
+    Call `run_batch` until it returns 0, from `concurrency` threads each with
+    their own app context and database session. Returns the total of the
+    counts it returned.
+    """
+    if concurrency <= 1:
+        return _drain(run_batch)
+
+    app = current_app._get_current_object()
+
+    def worker() -> int:
+        with app.app_context():
+            return _drain(run_batch)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(worker) for _ in range(concurrency)]
+        return sum(future.result() for future in futures)
+
+
+def _drain(run_batch: Callable[[], int]) -> int:
+    total = 0
+    while (count := run_batch()) > 0:
+        total += count
+    return total
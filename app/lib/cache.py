@@ -1,9 +1,81 @@
-from flask import request
+from functools import wraps
+
+from flask import current_app, make_response, request
 from flask_caching import Cache
 
 cache = Cache()
 
+# Endpoints which render the same page for everyone. Pages in the request journey
+# show answers held in the session and must never be added to this list.
+PAGE_CACHE_ALLOWLIST = frozenset(
+    {
+        "main.you_have_cancelled_your_request",
+        "main.only_living_subjects_can_request_their_record",
+        "main.confirm_payment_received",
+        "main.payment_link_creation_failed",
+        "main.second_payment_link_expired",
+        "main.payment_already_received",
+        "sitemap.index",
+    }
+)
+
 
 def cache_key_prefix():
     """Make a key that includes GET parameters."""
     return f"{request.full_path}{request.cookies.get('cookie_preferences_set' or '')}{request.cookies.get('theme' or '')}"
+
+
+def page_cache_key():
+    """Make a key for a whole page from everything the shared page templates vary on."""
+    return ":".join(
+        [
+            "page",
+            current_app.config.get("BUILD_VERSION") or "",
+            request.path,
+            request.cookies.get("cookies_policy", ""),
+            request.cookies.get("cookie_preferences_set", ""),
+            request.cookies.get("theme", ""),
+        ]
+    )
+
+
+def cache_page(view):
+    """
+    Serve a GET request for an allowlisted page from the cache.
+
+    Only successful responses are stored. Views for endpoints which are not in
+    PAGE_CACHE_ALLOWLIST are always rendered, so a journey page decorated by
+    mistake can't leak one user's answers to another.
+    """
+
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not current_app.config.get("PAGE_CACHE_ENABLED") or request.method != "GET":
+            return view(*args, **kwargs)
+
+        if request.endpoint not in PAGE_CACHE_ALLOWLIST:
+            current_app.logger.warning(
+                f"Not caching {request.endpoint} as it is not in the page cache allowlist"
+            )
+            return view(*args, **kwargs)
+
+        key = page_cache_key()
+        if cached := cache.get(key):
+            body, status, headers = cached
+            return current_app.response_class(body, status=status, headers=headers)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.direct_passthrough:
+            headers = [
+                (name, value)
+                for name, value in response.headers.items()
+                if name.lower() != "set-cookie"
+            ]
+            cache.set(
+                key,
+                (response.get_data(), response.status_code, headers),
+                timeout=current_app.config.get("PAGE_CACHE_TIMEOUT"),
+            )
+        return response
+
+    return wrapped
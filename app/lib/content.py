@@ -1,10 +1,208 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections.abc import Mapping
+from typing import NamedTuple
+
 import yaml
 
+from app.lib.template_filters import prerender_content
+
+DEFAULT_CONTENT_PATH = "app/content/content.yaml"
+
+# Bump this if the structure of the snapshot written by write_content_snapshot changes
+CONTENT_SNAPSHOT_VERSION = 1
+
+# Parsed content is shared by every request in the process, keyed by the absolute
+# path of the YAML file. Each entry holds the file signature it was parsed from so
+# that edits to the file can be picked up without restarting the app.
+_content_store = {}
+_content_store_lock = threading.Lock()
+_auto_reload = True
+# Field content indexes for the content in _content_store, keyed by id() of the content
+_field_indexes = {}
+
+
+class FieldContentNotFound(KeyError):
+    pass
+
+
+class FieldContent(NamedTuple):
+    """Everything content.yaml has for a single form field."""
+
+    name: str
+    label: str | None
+    description: str | None
+    hint: str | None
+    messages: Mapping
+    call_to_action: str | None
+    content: Mapping
+
+
+class FrozenDict(dict):
+    """
+    A dict that cannot be changed once created.
+
+    Content is shared between all requests in a process, so a view or form that
+    modified it would leak that change into every other request.
+    """
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Content is read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+class FrozenList(list):
+    """A list that cannot be changed once created. See FrozenDict."""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Content is read-only")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = clear = extend = insert = pop = remove = reverse = sort = _read_only
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+
+def freeze_content(node):
+    if isinstance(node, dict):
+        return FrozenDict({key: freeze_content(value) for key, value in node.items()})
+    if isinstance(node, list):
+        return FrozenList(freeze_content(item) for item in node)
+    return node
+
+
+def configure_content(auto_reload: bool) -> None:
+    """
+    Set whether the content file is checked for changes on every call to load_content.
+
+    When disabled, the file is parsed once per process and never re-read.
+    """
+    global _auto_reload
+    _auto_reload = bool(auto_reload)
+
+
+def clear_content_cache() -> None:
+    with _content_store_lock:
+        _content_store.clear()
+        _field_indexes.clear()
+        prerender_content()
+
+
+def _file_signature(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
 
-def load_content(file_path="app/content/content.yaml"):
+
+def content_snapshot_path(file_path: str) -> str:
+    return f"{os.path.splitext(file_path)[0]}.pickle"
+
+
+def write_content_snapshot(file_path=DEFAULT_CONTENT_PATH) -> str:
+    """
+    Compile a YAML content file into a pickled snapshot alongside it.
+
+    The snapshot records a checksum of the YAML it was built from, so a snapshot
+    left behind after the YAML has been edited is ignored rather than served.
+    """
+    with open(file_path, "rb") as file:
+        source = file.read()
+
+    snapshot = {
+        "version": CONTENT_SNAPSHOT_VERSION,
+        "checksum": hashlib.sha256(source).hexdigest(),
+        "content": yaml.safe_load(source),
+    }
+
+    snapshot_path = content_snapshot_path(file_path)
+    temporary_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as file:
+        pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, snapshot_path)
+
+    return snapshot_path
+
+
+def _load_content_snapshot(path: str, checksum: str) -> dict | None:
     try:
-        with open(file_path, "r") as file:
-            return yaml.safe_load(file)
+        with open(content_snapshot_path(path), "rb") as file:
+            snapshot = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error reading content snapshot, falling back to YAML: {e}")
+        return None
+
+    if (
+        not isinstance(snapshot, dict)
+        or snapshot.get("version") != CONTENT_SNAPSHOT_VERSION
+        or snapshot.get("checksum") != checksum
+    ):
+        return None
+
+    return snapshot["content"]
+
+
+def _parse_content_file(path: str) -> dict:
+    with open(path, "rb") as file:
+        source = file.read()
+
+    content = _load_content_snapshot(path, hashlib.sha256(source).hexdigest())
+    if content is not None:
+        return content
+
+    return yaml.safe_load(source)
+
+
+def load_content(file_path=DEFAULT_CONTENT_PATH):
+    path = os.path.abspath(file_path)
+
+    cached = _content_store.get(path)
+    if cached is not None and not _auto_reload:
+        return cached["content"]
+
+    try:
+        signature = _file_signature(path)
+        if cached is not None and cached["signature"] == signature:
+            return cached["content"]
+
+        with _content_store_lock:
+            cached = _content_store.get(path)
+            if cached is not None and cached["signature"] == signature:
+                return cached["content"]
+            content = freeze_content(_parse_content_file(path))
+            field_index = build_field_index(content)
+            _content_store[path] = {
+                "signature": signature,
+                "content": content,
+                "field_index": field_index,
+            }
+            _field_indexes.clear()
+            _field_indexes.update(
+                (id(entry["content"]), (entry["content"], entry["field_index"]))
+                for entry in _content_store.values()
+            )
+            prerender_content(*(entry["content"] for entry in _content_store.values()))
+            return content
     except FileNotFoundError:
         print(f"Error: The file {file_path} was not found.")
         return {}
@@ -13,13 +211,57 @@ def load_content(file_path="app/content/content.yaml"):
         return {}
 
 
-def get_field_content(content, field_name, content_key=None):
+def build_field_index(content) -> dict[str, FieldContent]:
+    """
+    Build a flat index of the content for every form field.
+
+    Raises ValueError if a field's content is not in the expected shape, so that
+    mistakes in content.yaml stop the app starting rather than surfacing on a page.
+    """
+    fields = (content.get("forms") or {}).get("fields") or {}
+    index = {}
+    for field_name, field_content in fields.items():
+        if not isinstance(field_content, Mapping):
+            raise ValueError(f"Content for field '{field_name}' must be a mapping")
+        messages = field_content.get("messages") or FrozenDict()
+        if not isinstance(messages, Mapping):
+            raise ValueError(f"Messages for field '{field_name}' must be a mapping")
+        index[field_name] = FieldContent(
+            name=field_name,
+            label=field_content.get("label"),
+            description=field_content.get("description"),
+            hint=field_content.get("hint"),
+            messages=messages,
+            call_to_action=field_content.get("call_to_action"),
+            content=field_content,
+        )
+    return index
+
+
+def _field_index_for(content) -> dict[str, FieldContent]:
+    indexed = _field_indexes.get(id(content))
+    if indexed is not None and indexed[0] is content:
+        return indexed[1]
+    # Content that didn't come from load_content, such as in tests
+    return build_field_index(content)
+
+
+def get_field_bundle(content, field_name) -> FieldContent:
+    """
+    Get all the content for a form field in one lookup.
+
+    Raises FieldContentNotFound if the field is not in the content. Forms look up
+    their content when they are imported, so a missing field stops the app starting.
+    """
     try:
-        field_content = content["forms"]["fields"][field_name]
-
-        if content_key:
-            return field_content.get(content_key)
-        return field_content
-    except KeyError as e:
-        print(f"Error accessing {field_name}: {e}")
-        return f"'{field_name}' not found in content."
+        return _field_index_for(content)[field_name]
+    except KeyError:
+        raise FieldContentNotFound(f"'{field_name}' not found in content.") from None
+
+
+def get_field_content(content, field_name, content_key=None):
+    field_content = get_field_bundle(content, field_name).content
+
+    if content_key:
+        return field_content.get(content_key)
+    return field_content
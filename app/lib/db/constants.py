@@ -2,3 +2,12 @@ SENT_STATUS = "S"
 NEW_STATUS = "N"
 PAID_STATUS = "P"
 EXPIRED_STATUS = "E"
+
+QUEUED_JOB_STATUS = "Q"
+RUNNING_JOB_STATUS = "R"
+COMPLETED_JOB_STATUS = "C"
+FAILED_JOB_STATUS = "F"
+
+PENDING_UPLOAD_STATUS = "P"
+COMPLETED_UPLOAD_STATUS = "C"
+FAILED_UPLOAD_STATUS = "F"
@@ -1,7 +1,13 @@
+from datetime import datetime
+
 from flask import current_app
+from sqlalchemy.exc import IntegrityError
 
-from app.constants import ServiceBranches
+from app.constants import DATE_FORMAT, ServiceBranches
 from app.lib.db.models import (
+    ArchivedDynamicsPayment,
+    ArchivedGOVUKDynamicsPayment,
+    ArchivedServiceRecordRequest,
     DynamicsPayment,
     GOVUKDynamicsPayment,
     ServiceRecordRequest,
@@ -31,12 +37,16 @@ def hash_check(record_hash: str) -> ServiceRecordRequest | None:
         return None
 
 
-def get_service_record_request(id: str = None) -> ServiceRecordRequest | None:
+def get_service_record_request(
+    id: str = None,
+) -> ServiceRecordRequest | ArchivedServiceRecordRequest | None:
     """
-    Get a ServiceRecordRequest item by its ID.
+    Get a ServiceRecordRequest item by its ID, from the archive if it has been archived.
     """
     try:
-        record = db.session.get(ServiceRecordRequest, id)
+        record = db.session.get(ServiceRecordRequest, id) or db.session.get(
+            ArchivedServiceRecordRequest, id
+        )
     except Exception as e:
         current_app.logger.error(f"Error fetching service record request: {e}")
         return None
@@ -76,9 +86,11 @@ def delete_service_record_request(record: ServiceRecordRequest) -> bool:
         return False
 
 
-def get_dynamics_payment(id: str) -> DynamicsPayment | None:
+def get_dynamics_payment(id: str) -> DynamicsPayment | ArchivedDynamicsPayment | None:
     try:
-        payment = db.session.get(DynamicsPayment, id)
+        payment = db.session.get(DynamicsPayment, id) or db.session.get(
+            ArchivedDynamicsPayment, id
+        )
         if not payment:
             current_app.logger.error(f"Dynamics payment not found for ID: {id}")
         return payment
@@ -87,11 +99,29 @@ def get_dynamics_payment(id: str) -> DynamicsPayment | None:
         return None
 
 
+class DuplicateDynamicsPaymentError(Exception):
+    pass
+
+
 def add_dynamics_payment(data: dict) -> DynamicsPayment | None:
+    """
+    Add a Dynamics payment. Raises DuplicateDynamicsPaymentError if there is
+    already a payment with the same reference.
+    """
     try:
         payment = DynamicsPayment(**data)
         db.session.add(payment)
         db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        if (
+            db.session.query(DynamicsPayment.id)
+            .filter_by(reference=data.get("reference"))
+            .first()
+        ):
+            raise DuplicateDynamicsPaymentError(data.get("reference")) from e
+        payment = None
+        current_app.logger.error(f"Error adding dynamics payment: {e}")
     except Exception as e:
         payment = None
         current_app.logger.error(f"Error adding dynamics payment: {e}")
@@ -120,9 +150,13 @@ def add_gov_uk_dynamics_payment(data: dict) -> GOVUKDynamicsPayment | None:
     return payment
 
 
-def get_gov_uk_dynamics_payment(id: str) -> GOVUKDynamicsPayment | None:
+def get_gov_uk_dynamics_payment(
+    id: str,
+) -> GOVUKDynamicsPayment | ArchivedGOVUKDynamicsPayment | None:
     try:
-        payment = db.session.get(GOVUKDynamicsPayment, id)
+        payment = db.session.get(GOVUKDynamicsPayment, id) or db.session.get(
+            ArchivedGOVUKDynamicsPayment, id
+        )
         if not payment:
             current_app.logger.error(f"GOV UK payment not found for ID: {id}")
         return payment
@@ -151,6 +185,11 @@ def transform_form_data_to_record(form_data: dict) -> dict:
         if hasattr(ServiceRecordRequest, field)
     }
 
+    # Dates are kept in the session as they are shown to the user
+    for field in ("date_of_birth", "date_of_death"):
+        if value := transformed_data.get(field):
+            transformed_data[field] = datetime.strptime(value, DATE_FORMAT).date()
+
     transformed_data["delivery_type"] = get_delivery_type(form_data)
 
     if service_branch := form_data.get("service_branch"):
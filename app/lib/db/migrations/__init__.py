@@ -0,0 +1,102 @@
+"""
+Versioned schema migrations.
+
+Each module in `versions` is one migration, named after its revision number,
+with an `upgrade(connection)` and `downgrade(connection)` function. The
+revisions which have been applied to a database are recorded in its
+schema_migrations table, and each migration is applied in its own transaction.
+"""
+
+import importlib
+import pkgutil
+from datetime import datetime
+from types import ModuleType
+from typing import NamedTuple
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection, Engine
+
+from . import versions
+
+schema_migrations = sa.Table(
+    "schema_migrations",
+    sa.MetaData(),
+    sa.Column("revision", sa.Integer, primary_key=True),
+    sa.Column("description", sa.String(256), nullable=False),
+    sa.Column("applied_at", sa.DateTime, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    revision: int
+    description: str
+    module: ModuleType
+
+
+def migrations() -> list[Migration]:
+    found = []
+    for module_info in pkgutil.iter_modules(versions.__path__):
+        module = importlib.import_module(f"{versions.__name__}.{module_info.name}")
+        found.append(
+            Migration(module.revision, module.__doc__.strip().splitlines()[0], module)
+        )
+    found.sort(key=lambda migration: migration.revision)
+    revisions = [migration.revision for migration in found]
+    if len(set(revisions)) != len(revisions):
+        raise RuntimeError(f"Duplicate migration revisions: {revisions}")
+    return found
+
+
+def head_revision() -> int:
+    return migrations()[-1].revision
+
+
+def applied_revisions(connection: Connection) -> set[int]:
+    schema_migrations.create(connection, checkfirst=True)
+    return set(connection.scalars(sa.select(schema_migrations.c.revision)))
+
+
+def current_revision(engine: Engine) -> int:
+    with engine.begin() as connection:
+        return max(applied_revisions(connection), default=0)
+
+
+def upgrade(engine: Engine, target: int | None = None) -> list[int]:
+    """Apply each migration up to and including `target`, or the latest. Returns the revisions applied."""
+    target = head_revision() if target is None else target
+    applied = []
+    for migration in migrations():
+        if migration.revision > target:
+            break
+        with engine.begin() as connection:
+            if migration.revision in applied_revisions(connection):
+                continue
+            migration.module.upgrade(connection)
+            connection.execute(
+                schema_migrations.insert().values(
+                    revision=migration.revision,
+                    description=migration.description,
+                    applied_at=datetime.now(),
+                )
+            )
+        applied.append(migration.revision)
+    return applied
+
+
+def downgrade(engine: Engine, target: int) -> list[int]:
+    """Revert each applied migration after `target`, newest first. Returns the revisions reverted."""
+    reverted = []
+    for migration in reversed(migrations()):
+        if migration.revision <= target:
+            break
+        with engine.begin() as connection:
+            if migration.revision not in applied_revisions(connection):
+                continue
+            migration.module.downgrade(connection)
+            connection.execute(
+                schema_migrations.delete().where(
+                    schema_migrations.c.revision == migration.revision
+                )
+            )
+        reverted.append(migration.revision)
+    return reverted
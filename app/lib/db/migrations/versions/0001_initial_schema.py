@@ -0,0 +1,118 @@
+"""
+Initial schema
+
+The tables as they were when create_database.py created them with
+db.create_all(). Tables which already exist are left as they are, so this can
+be applied to databases created that way.
+"""
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+
+revision = 1
+
+metadata = sa.MetaData()
+
+sa.Table(
+    "service_record_requests",
+    metadata,
+    sa.Column("id", sa.String(36), primary_key=True),
+    sa.Column("additional_information", sa.Text, nullable=True),
+    sa.Column("case_reference_number", sa.String(64), nullable=True),
+    sa.Column("date_of_birth", sa.String(17)),
+    sa.Column("date_of_death", sa.String(17), nullable=True),
+    sa.Column("died_in_service", sa.String(30)),
+    sa.Column("forenames", sa.String(128)),
+    sa.Column("last_name", sa.String(128)),
+    sa.Column("mod_reference", sa.String(64), nullable=True),
+    sa.Column("catalogue_reference", sa.String(64), nullable=True),
+    sa.Column("other_last_names", sa.String(128), nullable=True),
+    sa.Column("place_of_birth", sa.String(128), nullable=True),
+    sa.Column("regiment", sa.String(200), nullable=True),
+    sa.Column("requester_address1", sa.String(256)),
+    sa.Column("requester_address2", sa.String(256), nullable=True),
+    sa.Column("requester_contact_preference", sa.String(32)),
+    sa.Column("requester_country", sa.String(64)),
+    sa.Column("requester_county", sa.String(64), nullable=True),
+    sa.Column("requester_email", sa.String(256)),
+    sa.Column("requester_first_name", sa.String(128), nullable=True),
+    sa.Column("requester_last_name", sa.String(128)),
+    sa.Column("requester_postcode", sa.String(32), nullable=True),
+    sa.Column("requester_town_city", sa.String(128)),
+    sa.Column("service_branch", sa.String(64)),
+    sa.Column("were_they_a_commissioned_officer", sa.String(32), nullable=True),
+    sa.Column("service_number", sa.String(64), nullable=True),
+    sa.Column("proof_of_death", sa.String(64), nullable=True),
+    sa.Column("gov_uk_payment_id", sa.String(64), nullable=True, unique=True),
+    sa.Column("provider_id", sa.String(64), nullable=True),
+    sa.Column("payment_date", sa.String(17), nullable=True),
+    sa.Column("delivery_type", sa.String(32), nullable=True),
+    sa.Column("processing_option", sa.String(32), nullable=True),
+    sa.Column("payment_reference", sa.String(64), nullable=True),
+    sa.Column("amount_received", sa.String(32), nullable=True),
+    sa.Column("record_hash", sa.String(64), nullable=False, unique=True),
+    sa.Column("status", sa.String(1), nullable=False),
+    sa.Column("created_at", sa.DateTime, server_default=sa.func.current_timestamp()),
+)
+
+sa.Table(
+    "dynamics_payments",
+    metadata,
+    sa.Column("id", sa.String(36), primary_key=True),
+    sa.Column("case_number", sa.String(64), nullable=False),
+    sa.Column("reference", sa.String(64), nullable=False),
+    sa.Column("net_amount", sa.Integer, nullable=False),
+    sa.Column("delivery_amount", sa.Integer, nullable=True),
+    sa.Column("total_amount", sa.Integer, nullable=False),
+    sa.Column("payee_email", sa.String(256), nullable=False),
+    sa.Column("first_name", sa.String(128), nullable=True),
+    sa.Column("last_name", sa.String(128), nullable=True),
+    sa.Column("details", sa.String(256), nullable=True),
+    sa.Column("status", sa.String(1), nullable=False),
+    sa.Column("provider_id", sa.String(64), nullable=True),
+    sa.Column("payment_date", sa.DateTime, nullable=True),
+    sa.Column("created_at", sa.DateTime, server_default=sa.func.current_timestamp()),
+)
+
+sa.Table(
+    "gov_uk_dynamics_payments",
+    metadata,
+    sa.Column("id", sa.String(36), primary_key=True),
+    sa.Column(
+        "dynamics_payment_id",
+        sa.String(36),
+        sa.ForeignKey("dynamics_payments.id"),
+        nullable=False,
+    ),
+    sa.Column("gov_uk_payment_id", sa.String(64), nullable=False),
+    sa.Column("created_at", sa.DateTime, server_default=sa.func.current_timestamp()),
+)
+
+sa.Table(
+    "background_jobs",
+    metadata,
+    sa.Column("id", sa.String(36), primary_key=True),
+    sa.Column("job_type", sa.String(64), nullable=False),
+    sa.Column("payload", sa.JSON, nullable=False),
+    sa.Column("status", sa.String(1), nullable=False),
+    sa.Column("attempts", sa.Integer, nullable=False),
+    sa.Column(
+        "next_attempt_at",
+        sa.DateTime,
+        nullable=False,
+        server_default=sa.func.current_timestamp(),
+    ),
+    sa.Column("last_error", sa.Text, nullable=True),
+    sa.Column("claim_id", sa.String(36), nullable=True, index=True),
+    sa.Column("created_at", sa.DateTime, server_default=sa.func.current_timestamp()),
+    sa.Column("finished_at", sa.DateTime, nullable=True),
+    sa.Index("ix_background_jobs_status_next_attempt_at", "status", "next_attempt_at"),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    metadata.create_all(connection, checkfirst=True)
+
+
+def downgrade(connection: Connection) -> None:
+    metadata.drop_all(connection, checkfirst=True)
@@ -0,0 +1,77 @@
+"""
+Index the status scans and reference lookups
+
+The cron jobs scan requests and payments by status in created_at order, and
+Dynamics payments are looked up by reference when one is created and by
+dynamics_payment_id when GOV.UK Pay returns. Making reference unique means a
+duplicate payment request is rejected by the index rather than by a query
+before each insert.
+"""
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+
+revision = 2
+
+metadata = sa.MetaData()
+
+service_record_requests = sa.Table(
+    "service_record_requests",
+    metadata,
+    sa.Column("status", sa.String(1)),
+    sa.Column("created_at", sa.DateTime),
+)
+dynamics_payments = sa.Table(
+    "dynamics_payments",
+    metadata,
+    sa.Column("reference", sa.String(64)),
+    sa.Column("status", sa.String(1)),
+    sa.Column("created_at", sa.DateTime),
+)
+gov_uk_dynamics_payments = sa.Table(
+    "gov_uk_dynamics_payments",
+    metadata,
+    sa.Column("dynamics_payment_id", sa.String(36)),
+)
+
+indexes = [
+    sa.Index(
+        "ix_service_record_requests_status_created_at",
+        service_record_requests.c.status,
+        service_record_requests.c.created_at,
+    ),
+    sa.Index(
+        "ix_dynamics_payments_status_created_at",
+        dynamics_payments.c.status,
+        dynamics_payments.c.created_at,
+    ),
+    sa.Index(
+        "uq_dynamics_payments_reference",
+        dynamics_payments.c.reference,
+        unique=True,
+    ),
+    sa.Index(
+        "ix_gov_uk_dynamics_payments_dynamics_payment_id",
+        gov_uk_dynamics_payments.c.dynamics_payment_id,
+    ),
+]
+
+
+def upgrade(connection: Connection) -> None:
+    duplicates = connection.scalars(
+        sa.select(dynamics_payments.c.reference)
+        .group_by(dynamics_payments.c.reference)
+        .having(sa.func.count() > 1)
+        .limit(10)
+    ).all()
+    if duplicates:
+        raise RuntimeError(
+            f"Dynamics payment references must be unique before they can be indexed, found duplicates: {duplicates}"
+        )
+    for index in indexes:
+        index.create(connection, checkfirst=True)
+
+
+def downgrade(connection: Connection) -> None:
+    for index in reversed(indexes):
+        index.drop(connection, checkfirst=True)
@@ -0,0 +1,151 @@
+"""
+Store request dates as dates and amounts received in pence
+
+date_of_birth, date_of_death and payment_date were stored as "%d %B %Y"
+strings and amount_received as a pounds string, so they had to be parsed to be
+compared and couldn't be queried by range. Existing values are converted, and
+the migration stops before changing anything if one can't be.
+"""
+
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Callable
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+
+revision = 3
+
+DATE_FORMAT = "%d %B %Y"
+
+TABLE = "service_record_requests"
+
+metadata = sa.MetaData()
+
+payment_date_indexes = [
+    sa.Index(
+        "ix_service_record_requests_payment_date",
+        sa.Table(
+            TABLE, metadata, sa.Column("payment_date", sa.DateTime)
+        ).c.payment_date,
+    ),
+    sa.Index(
+        "ix_dynamics_payments_payment_date",
+        sa.Table(
+            "dynamics_payments", metadata, sa.Column("payment_date", sa.DateTime)
+        ).c.payment_date,
+    ),
+]
+
+
+def _parse_date(value: str) -> date:
+    return datetime.strptime(value.strip(), DATE_FORMAT).date()
+
+
+def _parse_datetime(value: str) -> datetime:
+    return datetime.strptime(value.strip(), DATE_FORMAT)
+
+
+def _parse_pence(value: str) -> int:
+    pounds = Decimal(value.strip().lstrip("£").replace(",", ""))
+    return int(pounds * 100)
+
+
+def _format_date(value: date) -> str:
+    return value.strftime(DATE_FORMAT)
+
+
+def _format_pounds(value: int) -> str:
+    return f"{value / 100:.2f}"
+
+
+# Each column's current type, its new type and how to convert its values
+UPGRADE = {
+    "date_of_birth": (sa.String(17), sa.Date(), _parse_date),
+    "date_of_death": (sa.String(17), sa.Date(), _parse_date),
+    "payment_date": (sa.String(17), sa.DateTime(), _parse_datetime),
+    "amount_received": (sa.String(32), sa.Integer(), _parse_pence),
+}
+
+DOWNGRADE = {
+    "date_of_birth": (sa.Date(), sa.String(17), _format_date),
+    "date_of_death": (sa.Date(), sa.String(17), _format_date),
+    "payment_date": (sa.DateTime(), sa.String(17), _format_date),
+    "amount_received": (sa.Integer(), sa.String(32), _format_pounds),
+}
+
+Conversions = dict[str, tuple[sa.types.TypeEngine, sa.types.TypeEngine, Callable]]
+
+
+def _converted_rows(connection: Connection, conversions: Conversions) -> list[dict]:
+    table = sa.table(
+        TABLE,
+        sa.column("id", sa.String(36)),
+        *[sa.column(name, old_type) for name, (old_type, _, _) in conversions.items()],
+    )
+    rows = []
+    for row in connection.execute(sa.select(table)):
+        converted = {"row_id": row.id}
+        for name, (_, _, convert) in conversions.items():
+            value = getattr(row, name)
+            try:
+                converted[name] = None if value in (None, "") else convert(value)
+            except (ValueError, InvalidOperation) as e:
+                raise RuntimeError(
+                    f"Can't convert {name} {value!r} of service record request {row.id}"
+                ) from e
+        rows.append(converted)
+    return rows
+
+
+def _convert_columns(connection: Connection, conversions: Conversions) -> None:
+    # Convert every value before altering the table, so that nothing is
+    # changed if any of them can't be
+    rows = _converted_rows(connection, conversions)
+
+    quote = connection.dialect.identifier_preparer.quote
+    for name, (_, new_type, _) in conversions.items():
+        connection.execute(
+            sa.text(
+                f"ALTER TABLE {quote(TABLE)} ADD COLUMN {quote(name + '_new')} "
+                f"{new_type.compile(dialect=connection.dialect)}"
+            )
+        )
+
+    new_columns = sa.table(
+        TABLE,
+        sa.column("id", sa.String(36)),
+        *[
+            sa.column(name + "_new", new_type)
+            for name, (_, new_type, _) in conversions.items()
+        ],
+    )
+    if rows:
+        connection.execute(
+            new_columns.update()
+            .where(new_columns.c.id == sa.bindparam("row_id"))
+            .values({name + "_new": sa.bindparam(name) for name in conversions}),
+            rows,
+        )
+
+    for name in conversions:
+        connection.execute(
+            sa.text(f"ALTER TABLE {quote(TABLE)} DROP COLUMN {quote(name)}")
+        )
+        connection.execute(
+            sa.text(
+                f"ALTER TABLE {quote(TABLE)} RENAME COLUMN {quote(name + '_new')} TO {quote(name)}"
+            )
+        )
+
+
+def upgrade(connection: Connection) -> None:
+    _convert_columns(connection, UPGRADE)
+    for index in payment_date_indexes:
+        index.create(connection, checkfirst=True)
+
+
+def downgrade(connection: Connection) -> None:
+    for index in reversed(payment_date_indexes):
+        index.drop(connection, checkfirst=True)
+    _convert_columns(connection, DOWNGRADE)
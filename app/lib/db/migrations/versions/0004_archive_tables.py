@@ -0,0 +1,43 @@
+"""
+Add archive tables for sent and expired requests and payments
+
+Each has the same columns as the table it archives, as they are after the
+previous migrations, and when the row was archived.
+"""
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+
+revision = 4
+
+ARCHIVED_TABLES = [
+    "service_record_requests",
+    "dynamics_payments",
+    "gov_uk_dynamics_payments",
+]
+
+
+def upgrade(connection: Connection) -> None:
+    metadata = sa.MetaData()
+    for name in ARCHIVED_TABLES:
+        table = sa.Table(name, sa.MetaData(), autoload_with=connection)
+        sa.Table(
+            f"{name}_archive",
+            metadata,
+            *[
+                sa.Column(
+                    column.name,
+                    column.type,
+                    primary_key=column.primary_key,
+                    nullable=column.nullable,
+                )
+                for column in table.columns
+            ],
+            sa.Column("archived_at", sa.DateTime, nullable=False),
+        )
+    metadata.create_all(connection, checkfirst=True)
+
+
+def downgrade(connection: Connection) -> None:
+    for name in reversed(ARCHIVED_TABLES):
+        sa.Table(f"{name}_archive", sa.MetaData()).drop(connection, checkfirst=True)
@@ -0,0 +1,33 @@
+"""
+Add a table to track proofs of death uploaded in the background
+
+Each row is a file saved to disk to be uploaded to S3, with whether it has been
+uploaded yet and the last error if an attempt failed.
+"""
+
+import sqlalchemy as sa
+from sqlalchemy.engine import Connection
+
+revision = 5
+
+metadata = sa.MetaData()
+
+sa.Table(
+    "proof_of_death_uploads",
+    metadata,
+    sa.Column("filename", sa.String(64), primary_key=True),
+    sa.Column("spool_path", sa.String(512), nullable=False),
+    sa.Column("status", sa.String(1), nullable=False),
+    sa.Column("attempts", sa.Integer, nullable=False),
+    sa.Column("last_error", sa.Text, nullable=True),
+    sa.Column("created_at", sa.DateTime, server_default=sa.func.current_timestamp()),
+    sa.Column("uploaded_at", sa.DateTime, nullable=True),
+)
+
+
+def upgrade(connection: Connection) -> None:
+    metadata.create_all(connection, checkfirst=True)
+
+
+def downgrade(connection: Connection) -> None:
+    metadata.drop_all(connection, checkfirst=True)
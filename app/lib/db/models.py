@@ -2,7 +2,7 @@ import uuid
 
 from flask_sqlalchemy import SQLAlchemy
 
-from .constants import NEW_STATUS
+from .constants import NEW_STATUS, PENDING_UPLOAD_STATUS, QUEUED_JOB_STATUS
 
 db = SQLAlchemy()
 
@@ -17,8 +17,8 @@ class ServiceRecordRequest(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     additional_information = db.Column(db.Text, nullable=True)
     case_reference_number = db.Column(db.String(64), nullable=True)
-    date_of_birth = db.Column(db.String(17))
-    date_of_death = db.Column(db.String(17), nullable=True)
+    date_of_birth = db.Column(db.Date)
+    date_of_death = db.Column(db.Date, nullable=True)
     died_in_service = db.Column(db.String(30))
     forenames = db.Column(db.String(128))
     last_name = db.Column(db.String(128))
@@ -43,15 +43,22 @@ class ServiceRecordRequest(db.Model):
     proof_of_death = db.Column(db.String(64), nullable=True)
     gov_uk_payment_id = db.Column(db.String(64), nullable=True, unique=True)
     provider_id = db.Column(db.String(64), nullable=True)
-    payment_date = db.Column(db.String(17), nullable=True)
+    payment_date = db.Column(db.DateTime, nullable=True)
     delivery_type = db.Column(db.String(32), nullable=True)
     processing_option = db.Column(db.String(32), nullable=True)
     payment_reference = db.Column(db.String(64), nullable=True)
-    amount_received = db.Column(db.String(32), nullable=True)  # amount in £xx.xx format
+    amount_received = db.Column(db.Integer, nullable=True)  # amount in pence
     record_hash = db.Column(db.String(64), nullable=False, unique=True)
     status = db.Column(db.String(1), nullable=False, default=NEW_STATUS)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
+    __table_args__ = (
+        db.Index(
+            "ix_service_record_requests_status_created_at", "status", "created_at"
+        ),
+        db.Index("ix_service_record_requests_payment_date", "payment_date"),
+    )
+
 
 class DynamicsPayment(db.Model):
     """
@@ -79,6 +86,12 @@ class DynamicsPayment(db.Model):
     payment_date = db.Column(db.DateTime, nullable=True)  # date payment was made
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
 
+    __table_args__ = (
+        db.Index("ix_dynamics_payments_status_created_at", "status", "created_at"),
+        db.Index("uq_dynamics_payments_reference", "reference", unique=True),
+        db.Index("ix_dynamics_payments_payment_date", "payment_date"),
+    )
+
 
 class GOVUKDynamicsPayment(db.Model):
     """
@@ -89,7 +102,101 @@ class GOVUKDynamicsPayment(db.Model):
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     dynamics_payment_id = db.Column(
-        db.String(36), db.ForeignKey("dynamics_payments.id"), nullable=False
+        db.String(36),
+        db.ForeignKey("dynamics_payments.id"),
+        nullable=False,
+        index=True,
     )
     gov_uk_payment_id = db.Column(db.String(64), nullable=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+
+def _archive_table(model: type[db.Model]) -> db.Table:
+    """
+    A table with the same columns as a model's, for rows moved out of it by
+    archive_old_records.py, without its other indexes and constraints.
+    """
+    return db.Table(
+        f"{model.__tablename__}_archive",
+        *[
+            db.Column(
+                column.name,
+                column.type,
+                primary_key=column.primary_key,
+                nullable=column.nullable,
+            )
+            for column in model.__table__.columns
+        ],
+        db.Column("archived_at", db.DateTime, nullable=False),
+    )
+
+
+class ArchivedServiceRecordRequest(db.Model):
+    """
+    Sent or expired service record requests which have been archived
+    """
+
+    __table__ = _archive_table(ServiceRecordRequest)
+
+
+class ArchivedDynamicsPayment(db.Model):
+    """
+    Sent or expired Dynamics payments which have been archived
+    """
+
+    __table__ = _archive_table(DynamicsPayment)
+
+
+class ArchivedGOVUKDynamicsPayment(db.Model):
+    """
+    GOV.UK Pay payment attempts for archived Dynamics payments
+    """
+
+    __table__ = _archive_table(GOVUKDynamicsPayment)
+
+
+class BackgroundJob(db.Model):
+    """
+    Outbox of work to do after a change is committed, such as sending a paid
+    request to Dynamics, written in the same transaction as the change
+    """
+
+    __tablename__ = "background_jobs"
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    job_type = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(1), nullable=False, default=QUEUED_JOB_STATUS)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # When the job is next due, or when a worker's claim on it expires
+    next_attempt_at = db.Column(
+        db.DateTime, nullable=False, default=db.func.current_timestamp()
+    )
+    last_error = db.Column(db.Text, nullable=True)
+    claim_id = db.Column(db.String(36), nullable=True, index=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index(
+            "ix_background_jobs_status_next_attempt_at", "status", "next_attempt_at"
+        ),
+    )
+
+
+class ProofOfDeathUpload(db.Model):
+    """
+    Table to track proofs of death which are saved to disk and uploaded to S3
+    in the background, so that paid requests can wait for them
+    """
+
+    __tablename__ = "proof_of_death_uploads"
+
+    # The name the file is uploaded as in the holding prefix, as recorded on the request
+    filename = db.Column(db.String(64), primary_key=True)
+    spool_path = db.Column(db.String(512), nullable=False)
+    status = db.Column(db.String(1), nullable=False, default=PENDING_UPLOAD_STATUS)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    uploaded_at = db.Column(db.DateTime, nullable=True)
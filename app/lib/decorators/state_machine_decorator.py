@@ -3,43 +3,49 @@ from functools import wraps
 
 from flask import g
 
-from app.lib.state_machine.state_machine import RoutingStateMachine
+from app.lib.state_machine.transition_table import RoutingStateCursor
 
 
 def with_state_machine(function):
     """
-    Decorator that provides a per-request RoutingStateMachine.
+    Decorator that provides a per-request routing state machine.
 
     Behavior:
-    - Creates a new RoutingStateMachine instance for each request.
+    - Creates a new RoutingStateCursor for each request. This follows the
+      RoutingStateMachine graph through a transition table compiled at import,
+      so it is much cheaper to create than the machine itself.
     - Stores the instance on Flask's per-request global `g`.
     - If the wrapped view function declares a `state_machine` parameter,
       injects the created instance into the call via keyword arguments.
 
     Notes:
     - Using `g` makes the instance accessible anywhere within the same request.
-    - If all decorated views accept `state_machine`, the `inspect` check can be
-      removed and the parameter can be unconditionally injected.
+    - Whether to inject `state_machine` is decided once, when the view is
+      decorated, rather than by inspecting its signature on every request.
     """
 
+    try:
+        # Only inject the argument when the wrapped function explicitly
+        # accepts a `state_machine` parameter. This keeps the decorator
+        # compatible with views that do not expect it.
+        injects_state_machine = (
+            "state_machine" in inspect.signature(function).parameters
+        )
+    except (ValueError, TypeError):
+        # Some callables (e.g., builtins) may not expose
+        # a retrievable signature; fail silently and avoid injection.
+        injects_state_machine = False
+
     @wraps(function)
     def wrapper(*args, **kwargs):
-        state_machine = RoutingStateMachine()
+        state_machine = RoutingStateCursor()
 
         # Store the state machine on Flask's request-scoped `g` so other
         # code in the same request can access it without passing it around explicitly.
         g.state_machine = state_machine
 
-        try:
-            # Only inject the argument when the wrapped function explicitly
-            # accepts a `state_machine` parameter. This keeps the decorator
-            # compatible with views that do not expect it.
-            if "state_machine" in inspect.signature(function).parameters:
-                kwargs["state_machine"] = state_machine
-        except (ValueError, TypeError):
-            # Some callables (e.g., builtins) may not expose
-            # a retrievable signature; fail silently and avoid injection.
-            pass
+        if injects_state_machine:
+            kwargs["state_machine"] = state_machine
 
         # Call the original function with possibly augmented kwargs.
         return function(*args, **kwargs)
@@ -8,20 +8,23 @@ from flask import session
 def update_dynamic_back_link_mapping(*, mappings: dict[Enum, Enum]):
     """Update dynamic back link mappings in session with provided dictionary."""
 
+    # Convert Enum keys and values to strings once, when the view is decorated
+    str_mappings = {
+        str(k.value if isinstance(k, Enum) else k): str(
+            v.value if isinstance(v, Enum) else v
+        )
+        for k, v in mappings.items()
+    }
+
     def decorator(view_func):
         @wraps(view_func)
         def wrapped(*args, **kwargs):
             dynamic_back_links = session.get("dynamic_back_links", {})
-            # Convert Enum keys and values to strings
-            str_mappings = {
-                str(k.value if isinstance(k, Enum) else k): str(
-                    v.value if isinstance(v, Enum) else v
-                )
-                for k, v in mappings.items()
-            }
-            # Merge provided mappings, overwriting existing keys
-            dynamic_back_links.update(str_mappings)
-            session["dynamic_back_links"] = dynamic_back_links
+            # Only write to the session when a mapping has changed, as every
+            # write means the session has to be saved again
+            if any(dynamic_back_links.get(k) != v for k, v in str_mappings.items()):
+                # Merge provided mappings, overwriting existing keys
+                session["dynamic_back_links"] = {**dynamic_back_links, **str_mappings}
             return view_func(*args, **kwargs)
 
         return wrapped
@@ -11,8 +11,9 @@ def with_form_prefilled_from_session(form_class):
                 form_data = session.get("form_data", {})
                 if not isinstance(form_data, dict):
                     form_data = {}
-                data = {k: v for k, v in form_data.items()}
-                form = form_class(data=data)
+                # WTForms copies `data` when it processes the form, so the
+                # session's dict can be passed straight through
+                form = form_class(data=form_data)
             else:
                 form = form_class()
             return view_func(form, *args, **kwargs)
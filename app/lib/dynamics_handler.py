@@ -1,11 +1,12 @@
-from datetime import datetime
+from datetime import date
 
-import requests
 from flask import current_app
 
+from app.lib import http_client
 from app.lib.aws import send_email
 from app.lib.boundary_years import BoundaryYears
 from app.lib.db.models import DynamicsPayment, ServiceRecordRequest
+from app.lib.template_filters import convert_pence_to_pounds_string, format_date
 
 DYNAMICS_REQUEST_FIELD_MAP = [
     ("mandatory_forename", "requester_first_name"),
@@ -44,6 +45,14 @@ DYNAMICS_REQUEST_FIELD_MAP = [
     ("provider_id", "provider_id"),
 ]
 
+# Values which are stored typed, and how Dynamics expects them
+DYNAMICS_FIELD_FORMATTERS = {
+    "date_of_birth": format_date,
+    "date_of_death": format_date,
+    "payment_date": format_date,
+    "amount_received": convert_pence_to_pounds_string,
+}
+
 
 class DynamicsClosureStatus:
     FOIOP = "FOIOP"  # Open record - Over 115
@@ -59,13 +68,12 @@ def send_request_to_dynamics(record: ServiceRecordRequest) -> bool:
     )
 
 
-def closure_status_calculation(date_of_birth: str, has_proof_of_death: bool) -> str:
-    dob = datetime.strptime(date_of_birth, "%d %B %Y")
+def closure_status_calculation(date_of_birth: date, has_proof_of_death: bool) -> str:
     first_birth_year_for_closed_records = (
         BoundaryYears.first_birth_year_for_closed_records()
     )
 
-    if dob.year < first_birth_year_for_closed_records:
+    if date_of_birth.year < first_birth_year_for_closed_records:
         closure_status = DynamicsClosureStatus.FOIOP
     else:
         if has_proof_of_death:
@@ -101,7 +109,8 @@ def send_payment_to_mod_copying_app(payment: DynamicsPayment) -> bool:
         "Date": str(payment.payment_date),
     }
 
-    response = requests.post(
+    response = http_client.post(
+        "mod_copying",
         current_app.config["MOD_COPYING_API_URL"],
         json=payload,
         headers={"Content-Type": "application/json"},
@@ -117,6 +126,12 @@ def send_payment_to_mod_copying_app(payment: DynamicsPayment) -> bool:
         return False
 
 
+def _format_value(attr: str, value) -> str:
+    if formatter := DYNAMICS_FIELD_FORMATTERS.get(attr):
+        return formatter(value)
+    return str(value)
+
+
 def _generate_tagged_data(mapping: list[tuple[str, str | None]], obj) -> str:
     chunks = []
     for tag, attr in mapping:
@@ -125,7 +140,7 @@ def _generate_tagged_data(mapping: list[tuple[str, str | None]], obj) -> str:
         if tag != "mandatory_upload_file_name":
             value = getattr(obj, attr) if attr else None
             if value:
-                text = str(value)
+                text = _format_value(attr, value)
                 chunks.append(f"<{tag}>{text}</{tag}>")
         else:
             if (
@@ -0,0 +1,276 @@
+"""
+Sending emails from versioned templates.
+
+Each template is a text file in app/templates/emails named after the template
+and its version, using only {{ variable }} placeholders. SES templates are
+Handlebars, which HTML-escapes {{ variable }}, so they are registered with
+{{{ variable }}} instead to render the same as Jinja does for a text file.
+Change an email by adding the next version of its template rather than editing
+one which may already be registered with SES.
+
+With EMAIL_TEMPLATE_MODE set to "ses", the templates are registered with SES by
+register_email_templates.py and sent with SendTemplatedEmail, or with
+SendBulkTemplatedEmail up to SES_BULK_CHUNK_SIZE at a time. Otherwise they are
+rendered from the app's compiled Jinja templates and sent one at a time.
+
+Every worker and cron job sharing SES_RATE_LIMIT_REDIS_URL takes its sends from
+one token bucket, to keep the account under SES_MAX_SEND_RATE between them.
+Without it, or while Redis is unavailable, each process limits itself.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import NamedTuple
+
+from botocore.exceptions import ClientError
+from flask import current_app
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app.lib.aws import get_client
+from app.lib.batch_workers import RateLimiter, RedisTokenBucket
+
+SES_BULK_LIMIT = 50
+SES_RATE_LIMIT_KEY = "ses/send-rate"
+THROTTLING_ERRORS = ("Throttling", "AccountThrottled")
+
+
+class EmailTemplate(NamedTuple):
+    name: str
+    version: int
+    subject: str
+
+    @property
+    def filename(self) -> str:
+        return f"emails/{self.name}-v{self.version}.txt"
+
+
+PAYMENT_LINK_EMAIL = EmailTemplate(
+    "payment_link", 2, "Payment for Service Record Request"
+)
+PAYMENT_LINK_EXPIRED_EMAIL = EmailTemplate(
+    "payment_link_expired", 2, "Your payment link has expired"
+)
+
+EMAIL_TEMPLATES = [PAYMENT_LINK_EMAIL, PAYMENT_LINK_EXPIRED_EMAIL]
+
+_rate_limiters = None
+_rate_limiters_lock = threading.Lock()
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+_metrics_started = time.monotonic()
+
+
+def _reset_after_fork() -> None:
+    # A forked worker can't share the parent's Redis connections, and counts
+    # its own emails
+    global _rate_limiters, _rate_limiters_lock, _metrics_lock, _metrics_started
+    _rate_limiters = None
+    _rate_limiters_lock = threading.Lock()
+    _metrics.clear()
+    _metrics_lock = threading.Lock()
+    _metrics_started = time.monotonic()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def ses_template_name(template: EmailTemplate) -> str:
+    prefix = current_app.config.get("EMAIL_TEMPLATE_PREFIX")
+    return f"{prefix}{template.name}-v{template.version}"
+
+
+def email_template_source(template: EmailTemplate) -> str:
+    source, _, _ = current_app.jinja_env.loader.get_source(
+        current_app.jinja_env, template.filename
+    )
+    return source
+
+
+def ses_template_source(template: EmailTemplate) -> str:
+    """The template's text for registering it with SES, with its values left unescaped."""
+    source = re.sub(r"{{\s*(\w+)\s*}}", r"{{{\1}}}", email_template_source(template))
+    # Jinja drops the template's final newline too
+    return source.removesuffix("\n")
+
+
+def render_email(template: EmailTemplate, data: dict) -> str:
+    return current_app.jinja_env.get_template(template.filename).render(**data)
+
+
+def _get_rate_limiters() -> tuple[RedisTokenBucket | None, RateLimiter]:
+    global _rate_limiters
+    if _rate_limiters is None:
+        with _rate_limiters_lock:
+            if _rate_limiters is None:
+                rate = current_app.config.get("SES_MAX_SEND_RATE")
+                redis_url = current_app.config.get("SES_RATE_LIMIT_REDIS_URL")
+                _rate_limiters = (
+                    (
+                        RedisTokenBucket(
+                            Redis.from_url(redis_url), SES_RATE_LIMIT_KEY, rate
+                        )
+                        if redis_url
+                        else None
+                    ),
+                    RateLimiter(rate),
+                )
+    return _rate_limiters
+
+
+def _wait_to_send(count: int) -> None:
+    shared, local = _get_rate_limiters()
+    if shared is None:
+        waited = local.wait(count)
+    else:
+        try:
+            waited = shared.wait(count)
+        except RedisError as e:
+            current_app.logger.warning(
+                f"Rate limiting emails in this process only, as Redis failed: {e}"
+            )
+            waited = local.wait(count)
+    _record(rate_limit_wait=waited)
+
+
+def _record(**counts) -> None:
+    with _metrics_lock:
+        _metrics.update(counts)
+
+
+def _record_error(error: Exception, count: int) -> None:
+    throttled = (
+        isinstance(error, ClientError)
+        and error.response.get("Error", {}).get("Code") in THROTTLING_ERRORS
+    )
+    _record(failed=count, throttled=count if throttled else 0)
+
+
+def email_metrics() -> dict[str, int | float]:
+    """
+    How many emails this process has sent, failed to send and had throttled by
+    SES, how long it waited for the rate limiter and how many it sent a second.
+    """
+    with _metrics_lock:
+        seconds = time.monotonic() - _metrics_started
+        sent = _metrics["sent"]
+        return {
+            "sent": sent,
+            "failed": _metrics["failed"],
+            "throttled": _metrics["throttled"],
+            "rate_limit_wait": round(_metrics["rate_limit_wait"], 3),
+            "seconds": round(seconds, 3),
+            "per_second": round(sent / seconds, 2) if seconds else 0.0,
+        }
+
+
+def reset_email_metrics() -> None:
+    global _metrics_started
+    with _metrics_lock:
+        _metrics.clear()
+        _metrics_started = time.monotonic()
+
+
+def _source() -> str:
+    return (
+        f"{current_app.config['EMAIL_FROM_NAME']} <{current_app.config['EMAIL_FROM']}>"
+    )
+
+
+def send_templated_email(to: str, template: EmailTemplate, data: dict) -> bool:
+    """
+    Send an email from a template.
+    Return True if email sent successfully, False otherwise.
+    """
+    _wait_to_send(1)
+    ses = get_client("ses")
+
+    try:
+        if current_app.config.get("EMAIL_TEMPLATE_MODE") == "ses":
+            ses.send_templated_email(
+                Source=_source(),
+                Destination={"ToAddresses": [to]},
+                Template=ses_template_name(template),
+                TemplateData=json.dumps(data),
+            )
+        else:
+            ses.send_email(
+                Source=_source(),
+                Destination={"ToAddresses": [to]},
+                Message={
+                    "Subject": {"Data": template.subject},
+                    "Body": {"Text": {"Data": render_email(template, data)}},
+                },
+            )
+    except Exception as e:
+        _record_error(e, 1)
+        current_app.logger.error(f"Error sending {template.name} email to {to}: {e}")
+        return False
+    _record(sent=1)
+    return True
+
+
+def send_bulk_templated_email(
+    template: EmailTemplate, messages: list[tuple[str, dict]]
+) -> list[bool]:
+    """
+    Send an email from a template to each recipient, given as pairs of their
+    address and the template's data, SES_BULK_CHUNK_SIZE to a call when
+    EMAIL_TEMPLATE_MODE is "ses". Returns whether each was sent.
+    """
+    if current_app.config.get("EMAIL_TEMPLATE_MODE") != "ses":
+        return [send_templated_email(to, template, data) for to, data in messages]
+
+    chunk_size = min(current_app.config.get("SES_BULK_CHUNK_SIZE"), SES_BULK_LIMIT)
+    results = []
+    for start in range(0, len(messages), chunk_size):
+        results.extend(_send_bulk_chunk(template, messages[start : start + chunk_size]))
+    return results
+
+
+def _send_bulk_chunk(
+    template: EmailTemplate, messages: list[tuple[str, dict]]
+) -> list[bool]:
+    _wait_to_send(len(messages))
+    ses = get_client("ses")
+
+    try:
+        response = ses.send_bulk_templated_email(
+            Source=_source(),
+            Template=ses_template_name(template),
+            DefaultTemplateData="{}",
+            Destinations=[
+                {
+                    "Destination": {"ToAddresses": [to]},
+                    "ReplacementTemplateData": json.dumps(data),
+                }
+                for to, data in messages
+            ],
+        )
+    except Exception as e:
+        _record_error(e, len(messages))
+        current_app.logger.error(
+            f"Error sending {len(messages)} {template.name} emails: {e}"
+        )
+        return [False] * len(messages)
+
+    results = []
+    for (to, _), status in zip(messages, response["Status"]):
+        if status["Status"] == "Success":
+            results.append(True)
+            _record(sent=1)
+            continue
+        current_app.logger.error(
+            f"Error sending {template.name} email to {to}: "
+            f"{status['Status']} {status.get('Error', '')}".rstrip()
+        )
+        results.append(False)
+        _record(
+            failed=1,
+            throttled=1 if status["Status"] in THROTTLING_ERRORS else 0,
+        )
+    return results
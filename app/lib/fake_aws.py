@@ -0,0 +1,625 @@
+"""
+An in-process fake of the parts of S3 and SES the app uses, for running its
+AWS code offline when AWS_BACKEND is "fake".
+
+Clients from get_client hand each request to the fake on botocore's
+before-send event instead of sending it, so everything up to the network still
+runs: serialising, signing, checksums, retries, s3transfer and parsing the
+response. Objects are saved under FAKE_AWS_DIR and sent emails are recorded
+there as JSON. FAKE_AWS_LATENCY delays every request, and FAKE_AWS_ERROR_RATE
+fails that fraction of them the way AWS does when it is throttling, so load
+tests can see how the app copes with a slow or struggling AWS.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime, timezone
+from email.utils import formatdate
+from urllib.parse import parse_qsl, quote, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+from botocore.awsrequest import AWSResponse
+
+FAKE_CREDENTIALS = {"aws_access_key_id": "fake", "aws_secret_access_key": "fake"}
+
+S3_NAMESPACE = "http://s3.amazonaws.com/doc/2006-03-01/"
+SES_NAMESPACE = "http://ses.amazonaws.com/doc/2010-12-01/"
+LIST_OBJECTS_LIMIT = 1000
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_fake_aws_backend(
+    directory: str, latency: float = 0.0, error_rate: float = 0.0
+) -> "FakeAWSBackend":
+    """Get this process's fake for these settings, so every client shares its counts."""
+    key = (directory, latency, error_rate)
+    with _backends_lock:
+        if key not in _backends:
+            _backends[key] = FakeAWSBackend(directory, latency, error_rate)
+        return _backends[key]
+
+
+class _Body:
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def stream(self, **kwargs):
+        yield self.content
+
+
+def _response(
+    request, status_code: int, body: str | bytes = b"", headers: dict | None = None
+) -> AWSResponse:
+    if isinstance(body, str):
+        body = body.encode()
+    return AWSResponse(request.url, status_code, headers or {}, _Body(body))
+
+
+def _header(request, name: str) -> str | None:
+    value = request.headers.get(name)
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _body(request) -> bytes:
+    body = request.body or b""
+    if hasattr(body, "read"):
+        body = body.read()
+    if isinstance(body, str):
+        body = body.encode()
+    if "aws-chunked" in (_header(request, "Content-Encoding") or ""):
+        body = _decode_aws_chunked(body)
+    return body
+
+
+def _decode_aws_chunked(body: bytes) -> bytes:
+    """Strip the chunk sizes and checksum trailer botocore streams uploads with."""
+    content = []
+    position = 0
+    while True:
+        line_end = body.index(b"\r\n", position)
+        size = int(body[position:line_end].split(b";")[0], 16)
+        if not size:
+            return b"".join(content)
+        content.append(body[line_end + 2 : line_end + 2 + size])
+        position = line_end + 2 + size + 2
+
+
+def _iso_timestamp(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(
+        "%Y-%m-%dT%H:%M:%S.000Z"
+    )
+
+
+HANDLEBARS_ESCAPES = str.maketrans(
+    {
+        "&": "&amp;",
+        "<": "&lt;",
+        ">": "&gt;",
+        '"': "&quot;",
+        "'": "&#x27;",
+        "`": "&#x60;",
+        "=": "&#x3D;",
+    }
+)
+
+
+def _render(template: str, data: dict) -> str:
+    # Like Handlebars for the plain placeholders the email templates use:
+    # {{{ variable }}} as it is and {{ variable }} HTML-escaped
+    def value(match: re.Match) -> str:
+        text = str(data.get(match[2], ""))
+        return text if match[1] else text.translate(HANDLEBARS_ESCAPES)
+
+    return re.sub(r"{{({)?\s*(\w+)\s*}?}}", value, template)
+
+
+class FakeAWSBackend:
+    """Answer S3 and SES requests from files in `directory`."""
+
+    def __init__(self, directory: str, latency: float = 0.0, error_rate: float = 0.0):
+        self.directory = directory
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = {}
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        self._uploads = {}
+
+    def __call__(self, request, event_name: str, **kwargs) -> AWSResponse:
+        _, service_name, operation = event_name.split(".", 2)
+        with self._lock:
+            key = f"{service_name}.{operation}"
+            self.calls[key] = self.calls.get(key, 0) + 1
+            fail = self._random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+
+        if service_name == "s3":
+            if fail:
+                return self._s3_error(
+                    request, 503, "SlowDown", "Please reduce your request rate."
+                )
+            handler = getattr(self, f"_s3_{operation}", None)
+        elif service_name == "ses":
+            if fail:
+                return self._ses_error(
+                    request, "Throttling", "Maximum sending rate exceeded."
+                )
+            handler = getattr(self, f"_ses_{operation}", None)
+        else:
+            handler = None
+
+        if handler is None:
+            return _response(
+                request, 501, f"No fake for {service_name} {operation}".encode()
+            )
+        return handler(request)
+
+    # S3
+
+    def read_object(self, bucket: str, key: str) -> bytes | None:
+        try:
+            with open(self._object_path(bucket, key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def list_keys(self, bucket: str, prefix: str = "") -> list[str]:
+        try:
+            names = os.listdir(os.path.join(self.directory, "s3", bucket, "objects"))
+        except FileNotFoundError:
+            return []
+        return sorted(key for key in map(unquote, names) if key.startswith(prefix))
+
+    def _object_path(self, bucket: str, key: str) -> str:
+        return os.path.join(
+            self.directory, "s3", bucket, "objects", quote(key, safe="")
+        )
+
+    def _metadata_path(self, bucket: str, key: str) -> str:
+        return os.path.join(
+            self.directory, "s3", bucket, "metadata", f"{quote(key, safe='')}.json"
+        )
+
+    def _metadata(self, bucket: str, key: str) -> dict | None:
+        path = self._object_path(bucket, key)
+        try:
+            with open(self._metadata_path(bucket, key)) as f:
+                metadata = json.load(f)
+            modified = os.path.getmtime(path)
+        except FileNotFoundError:
+            return None
+        return {**metadata, "Size": os.path.getsize(path), "LastModified": modified}
+
+    def _write(self, path: str, content: bytes) -> None:
+        # Written to a temporary file first so that readers never see half of it
+        temporary_directory = os.path.join(self.directory, "tmp")
+        os.makedirs(temporary_directory, exist_ok=True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = os.path.join(temporary_directory, uuid.uuid4().hex)
+        with open(temporary_path, "wb") as f:
+            f.write(content)
+        os.replace(temporary_path, path)
+
+    def _put(self, bucket: str, key: str, content: bytes, content_type: str) -> str:
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+        self._write(self._object_path(bucket, key), content)
+        self._write(
+            self._metadata_path(bucket, key),
+            json.dumps({"ContentType": content_type, "ETag": etag}).encode(),
+        )
+        return etag
+
+    def _delete(self, bucket: str, key: str) -> None:
+        for path in (self._object_path(bucket, key), self._metadata_path(bucket, key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _bucket_and_key(request) -> tuple[str, str]:
+        url = urlsplit(request.url)
+        path = unquote(url.path).lstrip("/")
+        host_prefix = url.hostname.split(".s3.", 1)
+        if len(host_prefix) == 2:
+            return host_prefix[0], path
+        bucket, _, key = path.partition("/")
+        return bucket, key
+
+    @staticmethod
+    def _query(request) -> dict[str, str]:
+        return dict(parse_qsl(urlsplit(request.url).query, keep_blank_values=True))
+
+    def _s3_error(
+        self, request, status_code: int, code: str, message: str
+    ) -> AWSResponse:
+        return _response(
+            request,
+            status_code,
+            f"<Error><Code>{code}</Code><Message>{escape(message)}</Message>"
+            f"<RequestId>{uuid.uuid4().hex}</RequestId></Error>",
+        )
+
+    def _no_such_key(self, request, key: str) -> AWSResponse:
+        return self._s3_error(
+            request, 404, "NoSuchKey", f"The specified key does not exist: {key}"
+        )
+
+    def _s3_PutObject(self, request) -> AWSResponse:
+        bucket, key = self._bucket_and_key(request)
+        etag = self._put(
+            bucket,
+            key,
+            _body(request),
+            _header(request, "Content-Type") or "binary/octet-stream",
+        )
+        return _response(request, 200, headers={"ETag": etag})
+
+    def _s3_HeadObject(self, request) -> AWSResponse:
+        bucket, key = self._bucket_and_key(request)
+        metadata = self._metadata(bucket, key)
+        if metadata is None:
+            return _response(request, 404)
+        return _response(
+            request,
+            200,
+            headers={
+                "Content-Length": str(metadata["Size"]),
+                "Content-Type": metadata["ContentType"],
+                "ETag": metadata["ETag"],
+                "Last-Modified": formatdate(metadata["LastModified"], usegmt=True),
+            },
+        )
+
+    def _s3_GetObject(self, request) -> AWSResponse:
+        bucket, key = self._bucket_and_key(request)
+        metadata = self._metadata(bucket, key)
+        content = self.read_object(bucket, key)
+        if metadata is None or content is None:
+            return self._no_such_key(request, key)
+        return _response(
+            request,
+            200,
+            content,
+            headers={
+                "Content-Length": str(len(content)),
+                "Content-Type": metadata["ContentType"],
+                "ETag": metadata["ETag"],
+                "Last-Modified": formatdate(metadata["LastModified"], usegmt=True),
+            },
+        )
+
+    def _s3_CopyObject(self, request) -> AWSResponse:
+        bucket, key = self._bucket_and_key(request)
+        source = unquote(_header(request, "x-amz-copy-source")).lstrip("/")
+        source_bucket, _, source_key = source.split("?")[0].partition("/")
+        metadata = self._metadata(source_bucket, source_key)
+        content = self.read_object(source_bucket, source_key)
+        if metadata is None or content is None:
+            return self._no_such_key(request, source_key)
+        if _header(request, "x-amz-metadata-directive") == "REPLACE":
+            content_type = _header(request, "Content-Type") or "binary/octet-stream"
+        else:
+            content_type = metadata["ContentType"]
+        etag = self._put(bucket, key, content, content_type)
+        return _response(
+            request,
+            200,
+            f"<CopyObjectResult><ETag>{escape(etag)}</ETag>"
+            f"<LastModified>{_iso_timestamp(time.time())}</LastModified>"
+            "</CopyObjectResult>",
+        )
+
+    def _s3_DeleteObject(self, request) -> AWSResponse:
+        self._delete(*self._bucket_and_key(request))
+        return _response(request, 204)
+
+    def _s3_DeleteObjects(self, request) -> AWSResponse:
+        bucket, _ = self._bucket_and_key(request)
+        delete = ElementTree.fromstring(_body(request))
+        quiet = delete.findtext(f"{{{S3_NAMESPACE}}}Quiet") == "true"
+        deleted = []
+        for key in delete.iterfind(f"{{{S3_NAMESPACE}}}Object/{{{S3_NAMESPACE}}}Key"):
+            self._delete(bucket, key.text)
+            deleted.append(f"<Deleted><Key>{escape(key.text)}</Key></Deleted>")
+        return _response(
+            request,
+            200,
+            f'<DeleteResult xmlns="{S3_NAMESPACE}">'
+            f"{'' if quiet else ''.join(deleted)}</DeleteResult>",
+        )
+
+    def _s3_ListObjectsV2(self, request) -> AWSResponse:
+        bucket, _ = self._bucket_and_key(request)
+        query = self._query(request)
+        prefix = query.get("prefix", "")
+        max_keys = min(
+            int(query.get("max-keys", LIST_OBJECTS_LIMIT)), LIST_OBJECTS_LIMIT
+        )
+        after = query.get("start-after", "")
+        if "continuation-token" in query:
+            after = base64.urlsafe_b64decode(query["continuation-token"]).decode()
+        encode = (
+            (lambda value: quote(value, safe="/"))
+            if query.get("encoding-type") == "url"
+            else (lambda value: value)
+        )
+
+        keys = [key for key in self.list_keys(bucket, prefix) if key > after]
+        page = keys[:max_keys]
+        contents = []
+        for key in page:
+            metadata = self._metadata(bucket, key)
+            if metadata is None:
+                continue
+            contents.append(
+                f"<Contents><Key>{escape(encode(key))}</Key>"
+                f"<LastModified>{_iso_timestamp(metadata['LastModified'])}</LastModified>"
+                f"<ETag>{escape(metadata['ETag'])}</ETag>"
+                f"<Size>{metadata['Size']}</Size>"
+                "<StorageClass>STANDARD</StorageClass></Contents>"
+            )
+        truncated = len(keys) > max_keys
+        next_token = (
+            "<NextContinuationToken>"
+            f"{base64.urlsafe_b64encode(page[-1].encode()).decode()}"
+            "</NextContinuationToken>"
+            if truncated
+            else ""
+        )
+        return _response(
+            request,
+            200,
+            f'<ListBucketResult xmlns="{S3_NAMESPACE}">'
+            f"<Name>{escape(bucket)}</Name><Prefix>{escape(encode(prefix))}</Prefix>"
+            f"<KeyCount>{len(contents)}</KeyCount><MaxKeys>{max_keys}</MaxKeys>"
+            f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"
+            f"{''.join(contents)}{next_token}</ListBucketResult>",
+        )
+
+    def _upload_path(self, upload_id: str, part_number: int | None = None) -> str:
+        path = os.path.join(self.directory, "s3-uploads", upload_id)
+        return path if part_number is None else os.path.join(path, f"{part_number:05}")
+
+    def _s3_CreateMultipartUpload(self, request) -> AWSResponse:
+        bucket, key = self._bucket_and_key(request)
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._uploads[upload_id] = _header(request, "Content-Type")
+        return _response(
+            request,
+            200,
+            f'<InitiateMultipartUploadResult xmlns="{S3_NAMESPACE}">'
+            f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>"
+            f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>",
+        )
+
+    def _s3_UploadPart(self, request) -> AWSResponse:
+        query = self._query(request)
+        content = _body(request)
+        self._write(
+            self._upload_path(query["uploadId"], int(query["partNumber"])), content
+        )
+        return _response(
+            request, 200, headers={"ETag": f'"{hashlib.md5(content).hexdigest()}"'}
+        )
+
+    def _s3_CompleteMultipartUpload(self, request) -> AWSResponse:
+        bucket, key = self._bucket_and_key(request)
+        upload_id = self._query(request)["uploadId"]
+        complete = ElementTree.fromstring(_body(request))
+        content = b""
+        for part_number in complete.iterfind(
+            f"{{{S3_NAMESPACE}}}Part/{{{S3_NAMESPACE}}}PartNumber"
+        ):
+            with open(self._upload_path(upload_id, int(part_number.text)), "rb") as f:
+                content += f.read()
+        with self._lock:
+            content_type = self._uploads.pop(upload_id, None)
+        etag = self._put(bucket, key, content, content_type or "binary/octet-stream")
+        shutil.rmtree(self._upload_path(upload_id), ignore_errors=True)
+        return _response(
+            request,
+            200,
+            f'<CompleteMultipartUploadResult xmlns="{S3_NAMESPACE}">'
+            f"<Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>"
+            f"<ETag>{escape(etag)}</ETag></CompleteMultipartUploadResult>",
+        )
+
+    def _s3_AbortMultipartUpload(self, request) -> AWSResponse:
+        upload_id = self._query(request)["uploadId"]
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+        shutil.rmtree(self._upload_path(upload_id), ignore_errors=True)
+        return _response(request, 204)
+
+    # SES
+
+    def sent_emails(self) -> list[dict]:
+        """The emails sent so far, oldest first."""
+        directory = os.path.join(self.directory, "ses", "sent")
+        try:
+            names = sorted(os.listdir(directory))
+        except FileNotFoundError:
+            return []
+        emails = []
+        for name in names:
+            with open(os.path.join(directory, name)) as f:
+                emails.append(json.load(f))
+        return emails
+
+    def _template_path(self, name: str) -> str:
+        return os.path.join(
+            self.directory, "ses", "templates", f"{quote(name, safe='')}.json"
+        )
+
+    def _template(self, name: str) -> dict | None:
+        try:
+            with open(self._template_path(name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _record_email(self, source: str, to: list[str], subject: str, body: str) -> str:
+        message_id = uuid.uuid4().hex
+        self._write(
+            os.path.join(
+                self.directory, "ses", "sent", f"{time.time_ns()}-{message_id}.json"
+            ),
+            json.dumps(
+                {
+                    "MessageId": message_id,
+                    "Source": source,
+                    "ToAddresses": to,
+                    "Subject": subject,
+                    "Body": body,
+                }
+            ).encode(),
+        )
+        return message_id
+
+    @staticmethod
+    def _params(request) -> dict[str, str]:
+        return dict(parse_qsl(_body(request).decode(), keep_blank_values=True))
+
+    @staticmethod
+    def _members(params: dict, prefix: str) -> list[str]:
+        members = {
+            int(name[len(prefix) + 8 :]): value
+            for name, value in params.items()
+            if name.startswith(f"{prefix}.member.")
+            and name[len(prefix) + 8 :].isdigit()
+        }
+        return [members[number] for number in sorted(members)]
+
+    def _ses_result(self, request, operation: str, result: str = "") -> AWSResponse:
+        return _response(
+            request,
+            200,
+            f'<{operation}Response xmlns="{SES_NAMESPACE}">'
+            f"<{operation}Result>{result}</{operation}Result>"
+            f"<ResponseMetadata><RequestId>{uuid.uuid4()}</RequestId></ResponseMetadata>"
+            f"</{operation}Response>",
+        )
+
+    def _ses_error(self, request, code: str, message: str) -> AWSResponse:
+        return _response(
+            request,
+            400,
+            f'<ErrorResponse xmlns="{SES_NAMESPACE}"><Error><Type>Sender</Type>'
+            f"<Code>{code}</Code><Message>{escape(message)}</Message></Error>"
+            f"<RequestId>{uuid.uuid4()}</RequestId></ErrorResponse>",
+        )
+
+    def _ses_SendEmail(self, request) -> AWSResponse:
+        params = self._params(request)
+        message_id = self._record_email(
+            params["Source"],
+            self._members(params, "Destination.ToAddresses"),
+            params.get("Message.Subject.Data", ""),
+            params.get(
+                "Message.Body.Text.Data", params.get("Message.Body.Html.Data", "")
+            ),
+        )
+        return self._ses_result(
+            request, "SendEmail", f"<MessageId>{message_id}</MessageId>"
+        )
+
+    def _ses_SendTemplatedEmail(self, request) -> AWSResponse:
+        params = self._params(request)
+        template = self._template(params["Template"])
+        if template is None:
+            return self._template_does_not_exist(request, params["Template"])
+        data = json.loads(params["TemplateData"])
+        message_id = self._record_email(
+            params["Source"],
+            self._members(params, "Destination.ToAddresses"),
+            _render(template["SubjectPart"], data),
+            _render(template.get("TextPart", ""), data),
+        )
+        return self._ses_result(
+            request, "SendTemplatedEmail", f"<MessageId>{message_id}</MessageId>"
+        )
+
+    def _ses_SendBulkTemplatedEmail(self, request) -> AWSResponse:
+        params = self._params(request)
+        template = self._template(params["Template"])
+        if template is None:
+            return self._template_does_not_exist(request, params["Template"])
+        default_data = json.loads(params.get("DefaultTemplateData", "{}"))
+        statuses = []
+        number = 1
+        while (
+            f"Destinations.member.{number}.Destination.ToAddresses.member.1" in params
+        ):
+            member = f"Destinations.member.{number}"
+            data = {
+                **default_data,
+                **json.loads(params.get(f"{member}.ReplacementTemplateData", "{}")),
+            }
+            message_id = self._record_email(
+                params["Source"],
+                self._members(params, f"{member}.Destination.ToAddresses"),
+                _render(template["SubjectPart"], data),
+                _render(template.get("TextPart", ""), data),
+            )
+            statuses.append(
+                f"<member><Status>Success</Status><MessageId>{message_id}</MessageId></member>"
+            )
+            number += 1
+        return self._ses_result(
+            request,
+            "SendBulkTemplatedEmail",
+            f"<Status>{''.join(statuses)}</Status>",
+        )
+
+    def _template_does_not_exist(self, request, name: str) -> AWSResponse:
+        return self._ses_error(
+            request, "TemplateDoesNotExist", f"Template {name} does not exist."
+        )
+
+    def _ses_CreateTemplate(self, request) -> AWSResponse:
+        params = self._params(request)
+        template = {
+            name.removeprefix("Template."): value
+            for name, value in params.items()
+            if name.startswith("Template.")
+        }
+        if self._template(template["TemplateName"]) is not None:
+            return self._ses_error(
+                request,
+                "AlreadyExists",
+                f"Template {template['TemplateName']} already exists.",
+            )
+        self._write(
+            self._template_path(template["TemplateName"]),
+            json.dumps(template).encode(),
+        )
+        return self._ses_result(request, "CreateTemplate")
+
+    def _ses_GetTemplate(self, request) -> AWSResponse:
+        name = self._params(request)["TemplateName"]
+        template = self._template(name)
+        if template is None:
+            return self._template_does_not_exist(request, name)
+        return self._ses_result(
+            request,
+            "GetTemplate",
+            "<Template>"
+            + "".join(
+                f"<{part}>{escape(value)}</{part}>" for part, value in template.items()
+            )
+            + "</Template>",
+        )
@@ -1,7 +1,7 @@
-import requests
 from flask import current_app
 
 from app.constants import FALLBACK_COUNTRY_CHOICES
+from app.lib import http_client
 from app.lib.cache import cache
 
 CACHE_KEY = "country_choices"
@@ -20,7 +20,9 @@ def get_country_choices():
         return cached_countries
 
     try:
-        response = requests.get(current_app.config.get("COUNTRY_API_URL"), timeout=5)
+        response = http_client.get(
+            "record_copying_service", current_app.config.get("COUNTRY_API_URL")
+        )
         response.raise_for_status()
         countries_data = response.json()
 
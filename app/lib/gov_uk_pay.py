@@ -1,24 +1,31 @@
+import time
 from datetime import datetime
 
-import requests
 from flask import current_app
 
+from app.lib import http_client
 from app.lib.api import JSONAPIClient
 from app.lib.aws import move_proof_of_death_to_submitted
+from app.lib.cache import cache
 from app.lib.db.constants import (
+    EXPIRED_STATUS,
+    FAILED_UPLOAD_STATUS,
     NEW_STATUS,
     PAID_STATUS,
+    PENDING_UPLOAD_STATUS,
     SENT_STATUS,
 )
 from app.lib.db.db_handler import (
     get_dynamics_payment,
     get_service_record_request,
 )
-from app.lib.db.models import db
+from app.lib.db.models import DynamicsPayment, ServiceRecordRequest, db
 from app.lib.dynamics_handler import (
     send_payment_to_mod_copying_app,
     send_request_to_dynamics,
 )
+from app.lib.jobs import enqueue_job, job_handler, run_job_now
+from app.lib.proof_of_death_uploads import proof_of_death_upload_status
 
 SUCCESSFUL_PAYMENT_STATUSES: set[str] = {"success"}
 
@@ -26,8 +33,15 @@ UNFINISHED_PAYMENT_STATUSES: set[str] = {"created", "started", "submitted"}
 
 FAILED_PAYMENT_STATUSES: set[str] = {"failed", "cancelled", "error"}
 
+PAYMENT_CACHE_KEY = "gov_uk_pay:payment:{}"
+
+PAYMENT_LOCK_KEY = "gov_uk_pay:payment_lock:{}"
+
+PAYMENT_LOCK_POLL_INTERVAL = 0.05
+
 
 class GOVUKPayAPIClient(JSONAPIClient):
+    upstream = "gov_uk_pay"
     data = None
 
     def __init__(self):
@@ -40,9 +54,50 @@ class GOVUKPayAPIClient(JSONAPIClient):
         )
 
     def get_payment(self, payment_id: str) -> dict:
-        self.data = self.get(path=f"/{payment_id}")
+        if current_app.config.get("GOV_UK_PAY_STATUS_CACHE_ENABLED"):
+            self.data = self._get_cached_payment(payment_id)
+        else:
+            self.data = self.get(path=f"/{payment_id}")
         return self.data
 
+    def _get_cached_payment(self, payment_id: str) -> dict:
+        """
+        Get a payment from the cache, or from GOV.UK Pay if it isn't cached.
+
+        Only one worker fetches a payment at a time. Others looking up the same
+        payment wait for it to be cached rather than making their own request,
+        unless it takes longer than GOV_UK_PAY_STATUS_WAIT_TIMEOUT.
+        """
+        cache_key = PAYMENT_CACHE_KEY.format(payment_id)
+        lock_key = PAYMENT_LOCK_KEY.format(payment_id)
+        if (data := cache.get(cache_key)) is not None:
+            return data
+
+        lock_timeout = current_app.config.get("GOV_UK_PAY_STATUS_LOCK_TIMEOUT")
+        locked = cache.add(lock_key, True, timeout=lock_timeout)
+        if not locked:
+            wait_until = time.monotonic() + current_app.config.get(
+                "GOV_UK_PAY_STATUS_WAIT_TIMEOUT"
+            )
+            while time.monotonic() < wait_until:
+                time.sleep(PAYMENT_LOCK_POLL_INTERVAL)
+                if (data := cache.get(cache_key)) is not None:
+                    return data
+            current_app.logger.warning(
+                f"Timed out waiting for another lookup of payment {payment_id}"
+            )
+
+        try:
+            data = self.get(path=f"/{payment_id}")
+            if data:
+                cache.set(cache_key, data, timeout=_payment_cache_timeout(data))
+            return data
+        finally:
+            # A worker which gave up waiting doesn't hold the lock, so mustn't
+            # release it from under the worker which does
+            if locked:
+                cache.delete(lock_key)
+
     def get_payment_status(self) -> str | None:
         if self.data is None:
             return None
@@ -53,6 +108,14 @@ class GOVUKPayAPIClient(JSONAPIClient):
         return status in SUCCESSFUL_PAYMENT_STATUSES
 
 
+def _payment_cache_timeout(data: dict) -> int:
+    """Cache finished payments for much longer, as their status can't change."""
+    status = data.get("state", {}).get("status")
+    if status in SUCCESSFUL_PAYMENT_STATUSES | FAILED_PAYMENT_STATUSES:
+        return current_app.config.get("GOV_UK_PAY_FINISHED_STATUS_CACHE_TIMEOUT")
+    return current_app.config.get("GOV_UK_PAY_UNFINISHED_STATUS_CACHE_TIMEOUT")
+
+
 def create_payment(
     amount: int, description: str, reference: str, email: str | None, return_url: str
 ) -> dict | None:
@@ -71,8 +134,11 @@ def create_payment(
     if email is not None:
         payload["email"] = email
 
-    response = requests.post(
-        current_app.config["GOV_UK_PAY_API_URL"], json=payload, headers=headers
+    response = http_client.post(
+        "gov_uk_pay",
+        current_app.config["GOV_UK_PAY_API_URL"],
+        json=payload,
+        headers=headers,
     )
 
     try:
@@ -84,34 +150,74 @@ def create_payment(
     return response.json()
 
 
+SEND_PAID_REQUEST_JOB = "send_paid_request"
+
+SEND_PAID_PAYMENT_JOB = "send_paid_payment"
+
+
 def process_valid_request(id: str, payment_data: dict) -> None:
     record = get_service_record_request(id=id)
 
     if record is None:
         raise ValueError(f"Service record not found for payment ID: {id}")
 
-    if record.status == NEW_STATUS:
-        record.provider_id = payment_data.get("provider_id", None)
-        record.amount_received = (
-            f"{payment_data.get('amount') / 100:.2f}"
-            if payment_data.get("amount") is not None
-            else None
-        )
-        record.payment_reference = payment_data.get("reference", "")
-        record.payment_date = datetime.now().strftime("%d %B %Y")
-        record.status = PAID_STATUS
-        db.session.commit()
+    if record.status != NEW_STATUS:
+        # Sending it on was queued when it was first marked as paid
+        return
+
+    record.provider_id = payment_data.get("provider_id", None)
+    record.amount_received = payment_data.get("amount")
+    record.payment_reference = payment_data.get("reference", "")
+    record.payment_date = datetime.now()
+    record.status = PAID_STATUS
+    job = enqueue_job(SEND_PAID_REQUEST_JOB, id=record.id)
+    db.session.commit()
+
+    if not current_app.config.get("BACKGROUND_JOBS_ENABLED"):
+        run_job_now(job)
 
+
+def send_paid_request(record: ServiceRecordRequest) -> bool:
+    """Submit the proof of death and send a paid request to Dynamics."""
     if record.proof_of_death and record.proof_of_death != "EMPTY":
-        if not move_proof_of_death_to_submitted(record.proof_of_death):
+        if proof_of_death_upload_status(record.proof_of_death) == FAILED_UPLOAD_STATUS:
+            current_app.logger.error(
+                f"Proof of death {record.proof_of_death} for service record request "
+                f"{record.id} could not be uploaded, sending the request without it."
+            )
+            # So that Dynamics isn't told about a file which never reached S3
+            record.proof_of_death = "EMPTY"
+        # With batch promotion, promote_proofs_of_death.py moves it instead
+        elif not current_app.config.get(
+            "PROOF_OF_DEATH_BATCH_PROMOTION"
+        ) and not move_proof_of_death_to_submitted(record.proof_of_death):
             current_app.logger.warning(
                 "Failed to move proof of death file to submitted bucket."
             )
 
     if record.status == PAID_STATUS:
-        if send_request_to_dynamics(record):
-            record.status = SENT_STATUS
-            db.session.commit()
+        if not send_request_to_dynamics(record):
+            return False
+        record.status = SENT_STATUS
+        db.session.commit()
+    return True
+
+
+@job_handler(SEND_PAID_REQUEST_JOB)
+def send_paid_request_job(id: str) -> None:
+    record = get_service_record_request(id=id)
+    if record is None:
+        raise ValueError(f"Service record not found: {id}")
+    if (
+        record.proof_of_death
+        and proof_of_death_upload_status(record.proof_of_death) == PENDING_UPLOAD_STATUS
+    ):
+        # Retried with the job's backoff until the upload has finished
+        raise RuntimeError(
+            f"Proof of death for service record request {id} has not been uploaded yet"
+        )
+    if not send_paid_request(record):
+        raise RuntimeError(f"Failed to send service record request {id} to Dynamics")
 
 
 def process_valid_payment(id: str, *, provider_id: str) -> None:
@@ -120,11 +226,40 @@ def process_valid_payment(id: str, *, provider_id: str) -> None:
     if payment is None:
         raise ValueError(f"Payment not found for payment ID: {id}")
 
+    if payment.status in (PAID_STATUS, SENT_STATUS):
+        # Sending it on was queued when it was first marked as paid
+        return
+
+    if payment.status == EXPIRED_STATUS:
+        # expire_old_payments.py expired it while the payee was paying, but
+        # they have paid, so it is still sent on
+        current_app.logger.error(
+            f"Dynamics payment {id} was paid after it expired, sending it anyway"
+        )
+
     payment.status = PAID_STATUS
     payment.provider_id = provider_id
     payment.payment_date = datetime.now()
+    job = enqueue_job(SEND_PAID_PAYMENT_JOB, id=payment.id)
     db.session.commit()
 
-    if send_payment_to_mod_copying_app(payment):
-        payment.status = SENT_STATUS
-        db.session.commit()
+    if not current_app.config.get("BACKGROUND_JOBS_ENABLED"):
+        run_job_now(job)
+
+
+def send_paid_payment(payment: DynamicsPayment) -> bool:
+    """Tell the MOD Copying app that a Dynamics payment has been paid."""
+    if not send_payment_to_mod_copying_app(payment):
+        return False
+    payment.status = SENT_STATUS
+    db.session.commit()
+    return True
+
+
+@job_handler(SEND_PAID_PAYMENT_JOB)
+def send_paid_payment_job(id: str) -> None:
+    payment = get_dynamics_payment(id)
+    if payment is None:
+        raise ValueError(f"Payment not found: {id}")
+    if not send_paid_payment(payment):
+        raise RuntimeError(f"Failed to send payment {id} to the MOD Copying app")
@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from collections import deque
+from statistics import quantiles
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Settings for each upstream which differ from the HTTP_* config defaults. These
+# can be changed per environment with HTTP_UPSTREAM_OVERRIDES.
+UPSTREAM_DEFAULTS = {
+    "gov_uk_pay": {},
+    # GetCountry and GetDeliveryPrice only look things up, so their POSTs are
+    # safe to retry
+    "record_copying_service": {"read_timeout": 5, "retry_post": True},
+    "mod_copying": {},
+}
+
+RETRY_STATUSES = (502, 503, 504)
+
+LATENCY_SAMPLES = 1000
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class UpstreamLatency:
+    """Latency of recent calls to one upstream, kept in this process."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+
+    def record(self, elapsed_ms: float, failed: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.errors += failed
+            self.samples.append(elapsed_ms)
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = list(self.samples)
+            summary = {"calls": self.calls, "errors": self.errors}
+        if len(samples) > 1:
+            percentiles = quantiles(samples, n=100)
+            summary |= {
+                "p50_ms": percentiles[49],
+                "p95_ms": percentiles[94],
+                "p99_ms": percentiles[98],
+            }
+        return summary
+
+
+_latency = {upstream: UpstreamLatency() for upstream in UPSTREAM_DEFAULTS}
+
+
+def _reset_after_fork() -> None:
+    # Pooled connections can't be shared with a forked worker, so each process
+    # opens its own
+    _sessions.clear()
+    for latency in _latency.values():
+        latency.__init__()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def upstream_settings(upstream: str) -> dict:
+    if upstream not in UPSTREAM_DEFAULTS:
+        raise ValueError(f"Unknown upstream: {upstream}")
+    config = current_app.config
+    return (
+        {
+            "connect_timeout": config.get("HTTP_CONNECT_TIMEOUT"),
+            "read_timeout": config.get("HTTP_READ_TIMEOUT"),
+            "retries": config.get("HTTP_RETRIES"),
+            "backoff_factor": config.get("HTTP_RETRY_BACKOFF_FACTOR"),
+            "pool_maxsize": config.get("HTTP_POOL_MAXSIZE"),
+            "retry_post": False,
+        }
+        | UPSTREAM_DEFAULTS[upstream]
+        | (config.get("HTTP_UPSTREAM_OVERRIDES") or {}).get(upstream, {})
+    )
+
+
+def _build_session(settings: dict) -> requests.Session:
+    allowed_methods = Retry.DEFAULT_ALLOWED_METHODS
+    if settings["retry_post"]:
+        allowed_methods = allowed_methods | {"POST"}
+    retry = Retry(
+        total=settings["retries"],
+        backoff_factor=settings["backoff_factor"],
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=allowed_methods,
+        # Give the caller the last response rather than raising, so the status
+        # is handled in the same way as when nothing was retried
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=settings["pool_maxsize"], max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(upstream: str) -> requests.Session:
+    """
+    Get this process's pooled session for an upstream, which keeps connections
+    open between calls and retries idempotent requests which fail.
+    """
+    settings = upstream_settings(upstream)
+    key = (upstream, tuple(sorted(settings.items())))
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.setdefault(key, _build_session(settings))
+    return session
+
+
+def request(upstream: str, method: str, url: str, **kwargs) -> requests.Response:
+    settings = upstream_settings(upstream)
+    kwargs.setdefault(
+        "timeout", (settings["connect_timeout"], settings["read_timeout"])
+    )
+    start = time.perf_counter()
+    failed = True
+    try:
+        response = get_session(upstream).request(method, url, **kwargs)
+        failed = not response.ok
+        return response
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        _latency[upstream].record(elapsed_ms, failed)
+        slow_ms = current_app.config.get("HTTP_SLOW_REQUEST_MS")
+        if slow_ms and elapsed_ms > slow_ms:
+            current_app.logger.warning(
+                f"{method} to {upstream} took {elapsed_ms:.0f}ms: {url}"
+            )
+
+
+def get(upstream: str, url: str, **kwargs) -> requests.Response:
+    return request(upstream, "GET", url, **kwargs)
+
+
+def post(upstream: str, url: str, **kwargs) -> requests.Response:
+    return request(upstream, "POST", url, **kwargs)
+
+
+def upstream_latency() -> dict:
+    """Summarise the latency of recent calls to each upstream from this process."""
+    return {upstream: latency.summary() for upstream, latency in _latency.items()}
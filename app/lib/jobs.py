@@ -0,0 +1,247 @@
+"""
+An outbox of work to do after a change is committed, such as sending a paid
+request to Dynamics.
+
+Jobs are written in the same transaction as the change which needs them, then
+run straight away or by the background job worker. Jobs which fail are retried
+with exponential backoff until they have been tried BACKGROUND_JOB_MAX_ATTEMPTS
+times. Completed jobs are kept for BACKGROUND_JOB_RETENTION_DAYS, then purged by
+archive_old_records.py.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable
+
+from flask import current_app
+from sqlalchemy import func
+
+from app.lib.batch_workers import drain, lock_next_batch
+from app.lib.db.constants import (
+    COMPLETED_JOB_STATUS,
+    FAILED_JOB_STATUS,
+    QUEUED_JOB_STATUS,
+    RUNNING_JOB_STATUS,
+)
+from app.lib.db.models import BackgroundJob, db
+
+JOB_HANDLERS: dict[str, Callable] = {}
+
+UNFINISHED_JOB_STATUSES = (QUEUED_JOB_STATUS, RUNNING_JOB_STATUS)
+
+
+def job_handler(job_type: str):
+    """Register a function to run the jobs of a type, which are passed their payload as keyword arguments."""
+
+    def decorator(function):
+        JOB_HANDLERS[job_type] = function
+        return function
+
+    return decorator
+
+
+def enqueue_job(job_type: str, **payload) -> BackgroundJob:
+    """
+    Add a job to the session without committing it, so that it is queued in the
+    same transaction as the change which needs it.
+    """
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"No handler for job type: {job_type}")
+    job = BackgroundJob(
+        job_type=job_type, payload=payload, next_attempt_at=datetime.now()
+    )
+    db.session.add(job)
+    return job
+
+
+def _due_jobs(now: datetime, job_types: list[str] | None = None):
+    """
+    Jobs which are queued and due, or were claimed by a worker which stopped
+    before finishing them.
+    """
+    query = db.session.query(BackgroundJob).filter(
+        BackgroundJob.status.in_(UNFINISHED_JOB_STATUSES),
+        BackgroundJob.next_attempt_at <= now,
+    )
+    if job_types:
+        query = query.filter(BackgroundJob.job_type.in_(job_types))
+    return query
+
+
+def _claim(claim_id: str, now: datetime) -> dict:
+    claim_timeout = current_app.config.get("BACKGROUND_JOB_CLAIM_TIMEOUT")
+    return {
+        "status": RUNNING_JOB_STATUS,
+        "claim_id": claim_id,
+        "next_attempt_at": now + timedelta(seconds=claim_timeout),
+    }
+
+
+def claim_jobs(limit: int, job_types: list[str] | None = None) -> list[BackgroundJob]:
+    """
+    Claim up to `limit` due jobs, oldest first, skipping jobs which another
+    worker is claiming at the same time.
+
+    Claiming sets next_attempt_at to when the claim expires, so that a job is
+    run again if the worker running it stops before it finishes.
+    """
+    now = datetime.now()
+    claim_id = str(uuid.uuid4())
+    due_ids = [
+        job_id
+        for (job_id,) in lock_next_batch(
+            _due_jobs(now, job_types)
+            .with_entities(BackgroundJob.id)
+            .order_by(BackgroundJob.next_attempt_at),
+            limit,
+        )
+    ]
+    if not due_ids:
+        db.session.commit()
+        return []
+
+    # Only claim jobs which are still due, as without row locks another worker
+    # may have claimed them since they were selected
+    _due_jobs(now).filter(BackgroundJob.id.in_(due_ids)).update(
+        _claim(claim_id, now), synchronize_session=False
+    )
+    db.session.commit()
+    return (
+        db.session.query(BackgroundJob)
+        .filter_by(claim_id=claim_id)
+        .order_by(BackgroundJob.created_at)
+        .all()
+    )
+
+
+def retry_delay(attempts: int) -> timedelta:
+    base_delay = current_app.config.get("BACKGROUND_JOB_RETRY_DELAY")
+    max_delay = current_app.config.get("BACKGROUND_JOB_MAX_RETRY_DELAY")
+    return timedelta(seconds=min(base_delay * 2 ** (attempts - 1), max_delay))
+
+
+def run_job(job: BackgroundJob) -> bool:
+    """Run a claimed job, then mark it as completed or schedule its next attempt."""
+    job_id, job_type = job.id, job.job_type
+    try:
+        JOB_HANDLERS[job_type](**job.payload)
+        error = None
+    except Exception as e:
+        db.session.rollback()
+        error = f"{type(e).__name__}: {e}"
+
+    job.attempts += 1
+    job.claim_id = None
+    if error is None:
+        job.status = COMPLETED_JOB_STATUS
+        job.finished_at = datetime.now()
+        job.last_error = None
+    elif job.attempts >= current_app.config.get("BACKGROUND_JOB_MAX_ATTEMPTS"):
+        current_app.logger.error(
+            f"Background job {job_id} ({job_type}) failed for the last time: {error}"
+        )
+        job.status = FAILED_JOB_STATUS
+        job.finished_at = datetime.now()
+        job.last_error = error
+    else:
+        current_app.logger.warning(
+            f"Background job {job_id} ({job_type}) failed on attempt {job.attempts}: {error}"
+        )
+        job.status = QUEUED_JOB_STATUS
+        job.next_attempt_at = datetime.now() + retry_delay(job.attempts)
+        job.last_error = error
+    db.session.commit()
+    return error is None
+
+
+def run_job_now(job: BackgroundJob) -> bool:
+    """Run a job which has just been committed, as long as nothing else has claimed it."""
+    now = datetime.now()
+    claimed = (
+        _due_jobs(now)
+        .filter(BackgroundJob.id == job.id)
+        .update(_claim(str(uuid.uuid4()), now), synchronize_session=False)
+    )
+    db.session.commit()
+    return bool(claimed) and run_job(job)
+
+
+def run_pending_jobs(
+    limit: int | None = None, job_types: list[str] | None = None
+) -> int:
+    """Claim and run a batch of due jobs. Returns the number run."""
+    jobs = claim_jobs(
+        limit or current_app.config.get("BACKGROUND_JOB_BATCH_SIZE"), job_types
+    )
+    for job in jobs:
+        run_job(job)
+    return len(jobs)
+
+
+def run_due_jobs(
+    job_types: list[str] | None = None, concurrency: int | None = None
+) -> int:
+    """
+    Run due jobs a batch at a time until there are none left, from several
+    workers at once if BACKGROUND_JOB_CONCURRENCY is set. Returns the number run.
+    """
+    return drain(
+        lambda: run_pending_jobs(job_types=job_types),
+        concurrency or current_app.config.get("BACKGROUND_JOB_CONCURRENCY"),
+    )
+
+
+def purge_completed_jobs(days: int | None = None, batch_size: int | None = None) -> int:
+    """Delete jobs which completed more than BACKGROUND_JOB_RETENTION_DAYS ago, a batch at a time. Returns the number deleted."""
+    cutoff = datetime.now() - timedelta(
+        days=days or current_app.config.get("BACKGROUND_JOB_RETENTION_DAYS")
+    )
+    batch_size = batch_size or current_app.config.get("ARCHIVE_BATCH_SIZE")
+    purged = 0
+    while True:
+        ids = [
+            id
+            for (id,) in lock_next_batch(
+                db.session.query(BackgroundJob.id).filter(
+                    BackgroundJob.status == COMPLETED_JOB_STATUS,
+                    BackgroundJob.finished_at < cutoff,
+                ),
+                batch_size,
+            )
+        ]
+        if ids:
+            db.session.query(BackgroundJob).filter(BackgroundJob.id.in_(ids)).delete(
+                synchronize_session=False
+            )
+        db.session.commit()
+        if not ids:
+            return purged
+        purged += len(ids)
+
+
+def unfinished_job_payloads(job_type: str) -> list[dict]:
+    return [
+        payload
+        for (payload,) in db.session.query(BackgroundJob.payload).filter(
+            BackgroundJob.job_type == job_type,
+            BackgroundJob.status.in_(UNFINISHED_JOB_STATUSES),
+        )
+    ]
+
+
+def outbox_backlog() -> dict[str, dict]:
+    """Count the jobs of each type which haven't finished, and when the oldest was queued."""
+    rows = (
+        db.session.query(
+            BackgroundJob.job_type,
+            func.count(BackgroundJob.id),
+            func.min(BackgroundJob.created_at),
+            func.max(BackgroundJob.attempts),
+        )
+        .filter(BackgroundJob.status.in_(UNFINISHED_JOB_STATUSES))
+        .group_by(BackgroundJob.job_type)
+    )
+    return {
+        job_type: {"count": count, "oldest": oldest, "max_attempts": max_attempts}
+        for job_type, count, oldest, max_attempts in rows
+    }
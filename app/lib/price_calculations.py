@@ -2,6 +2,7 @@ import requests
 from flask import current_app
 
 from app.constants import ORDER_TYPES, OrderFeesPence
+from app.lib import http_client
 
 OPTION_MAP = {
     "standard": {
@@ -19,7 +20,8 @@ def calculate_delivery_fee(country: str) -> int:
     payload = {"A3Colour": 10, "Country": country, "IsTracking": True}
 
     try:
-        response = requests.post(
+        response = http_client.post(
+            "record_copying_service",
             current_app.config["DELIVERY_FEE_API_URL"],
             json=payload,
             headers={"Content-Type": "application/json"},
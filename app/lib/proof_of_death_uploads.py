@@ -0,0 +1,135 @@
+"""
+Uploading proofs of death to S3 in the background, when
+PROOF_OF_DEATH_UPLOAD_MODE is "background".
+
+The file is saved to PROOF_OF_DEATH_SPOOL_DIR and the journey continues straight
+away with the key it will be uploaded as. The upload is tracked in the
+proof_of_death_uploads table and queued as a background job, which is started in
+this process straight away and retried by the background job worker if it
+fails, so the worker needs to be able to read the spool directory. Paid
+requests aren't sent on until their proof of death has been uploaded.
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+from flask import current_app
+from werkzeug.datastructures.file_storage import FileStorage
+
+from app.lib.aws import new_proof_of_death_key, upload_spooled_proof_of_death
+from app.lib.db.constants import (
+    COMPLETED_UPLOAD_STATUS,
+    FAILED_UPLOAD_STATUS,
+    PENDING_UPLOAD_STATUS,
+)
+from app.lib.db.models import BackgroundJob, ProofOfDeathUpload, db
+from app.lib.jobs import enqueue_job, job_handler, run_job_now
+
+UPLOAD_PROOF_OF_DEATH_JOB = "upload_proof_of_death"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    # A forked worker doesn't get the parent's threads, so it starts its own
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get("PROOF_OF_DEATH_UPLOAD_WORKERS"),
+                    thread_name_prefix="proof-of-death-upload",
+                )
+    return _executor
+
+
+def spool_proof_of_death(file: FileStorage) -> str | None:
+    """
+    Save a proof of death to the spool directory and queue it to be uploaded.
+
+    Returns the key it will be uploaded as, or None if the file is empty.
+    """
+    key_name = new_proof_of_death_key(file.filename)
+    filename = os.path.basename(key_name)
+    spool_dir = current_app.config.get("PROOF_OF_DEATH_SPOOL_DIR")
+    os.makedirs(spool_dir, exist_ok=True)
+    spool_path = os.path.join(spool_dir, filename)
+
+    file.save(spool_path)
+    if not os.path.getsize(spool_path):
+        current_app.logger.error("File is empty, cannot upload to S3.")
+        os.remove(spool_path)
+        return None
+
+    db.session.add(ProofOfDeathUpload(filename=filename, spool_path=spool_path))
+    job = enqueue_job(UPLOAD_PROOF_OF_DEATH_JOB, filename=filename, key_name=key_name)
+    db.session.commit()
+
+    start_upload(job.id)
+    return key_name
+
+
+def start_upload(job_id: str) -> Future:
+    """Run an upload job in a thread of this process, unless a worker has claimed it."""
+    app = current_app._get_current_object()
+
+    def upload() -> None:
+        with app.app_context():
+            run_job_now(db.session.get(BackgroundJob, job_id))
+
+    return _get_executor().submit(upload)
+
+
+@job_handler(UPLOAD_PROOF_OF_DEATH_JOB)
+def upload_proof_of_death_job(filename: str, key_name: str) -> None:
+    upload = db.session.get(ProofOfDeathUpload, filename)
+    if upload is None:
+        raise ValueError(f"Proof of death upload not found: {filename}")
+    if upload.status != PENDING_UPLOAD_STATUS:
+        return
+
+    upload.attempts += 1
+    try:
+        error = (
+            None
+            if upload_spooled_proof_of_death(upload.spool_path, key_name)
+            else "Proof of death bucket configuration is missing."
+        )
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    if error is None:
+        upload.status = COMPLETED_UPLOAD_STATUS
+        upload.uploaded_at = datetime.now()
+        upload.last_error = None
+        db.session.commit()
+        try:
+            os.remove(upload.spool_path)
+        except FileNotFoundError:
+            pass
+        return
+
+    # The job is rolled back when it raises, so the failure is committed first
+    upload.last_error = error
+    if upload.attempts >= current_app.config.get("BACKGROUND_JOB_MAX_ATTEMPTS"):
+        upload.status = FAILED_UPLOAD_STATUS
+    db.session.commit()
+    raise RuntimeError(f"Failed to upload proof of death {filename}: {error}")
+
+
+def proof_of_death_upload_status(filename: str) -> str | None:
+    """The status of a proof of death uploaded in the background, or None if it wasn't."""
+    upload = db.session.get(ProofOfDeathUpload, filename)
+    return upload.status if upload else None
@@ -3,6 +3,8 @@ import datetime
 from flask import session as flask_session
 from werkzeug.datastructures import FileStorage
 
+from app.constants import DATE_FORMAT
+
 
 def save_submitted_form_fields_to_session(
     form,
@@ -26,10 +28,10 @@ def save_submitted_form_fields_to_session(
                 field_data = field_data.filename or "EMPTY"
 
             if isinstance(field_data, datetime.date):
-                field_data = field_data.strftime("%d %B %Y")
+                field_data = field_data.strftime(DATE_FORMAT)
 
             if isinstance(field_data, datetime.datetime):
-                field_data = field_data.date().strftime("%d %B %Y")
+                field_data = field_data.date().strftime(DATE_FORMAT)
 
             data[field_name] = field_data
 
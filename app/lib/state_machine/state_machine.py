@@ -4,30 +4,23 @@ from flask import current_app, has_app_context, session
 from statemachine import State, StateMachine
 
 from app.constants import MultiPageFormRoutes
-from app.lib.aws import upload_proof_of_death
+from app.lib.aws import upload_proof_of_death, verify_proof_of_death_upload
 from app.lib.boundary_years import BoundaryYears
 from app.lib.db.constants import (
     EXPIRED_STATUS,
     PAID_STATUS,
     SENT_STATUS,
 )
+from app.lib.proof_of_death_uploads import spool_proof_of_death
 
 
-class RoutingStateMachine(StateMachine):
+class RoutingGuards:
     """
-    _route_for_current_state is updated by entering_* methods. to hold the route associated with the current state
-    It is then used by the route handlers to redirect to the correct page after a state transition
-    """
-
-    _route_for_current_state = None
+    The conditions used to choose between transitions, and the form helpers they rely on.
 
-    @property
-    def route_for_current_state(self):
-        return self._route_for_current_state
-
-    @route_for_current_state.setter
-    def route_for_current_state(self, value):
-        self._route_for_current_state = value
+    These are shared by RoutingStateMachine and the precompiled RoutingStateCursor so
+    that both make exactly the same routing decisions.
+    """
 
     def get_form_field_data(self, form, field_name):
         """Helper method to get the data for a specific field from the form with error handling."""
@@ -49,6 +42,136 @@ class RoutingStateMachine(StateMachine):
                 f"Form ({form}) does not have field '{field_name}'"
             )
 
+    def living_subject(self, form):
+        """Condition method to determine if the service person is alive."""
+        return self.get_form_field_data(form, "is_service_person_alive") == "yes"
+
+    def is_royal_navy(self, form):
+        """Condition method to determine if the service branch is Royal Navy."""
+        return form.service_branch.data in ["ROYAL_NAVY"]
+
+    def likely_unfindable(self, form):
+        """Condition method to determine if we may be unable to find the record."""
+        return self.get_form_field_data(form, "service_branch") in ["HOME_GUARD"]
+
+    def was_officer(self, form):
+        """Condition method to determine if the service person was an officer."""
+        return form.were_they_a_commissioned_officer.data == "yes"
+
+    def service_branch_is_army(self, form):
+        """Condition method to determine if the service branch is British Army."""
+        return form.service_branch.data == "BRITISH_ARMY"
+
+    def service_branch_is_raf(self, form):
+        """Condition method to determine if the service branch is Royal Air Force."""
+        return form.service_branch.data == "ROYAL_AIR_FORCE"
+
+    def service_branch_is_other(self, form):
+        """Condition method to determine if the service branch is Other."""
+        return form.service_branch.data == "OTHER"
+
+    def service_branch_is_unknown(self, form):
+        """Condition method to determine if the service branch is Unknown."""
+        return form.service_branch.data == "UNKNOWN"
+
+    def born_too_late(self, form):
+        """Condition method to determine if the service person's date of birth is too late for TNA to have record."""
+        return (
+            form.date_of_birth.data.year
+            > BoundaryYears.LATEST_SERVICE_PERSON_BIRTH_YEAR_FOR_THIS_SERVICE
+        )
+
+    def birth_year_requires_proof_of_death(self, form):
+        """Condition method to determine if the service person's date of birth requires a proof of death."""
+        return (
+            form.date_of_birth.data.year
+            >= BoundaryYears.first_birth_year_for_closed_records(datetime.now().year)
+        )
+
+    def does_not_have_email(self, form):
+        """Condition method to determine if the user does not have an email address."""
+        return form.does_not_have_email.data
+
+    def does_not_have_proof_of_death(self, form):
+        """Condition method to determine if the user does not have a proof of death."""
+        return form.do_you_have_a_proof_of_death.data == "no"
+
+    def happy_to_proceed_without_proof_of_death(self, form):
+        """Condition method to determine if the user is happy to proceed without a proof of death."""
+        return (
+            form.are_you_sure_you_want_to_proceed_without_proof_of_death.data == "yes"
+        )
+
+    def user_has_not_uploaded_proof_of_death(self, form):
+        """Condition method to determine if no proof of death was uploaded."""
+        return not form.proof_of_death.data
+
+    def proof_of_death_uploaded_to_s3(self, form):
+        """Condition method to determine if proof of death was successfully uploaded to S3."""
+        if file_data := self.get_form_field_data(form, "proof_of_death"):
+            upload_mode = (
+                current_app.config.get("PROOF_OF_DEATH_UPLOAD_MODE")
+                if has_app_context()
+                else None
+            )
+            if upload_mode == "direct" and isinstance(file_data, str):
+                # The key of a file the browser uploaded straight to S3
+                file = verify_proof_of_death_upload(file_data)
+            elif upload_mode == "background":
+                # Uploaded after the journey continues, with the key it will have
+                file = spool_proof_of_death(file_data)
+            else:
+                file = upload_proof_of_death(file=file_data)
+            if file:
+                holding_prefix = ""
+                if has_app_context():
+                    holding_prefix = current_app.config.get(
+                        "PROOF_OF_DEATH_HOLDING_PREFIX", ""
+                    )
+                if holding_prefix:
+                    normalized_prefix = (
+                        holding_prefix
+                        if holding_prefix.endswith("/")
+                        else f"{holding_prefix}/"
+                    )
+                    if file.startswith(normalized_prefix):
+                        file = file[len(normalized_prefix) :]
+                self.set_form_field_data(form, "proof_of_death", file)
+                return True
+        self.set_form_field_data(form, "proof_of_death", None)
+        return False  # TODO: Does this need to be True if upload fails? They won't progress otherwise.
+
+    # second payment conditions session is set in make_payment
+    def payment_already_received(self):
+        payment_status = session.get("payment_status")
+        return payment_status and (payment_status in [PAID_STATUS, SENT_STATUS])
+
+    def second_payment_link_expired(self):
+        payment_status = session.get("payment_status")
+        return payment_status and (payment_status == EXPIRED_STATUS)
+
+    def not_a_valid_link(self):
+        # Treat a link as invalid if payment attribute is missing or None
+        payment_status = session.get("payment_status")
+        return payment_status is None
+
+
+class RoutingStateMachine(RoutingGuards, StateMachine):
+    """
+    _route_for_current_state is updated by entering_* methods. to hold the route associated with the current state
+    It is then used by the route handlers to redirect to the correct page after a state transition
+    """
+
+    _route_for_current_state = None
+
+    @property
+    def route_for_current_state(self):
+        return self._route_for_current_state
+
+    @route_for_current_state.setter
+    def route_for_current_state(self, value):
+        self._route_for_current_state = value
+
     """
     These are our States. They represent the different stages of the user journey. In most cases, you
     can think of a state as representing a form or page being presented to the user.
@@ -447,7 +570,9 @@ class RoutingStateMachine(StateMachine):
         )
 
     def entering_are_you_sure_you_want_to_proceed_without_proof_of_death_form(self):
-        self.route_for_current_state = MultiPageFormRoutes.ARE_YOU_SURE_YOU_WANT_TO_PROCEED_WITHOUT_PROOF_OF_DEATH.value
+        self.route_for_current_state = (
+            MultiPageFormRoutes.ARE_YOU_SURE_YOU_WANT_TO_PROCEED_WITHOUT_PROOF_OF_DEATH.value
+        )
 
     def entering_are_you_sure_you_want_to_cancel_form(self):
         self.route_for_current_state = (
@@ -523,104 +648,3 @@ class RoutingStateMachine(StateMachine):
         self.route_for_current_state = (
             MultiPageFormRoutes.SEND_TO_GOV_UK_PAY_SECOND_PAYMENT.value
         )
-
-    def living_subject(self, form):
-        """Condition method to determine if the service person is alive."""
-        return self.get_form_field_data(form, "is_service_person_alive") == "yes"
-
-    def is_royal_navy(self, form):
-        """Condition method to determine if the service branch is Royal Navy."""
-        return form.service_branch.data in ["ROYAL_NAVY"]
-
-    def likely_unfindable(self, form):
-        """Condition method to determine if we may be unable to find the record."""
-        return self.get_form_field_data(form, "service_branch") in ["HOME_GUARD"]
-
-    def was_officer(self, form):
-        """Condition method to determine if the service person was an officer."""
-        return form.were_they_a_commissioned_officer.data == "yes"
-
-    def service_branch_is_army(self, form):
-        """Condition method to determine if the service branch is British Army."""
-        return form.service_branch.data == "BRITISH_ARMY"
-
-    def service_branch_is_raf(self, form):
-        """Condition method to determine if the service branch is Royal Air Force."""
-        return form.service_branch.data == "ROYAL_AIR_FORCE"
-
-    def service_branch_is_other(self, form):
-        """Condition method to determine if the service branch is Other."""
-        return form.service_branch.data == "OTHER"
-
-    def service_branch_is_unknown(self, form):
-        """Condition method to determine if the service branch is Unknown."""
-        return form.service_branch.data == "UNKNOWN"
-
-    def born_too_late(self, form):
-        """Condition method to determine if the service person's date of birth is too late for TNA to have record."""
-        return (
-            form.date_of_birth.data.year
-            > BoundaryYears.LATEST_SERVICE_PERSON_BIRTH_YEAR_FOR_THIS_SERVICE
-        )
-
-    def birth_year_requires_proof_of_death(self, form):
-        """Condition method to determine if the service person's date of birth requires a proof of death."""
-        return (
-            form.date_of_birth.data.year
-            >= BoundaryYears.first_birth_year_for_closed_records(datetime.now().year)
-        )
-
-    def does_not_have_email(self, form):
-        """Condition method to determine if the user does not have an email address."""
-        return form.does_not_have_email.data
-
-    def does_not_have_proof_of_death(self, form):
-        """Condition method to determine if the user does not have a proof of death."""
-        return form.do_you_have_a_proof_of_death.data == "no"
-
-    def happy_to_proceed_without_proof_of_death(self, form):
-        """Condition method to determine if the user is happy to proceed without a proof of death."""
-        return (
-            form.are_you_sure_you_want_to_proceed_without_proof_of_death.data == "yes"
-        )
-
-    def user_has_not_uploaded_proof_of_death(self, form):
-        """Condition method to determine if no proof of death was uploaded."""
-        return not form.proof_of_death.data
-
-    def proof_of_death_uploaded_to_s3(self, form):
-        """Condition method to determine if proof of death was successfully uploaded to S3."""
-        if file_data := self.get_form_field_data(form, "proof_of_death"):
-            file = upload_proof_of_death(file=file_data)
-            if file:
-                holding_prefix = ""
-                if has_app_context():
-                    holding_prefix = current_app.config.get(
-                        "PROOF_OF_DEATH_HOLDING_PREFIX", ""
-                    )
-                if holding_prefix:
-                    normalized_prefix = (
-                        holding_prefix
-                        if holding_prefix.endswith("/")
-                        else f"{holding_prefix}/"
-                    )
-                    if file.startswith(normalized_prefix):
-                        file = file[len(normalized_prefix) :]
-                self.set_form_field_data(form, "proof_of_death", file)
-                return True
-        self.set_form_field_data(form, "proof_of_death", None)
-        return False  # TODO: Does this need to be True if upload fails? They won't progress otherwise.
-
-    # second payment conditions session is set in make_payment
-    def payment_already_received(self):
-        payment_status = session.get("payment_status")
-        return payment_status and (payment_status in [PAID_STATUS, SENT_STATUS])
-
-    def second_payment_link_expired(self):
-        payment_status = session.get("payment_status")
-        return payment_status and (payment_status == EXPIRED_STATUS)
-
-    def not_a_valid_link(self):
-        # Treat a link as invalid if payment attribute is missing or None
-        payment_status = session.get("payment_status")
-        return payment_status is None
@@ -0,0 +1,122 @@
+import inspect
+from types import MappingProxyType, SimpleNamespace
+from typing import Callable, NamedTuple
+
+from statemachine.exceptions import TransitionNotAllowed
+from statemachine.spec_parser import operator_mapping, parse_boolean_expr
+
+from app.lib.state_machine.state_machine import RoutingGuards, RoutingStateMachine
+
+
+class CompiledTransition(NamedTuple):
+    target: str
+    route: str | None
+    guards: tuple[tuple[Callable, bool], ...]
+
+
+def _compile_guard_name(name: str) -> Callable:
+    """Bind a guard name to a function which passes it only the event arguments it accepts."""
+    guard = getattr(RoutingGuards, name)
+    positional = len(inspect.signature(guard).parameters) - 1
+
+    def call(cursor, *args):
+        return guard(cursor, *args[:positional])
+
+    call.__name__ = name
+    return call
+
+
+def _compile_guard(expression) -> Callable:
+    if not isinstance(expression, str):
+        raise TypeError(f"Only named guards can be compiled, got {expression!r}")
+    # Expressions such as "was_officer and service_branch_is_raf" are parsed by
+    # the library's own parser so that they are evaluated exactly as it would
+    return parse_boolean_expr(expression, _compile_guard_name, operator_mapping)
+
+
+def _route_for_state(state) -> str | None:
+    """Run a state's entering_* callback against a recorder to find the route it sets."""
+    recorder = SimpleNamespace(route_for_current_state=None)
+    for spec in state.enter:
+        if not spec.is_convention:
+            getattr(RoutingStateMachine, spec.func)(recorder)
+    return recorder.route_for_current_state
+
+
+def compile_transition_table(machine=RoutingStateMachine) -> MappingProxyType:
+    """
+    Compile the state machine's graph into event -> source state -> transitions.
+
+    Transitions for each event and source keep their declaration order, which is
+    the order the library tries them in.
+    """
+    routes = {state.id: _route_for_state(state) for state in machine.states}
+    table = {}
+    for state in machine.states:
+        for transition in state.transitions:
+            guards = tuple(
+                (_compile_guard(spec.func), spec.expected_value)
+                for spec in transition.cond
+                if not spec.is_convention
+            )
+            compiled = CompiledTransition(
+                target=transition.target.id,
+                route=routes[transition.target.id],
+                guards=guards,
+            )
+            for event in transition.events:
+                table.setdefault(str(event), {}).setdefault(state.id, []).append(
+                    compiled
+                )
+    return MappingProxyType(
+        {
+            event: MappingProxyType(
+                {source: tuple(transitions) for source, transitions in sources.items()}
+            )
+            for event, sources in table.items()
+        }
+    )
+
+
+TRANSITION_TABLE = compile_transition_table()
+
+_STATES = {state.id: state for state in RoutingStateMachine.states}
+_EVENTS = {event.id: event for event in RoutingStateMachine.events}
+
+
+class RoutingStateCursor(RoutingGuards):
+    """
+    A per-request position in the precompiled RoutingStateMachine graph.
+
+    It has the same continue_* event methods and route_for_current_state as
+    RoutingStateMachine, but creating one only sets two attributes, as the graph
+    is compiled once into TRANSITION_TABLE when this module is imported.
+    """
+
+    def __init__(self):
+        self.current_state_id = RoutingStateMachine.initial_state.id
+        self.route_for_current_state = None
+
+    def send(self, event: str, *args):
+        for transition in TRANSITION_TABLE[event].get(self.current_state_id, ()):
+            if all(
+                bool(guard(self, *args)) == expected
+                for guard, expected in transition.guards
+            ):
+                self.current_state_id = transition.target
+                if transition.route is not None:
+                    self.route_for_current_state = transition.route
+                return
+        raise TransitionNotAllowed(_EVENTS[event], _STATES[self.current_state_id])
+
+
+def _event_method(event: str) -> Callable:
+    def trigger(self, *args):
+        return self.send(event, *args)
+
+    trigger.__name__ = event
+    return trigger
+
+
+for _event in TRANSITION_TABLE:
+    setattr(RoutingStateCursor, _event, _event_method(_event))
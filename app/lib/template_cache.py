@@ -0,0 +1,70 @@
+import os
+import re
+import time
+
+from jinja2 import (
+    FileSystemBytecodeCache,
+    MemcachedBytecodeCache,
+    TemplateError,
+)
+from redis import Redis
+
+TEMPLATE_EXTENSIONS = ["html", "xml", "txt"]
+
+
+def _build_version_key(app) -> str:
+    build_version = app.config.get("BUILD_VERSION") or "local"
+    return re.sub(r"[^A-Za-z0-9._-]", "_", build_version)
+
+
+def init_template_bytecode_cache(app) -> None:
+    """
+    Share compiled template bytecode between workers and restarts.
+
+    Entries are keyed by BUILD_VERSION so that a deploy never picks up bytecode
+    compiled from another release's templates.
+    """
+    cache_type = app.config.get("TEMPLATE_BYTECODE_CACHE_TYPE")
+    if not cache_type:
+        return
+
+    build_version = _build_version_key(app)
+
+    if cache_type == "FileSystemBytecodeCache":
+        directory = app.config.get("TEMPLATE_BYTECODE_CACHE_DIR")
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(
+            directory, pattern=f"__jinja2_{build_version}_%s.cache"
+        )
+    elif cache_type == "RedisBytecodeCache":
+        # redis-py's get/set are compatible with the memcached client interface
+        # that MemcachedBytecodeCache expects
+        app.jinja_env.bytecode_cache = MemcachedBytecodeCache(
+            Redis.from_url(app.config.get("TEMPLATE_BYTECODE_CACHE_REDIS_URL")),
+            prefix=f"jinja2/bytecode/{build_version}/",
+            timeout=app.config.get("TEMPLATE_BYTECODE_CACHE_TIMEOUT"),
+            ignore_memcache_errors=True,
+        )
+    else:
+        app.logger.error(f"Unknown template bytecode cache type: {cache_type}")
+
+
+def warm_up_templates(app) -> int:
+    """
+    Compile every page template and frontend macro before the app serves requests.
+
+    Without this, the first request to each page in a new worker pays for
+    compiling its template and the macros it imports.
+    """
+    start = time.perf_counter()
+    compiled = 0
+    for name in app.jinja_env.list_templates(extensions=TEMPLATE_EXTENSIONS):
+        try:
+            app.jinja_env.get_template(name)
+            compiled += 1
+        except TemplateError as e:
+            app.logger.warning(f"Could not compile template {name}: {e}")
+    app.logger.info(
+        f"Compiled {compiled} templates in {(time.perf_counter() - start) * 1000:.0f}ms"
+    )
+    return compiled
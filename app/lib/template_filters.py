@@ -1,23 +1,116 @@
 import re
 from datetime import datetime
+from functools import wraps
 from urllib.parse import urlencode
 
 from jinja2 import pass_context
+from markupsafe import Markup
 from tna_utilities.string import slugify as slugify_util
 
-from app.constants import ExternalLinks
+from app.constants import DATE_FORMAT, ExternalLinks
 from app.lib.boundary_years import BoundaryYears
 
+# Regex to match [text](url)
+MARKDOWN_LINK_PATTERN = re.compile(r"\[([^\]]+)\]\(([^)]+)\)")
+# Regex to match **text** (non-greedy)
+BOLD_TEXT_PATTERN = re.compile(r"\*\*(.+?)\*\*")
+FIRST_BIRTH_YEAR_FOR_CLOSED_RECORDS_PLACEHOLDER = (
+    "[FIRST_BIRTH_YEAR_FOR_CLOSED_RECORDS]"
+)
+PRICE_PLACEHOLDER_PATTERN = re.compile(r"\[(DELIVERY_FEE|ORDER_TYPE_FEE)\]")
+
+# The strings in content.yaml never change between requests, so the output of a
+# filter for one of them depends only on the filter's arguments and inputs such as
+# the current year. Those outputs are kept here, keyed by filter, string, arguments
+# and inputs, so rendering a page is a dictionary lookup rather than a regex pass.
+_content_strings = frozenset()
+_prerendered = {}
+
+
+def prerendered(inputs=None):
+    """
+    Serve the filter's output for content strings from the pre-rendered table.
+
+    `inputs` returns anything other than the filter arguments that the output
+    depends on, such as the current year. Strings that are not from content.yaml
+    are passed straight to the filter.
+    """
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(s, *args, **kwargs):
+            if not isinstance(s, str) or s not in _content_strings:
+                return function(s, *args, **kwargs)
+
+            key = (
+                function.__name__,
+                s,
+                args,
+                tuple(sorted(kwargs.items())),
+                inputs() if inputs else None,
+            )
+            try:
+                return _prerendered[key]
+            except KeyError:
+                result = Markup(function(s, *args, **kwargs))
+                _prerendered[key] = result
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def prerender_content(*contents):
+    """
+    Rebuild the pre-rendered table from the given parsed content.
+
+    Strings containing Markdown links, bold text or the closed records placeholder
+    are rendered straight away. Outputs that depend on the current endpoint are
+    added the first time each endpoint renders them.
+    """
+    global _content_strings, _prerendered
+
+    strings = set()
+    for content in contents:
+        strings.update(_collect_strings(content))
+
+    _content_strings = frozenset(strings)
+    _prerendered = {}
+
+    for s in strings:
+        if MARKDOWN_LINK_PATTERN.search(s):
+            parse_markdown_links(s)
+            parse_markdown_links(s, new_tab=False)
+        if BOLD_TEXT_PATTERN.search(s):
+            parse_bold_text(s)
+        if FIRST_BIRTH_YEAR_FOR_CLOSED_RECORDS_PLACEHOLDER in s:
+            parse_first_birth_year_for_closed_records(s)
+
+
+def _collect_strings(node):
+    if isinstance(node, str):
+        yield node
+    elif isinstance(node, dict):
+        for value in node.values():
+            yield from _collect_strings(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _collect_strings(item)
+
+
+def _current_year():
+    return datetime.now().year
+
 
 def slugify(s):
     return slugify_util(s)
 
 
+@prerendered()
 def parse_markdown_links(s, new_tab=True):
     if not s:
         return s
-    # Regex to match [text](url)
-    pattern = re.compile(r"\[([^\]]+)\]\(([^)]+)\)")
 
     def replacer(match):
         text = match.group(1)
@@ -26,14 +119,15 @@ def parse_markdown_links(s, new_tab=True):
         attrs = ' target="_blank" rel="noreferrer noopener"' if new_tab else ""
         return f'<a href="{url}"{attrs}>{text}</a>'
 
-    return pattern.sub(replacer, s)
+    return MARKDOWN_LINK_PATTERN.sub(replacer, s)
 
 
+@prerendered()
 def inject_unique_survey_link(s, current_endpoint=None):
     if not s:
         return s
 
-    match = re.search(r"\[([^\]]+)\]\(([^)]+)\)", s)
+    match = MARKDOWN_LINK_PATTERN.search(s)
     if not match:
         return s
 
@@ -53,32 +147,32 @@ def inject_unique_survey_link(s, current_endpoint=None):
         f'<a href="{url}" target="_blank" rel="noreferrer noopener">{link_text}</a>'
     )
     # Replace only the first match. This function is not a general-purpose link parser
-    return re.sub(r"\[([^]]+)]\(([^)]+)\)", replacement, s, count=1)
+    return MARKDOWN_LINK_PATTERN.sub(lambda _: replacement, s, count=1)
 
 
+@prerendered()
 def parse_bold_text(s):
     if not s:
         return s
-    # Regex to match **text** (non-greedy)
-    pattern = re.compile(r"\*\*(.+?)\*\*")
 
     def replacer(match):
         text = match.group(1)
         return f"<strong>{text}</strong>"
 
-    return pattern.sub(replacer, s)
+    return BOLD_TEXT_PATTERN.sub(replacer, s)
 
 
+@prerendered(inputs=lambda: _current_year())
 def parse_first_birth_year_for_closed_records(s):
     if not s:
         return s
 
-    year = BoundaryYears.first_birth_year_for_closed_records(datetime.now().year)
+    year = BoundaryYears.first_birth_year_for_closed_records(_current_year())
 
     span = f"<span data-last-birth-year-for-open-records='{year}'>{year}</span>"
 
     return s.replace(
-        "[FIRST_BIRTH_YEAR_FOR_CLOSED_RECORDS]",
+        FIRST_BIRTH_YEAR_FOR_CLOSED_RECORDS_PLACEHOLDER,
         span,
     )
 
@@ -97,12 +191,16 @@ def format_standard_printed_order_price(s, delivery_fee, order_type_fee):
         "ORDER_TYPE_FEE": f"<span data-order-type-price>{convert_pence_to_pounds_string(order_type_fee)}</span>",
     }
 
-    pattern = re.compile(r"\[(DELIVERY_FEE|ORDER_TYPE_FEE)\]")
-
     def replacer(m):
         return values[m.group(1)]
 
-    return pattern.sub(replacer, s)
+    return PRICE_PLACEHOLDER_PATTERN.sub(replacer, s)
+
+
+def format_date(value):
+    if value is None:
+        return None
+    return value.strftime(DATE_FORMAT)
 
 
 def convert_pence_to_pounds_string(pence):
@@ -6,6 +6,7 @@ from wtforms import (
     SubmitField,
 )
 
+from app.constants import PROOF_OF_DEATH_EXTENSIONS, PROOF_OF_DEATH_MAX_SIZE
 from app.lib.content import get_field_content, load_content
 
 
@@ -16,13 +17,13 @@ class UploadAProofOfDeath(FlaskForm):
         get_field_content(content, "upload_a_proof_of_death", "label"),
         validators=[
             FileAllowed(
-                upload_set=["pdf", "jpg", "jpeg", "png", "gif"],
+                upload_set=PROOF_OF_DEATH_EXTENSIONS,
                 message=get_field_content(
                     content, "upload_a_proof_of_death", "messages"
                 )["file_allowed"],
             ),
             FileSize(
-                max_size=5 * 1024 * 1024,
+                max_size=PROOF_OF_DEATH_MAX_SIZE,
                 message=get_field_content(
                     content, "upload_a_proof_of_death", "messages"
                 )["file_size"],
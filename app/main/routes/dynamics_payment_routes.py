@@ -3,19 +3,19 @@ from datetime import datetime
 
 from flask import current_app, redirect, render_template, request, session, url_for
 
-from app.lib.aws import send_email
 from app.lib.content import load_content
 from app.lib.db.constants import (
     NEW_STATUS,
 )
 from app.lib.db.db_handler import (
+    DuplicateDynamicsPaymentError,
     add_dynamics_payment,
     add_gov_uk_dynamics_payment,
     delete_dynamics_payment,
     get_dynamics_payment,
 )
-from app.lib.db.models import DynamicsPayment, db
 from app.lib.decorators.state_machine_decorator import with_state_machine
+from app.lib.emails import PAYMENT_LINK_EMAIL, send_templated_email
 from app.lib.gov_uk_pay import (
     create_payment,
 )
@@ -179,18 +179,14 @@ def create_payment_endpoint():
         "details": data.get("details", ""),
     }
 
-    # Check if payment with this reference already exists
-    existing_payment = (
-        db.session.query(DynamicsPayment).filter_by(reference=data["reference"]).first()
-    )
-
-    if existing_payment:
+    # References are unique, so a duplicate is rejected by the insert itself
+    try:
+        payment = add_dynamics_payment(data)
+    except DuplicateDynamicsPaymentError:
         return {
             "error": f"A payment request for this reference ({data['reference']}) already exists"
         }, 500
 
-    payment = add_dynamics_payment(data)
-
     if payment is None:
         return {"error": "Failed to create payment"}, 500
 
@@ -198,10 +194,15 @@ def create_payment_endpoint():
     name = f"{payment.first_name or ''} {payment.last_name or ''}".strip() or "customer"
     amount_pounds = payment.total_amount / 100
 
-    if send_email(
+    if send_templated_email(
         to=data["payee_email"],
-        subject="Payment for Service Record Request",
-        body=f"Dear {name},\n\nThank you for submitting your request to Request a military service record for {payment.case_number}.\n\nPlease visit the following link to complete your payment of £{amount_pounds:.2f}: {payment_url}\n\nThis payment link will expire in 30 days. If it expires, please contact us.\n\nOnce payment has been received, we will send you a link to download your requested copies.\n\nThank you,\nRequest a military service record team\nThe National Archives",
+        template=PAYMENT_LINK_EMAIL,
+        data={
+            "name": name,
+            "case_number": payment.case_number,
+            "amount": f"{amount_pounds:.2f}",
+            "payment_url": payment_url,
+        },
     ):
         return {"message": f"Payment created and sent successfully: {payment.id}"}, 201
     else:
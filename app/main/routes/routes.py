@@ -1,6 +1,8 @@
-from flask import redirect, render_template, request, session, url_for
+from flask import current_app, redirect, render_template, request, session, url_for
 
 from app.constants import ExternalLinks, MultiPageFormRoutes
+from app.lib.aws import create_proof_of_death_upload
+from app.lib.cache import cache_page
 from app.lib.content import load_content
 from app.lib.db.constants import PAID_STATUS, SENT_STATUS
 from app.lib.db.db_handler import get_service_record_request
@@ -125,6 +127,7 @@ def are_you_sure_you_want_to_cancel(form, state_machine):
 
 
 @bp.route("/you-have-cancelled-your-request/", methods=["GET"])
+@cache_page
 def you_have_cancelled_your_request():
     return render_template(
         "main/you-have-cancelled-your-request.html", content=load_content()
@@ -177,6 +180,7 @@ def subject_access_request(state_machine):
 
 
 @bp.route("/only-living-subjects-can-request-their-record/", methods=["GET"])
+@cache_page
 def only_living_subjects_can_request_their_record():
     return render_template(
         "main/only-living-subjects-can-request-their-record.html",
@@ -540,14 +544,46 @@ def choose_your_order_type(state_machine):
 @with_form_prefilled_from_session(UploadAProofOfDeath)
 @with_state_machine
 def upload_a_proof_of_death(form, state_machine):
-    if form.validate_on_submit():
+    content = load_content()
+    direct_upload_mode = (
+        current_app.config.get("PROOF_OF_DEATH_UPLOAD_MODE") == "direct"
+    )
+
+    # S3 redirects back here with the key of a file uploaded straight to it
+    if direct_upload_mode and (key := request.args.get("key")):
+        upload_prefix = session.pop("proof_of_death_upload_prefix", None)
+        if upload_prefix and key.startswith(upload_prefix):
+            form.proof_of_death.data = key
+            state_machine.continue_from_upload_a_proof_of_death_form(form)
+            if form.proof_of_death.data:
+                save_submitted_form_fields_to_session(form)
+                return redirect(url_for(state_machine.route_for_current_state))
+        form.proof_of_death.data = None
+        form.proof_of_death.errors = [
+            content["forms"]["fields"]["upload_a_proof_of_death"]["messages"][
+                "upload_failed"
+            ]
+        ]
+
+    # Submitting without a file, including continuing without one in direct
+    # mode, continues the journey without a proof of death
+    elif form.validate_on_submit():
         state_machine.continue_from_upload_a_proof_of_death_form(form)
         save_submitted_form_fields_to_session(form)
         return redirect(url_for(state_machine.route_for_current_state))
+
+    direct_upload = None
+    if direct_upload_mode:
+        direct_upload = create_proof_of_death_upload(
+            url_for("main.upload_a_proof_of_death", _external=True)
+        )
+        if direct_upload:
+            session["proof_of_death_upload_prefix"] = direct_upload["key_prefix"]
     return render_template(
         "main/upload-a-proof-of-death.html",
         form=form,
-        content=load_content(),
+        direct_upload=direct_upload,
+        content=content,
         back_link_route=get_dynamic_back_link_route(key=request.endpoint),
     )
 
@@ -620,6 +656,7 @@ def payment_summary():
 
 
 @bp.route("/second-payment-link-expired/", methods=["GET"])
+@cache_page
 def second_payment_link_expired():
     return render_template(
         "main/payment/payment-link-expired.html", content=load_content()
@@ -627,6 +664,7 @@ def second_payment_link_expired():
 
 
 @bp.route("/payment-already-received/", methods=["GET"])
+@cache_page
 def payment_already_received():
     return render_template(
         "main/payment/payment-already-made.html",
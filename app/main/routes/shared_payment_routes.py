@@ -1,5 +1,6 @@
 from flask import abort, current_app, redirect, render_template, session, url_for
 
+from app.lib.cache import cache_page
 from app.lib.content import load_content
 from app.lib.db.db_handler import (
     get_gov_uk_dynamics_payment,
@@ -91,6 +92,7 @@ def handle_gov_uk_pay_response(payment_type, id):
 
 
 @bp.route("/confirm-payment-received/")
+@cache_page
 def confirm_payment_received():
     content = load_content()
     return render_template(
@@ -112,6 +114,7 @@ def payment_incomplete(form, state_machine):
 
 
 @bp.route("/payment-link-creation-failed/")
+@cache_page
 def payment_link_creation_failed():
     content = load_content()
     return render_template(
@@ -1,9 +1,11 @@
 from flask import make_response, render_template
 
+from app.lib.cache import cache_page
 from app.sitemap import bp
 
 
 @bp.route("/sitemap.xml")
+@cache_page
 def index():
     xml_sitemap_index = render_template(
         "sitemap.xml",
@@ -0,0 +1,120 @@
+"""
+Command to archive sent and expired requests and payments.
+
+This is intended to be run as a cron job. Sent requests and Dynamics payments
+which were paid more than ARCHIVE_AFTER_DAYS ago, and expired ones which were
+created more than ARCHIVE_AFTER_DAYS ago, are moved a batch at a time into
+archive tables with the same columns, so that the tables the app works from
+only hold recent rows. Lookups by id fall back to the archive.
+
+Background jobs which completed more than BACKGROUND_JOB_RETENTION_DAYS ago are
+deleted.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, delete, insert, literal, or_, select
+
+from app import create_app
+from app.lib.batch_workers import drain, lock_next_batch
+from app.lib.db.constants import EXPIRED_STATUS, SENT_STATUS
+from app.lib.db.models import (
+    ArchivedDynamicsPayment,
+    ArchivedGOVUKDynamicsPayment,
+    ArchivedServiceRecordRequest,
+    DynamicsPayment,
+    GOVUKDynamicsPayment,
+    ServiceRecordRequest,
+    db,
+)
+from app.lib.jobs import purge_completed_jobs
+
+
+def _move_rows(model, archive_model, where, archived_at: datetime) -> None:
+    columns = list(model.__table__.columns)
+    db.session.execute(
+        insert(archive_model).from_select(
+            [column.name for column in columns] + ["archived_at"],
+            select(*columns, literal(archived_at)).where(where),
+        )
+    )
+    db.session.execute(delete(model).where(where))
+
+
+def _archive_batch(model, archive_model, cutoff: datetime, batch_size: int) -> list:
+    ids = [
+        id
+        for (id,) in lock_next_batch(
+            db.session.query(model.id)
+            .filter(
+                # Expired rows have no timestamp of their own, so are aged from
+                # when they were created
+                or_(
+                    and_(model.status == SENT_STATUS, model.payment_date < cutoff),
+                    and_(model.status == EXPIRED_STATUS, model.created_at < cutoff),
+                )
+            )
+            .order_by(model.created_at),
+            batch_size,
+        )
+    ]
+    if ids:
+        archived_at = datetime.now()
+        if model is DynamicsPayment:
+            _move_rows(
+                GOVUKDynamicsPayment,
+                ArchivedGOVUKDynamicsPayment,
+                GOVUKDynamicsPayment.dynamics_payment_id.in_(ids),
+                archived_at,
+            )
+        _move_rows(model, archive_model, model.id.in_(ids), archived_at)
+    db.session.commit()
+    return ids
+
+
+def archive_old_records(
+    days: int | None = None,
+    batch_size: int | None = None,
+    concurrency: int | None = None,
+) -> dict[str, int]:
+    """Archive rows paid or created before the cutoff a batch at a time. Returns the number archived from each table."""
+    app = current_app._get_current_object()
+    cutoff = datetime.now() - timedelta(
+        days=days or app.config.get("ARCHIVE_AFTER_DAYS")
+    )
+    batch_size = batch_size or app.config.get("ARCHIVE_BATCH_SIZE")
+    archived = {}
+    for model, archive_model in (
+        (ServiceRecordRequest, ArchivedServiceRecordRequest),
+        (DynamicsPayment, ArchivedDynamicsPayment),
+    ):
+
+        def run_batch() -> int:
+            try:
+                ids = _archive_batch(model, archive_model, cutoff, batch_size)
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error("Error archiving %s: %s", model.__tablename__, e)
+                return 0
+            if ids:
+                app.logger.info("Archived %s %s", len(ids), model.__tablename__)
+            return len(ids)
+
+        archived[model.__tablename__] = drain(
+            run_batch, concurrency or app.config.get("BACKGROUND_JOB_CONCURRENCY")
+        )
+    return archived
+
+
+def main() -> None:
+    app = create_app(os.getenv("CONFIG", "config.Production"))
+    with app.app_context():
+        for table, count in archive_old_records().items():
+            app.logger.info("Archived %s rows from %s", count, table)
+        app.logger.info("Purged %s completed background jobs", purge_completed_jobs())
+
+
+if __name__ == "__main__":
+    main()
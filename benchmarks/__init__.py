@@ -0,0 +1,12 @@
+"""
+Benchmarks for the application.
+
+These are run by hand rather than as part of the test suite, for example:
+
+    poetry run python -m benchmarks.content_loading
+"""
+
+import os
+
+# The benchmarks never touch a real database, but create_app needs a valid URI
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite://")
@@ -0,0 +1,106 @@
+"""
+Compare the per-call overhead of creating an AWS client each call with the
+shared client registry.
+
+"Before" builds a boto3 session and SES client for every email, as send_email
+used to. "After" sends through send_email with the client from get_client.
+Both send to an in-process endpoint registered on the client's before-send
+event, so no request leaves the process and only the client overhead and
+request signing are measured.
+
+    poetry run python -m benchmarks.aws_clients
+"""
+
+import argparse
+import os
+import tracemalloc
+from unittest.mock import patch
+
+import boto3
+from botocore.awsrequest import AWSResponse
+
+from app import create_app
+from app.lib import aws
+from benchmarks.timing import print_comparison, time_calls
+
+SEND_EMAIL_RESPONSE = (
+    b"<SendEmailResponse><SendEmailResult><MessageId>benchmark</MessageId>"
+    b"</SendEmailResult></SendEmailResponse>"
+)
+
+
+class _RawResponse:
+    def stream(self, **kwargs):
+        yield SEND_EMAIL_RESPONSE
+
+
+def _respond(request, **kwargs) -> AWSResponse:
+    return AWSResponse(request.url, 200, {}, _RawResponse())
+
+
+def _client_with_local_endpoint(original_client):
+    def client(session, service_name, *args, **kwargs):
+        created = original_client(session, service_name, *args, **kwargs)
+        created.meta.events.register("before-send", _respond)
+        return created
+
+    return client
+
+
+def send_email_with_new_client() -> None:
+    ses = aws.get_boto3_session().client("ses")
+    ses.send_email(
+        Source="Benchmark <benchmark@example.com>",
+        Destination={"ToAddresses": ["jane@example.com"]},
+        Message={"Subject": {"Data": "Subject"}, "Body": {"Text": {"Data": "Body"}}},
+    )
+
+
+def send_email_with_shared_client() -> None:
+    assert aws.send_email(to="jane@example.com", subject="Subject", body="Body")
+
+
+def _peak_memory_kb(function, iterations: int) -> float:
+    tracemalloc.start()
+    for _ in range(iterations):
+        function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    app = create_app("config.Test")
+    app.config.update(EMAIL_FROM="benchmark@example.com", EMAIL_FROM_NAME="Benchmark")
+
+    with (
+        app.app_context(),
+        patch.object(
+            boto3.session.Session,
+            "client",
+            _client_with_local_endpoint(boto3.session.Session.client),
+        ),
+    ):
+        aws._clients.clear()
+        print_comparison(
+            "send_email()",
+            time_calls(send_email_with_new_client, args.iterations),
+            time_calls(send_email_with_shared_client, args.iterations),
+        )
+        aws._clients.clear()
+        print("\nPeak memory allocated over 20 calls")
+        print(f"  before: {_peak_memory_kb(send_email_with_new_client, 20):>10.0f}KB")
+        print(
+            f"   after: {_peak_memory_kb(send_email_with_shared_client, 20):>10.0f}KB"
+        )
+        aws._clients.clear()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Compare per-request latency with and without the in-process content cache.
+
+"Before" clears the content cache ahead of every request, so each request
+re-parses content.yaml as load_content() used to. "After" serves the parsed
+content from the cache.
+
+    poetry run python -m benchmarks.content_loading
+"""
+
+import argparse
+
+from app import create_app
+from app.lib.content import clear_content_cache, load_content
+from benchmarks.timing import print_comparison, time_calls
+
+PAGES = [
+    "/",
+    "/how-we-process-requests/",
+    "/before-you-start/",
+    "/you-have-cancelled-your-request/",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    app = create_app("config.Test")
+    prefix = app.config["SERVICE_URL_PREFIX"]
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["entered_through_index_page"] = True
+
+    print_comparison(
+        "load_content()",
+        time_calls(lambda: (clear_content_cache(), load_content()), args.iterations),
+        time_calls(load_content, args.iterations),
+    )
+
+    for page in PAGES:
+        url = f"{prefix}{page}"
+
+        def uncached_request(url=url):
+            clear_content_cache()
+            client.get(url)
+
+        def cached_request(url=url):
+            client.get(url)
+
+        print_comparison(
+            f"GET {page}",
+            time_calls(uncached_request, args.iterations),
+            time_calls(cached_request, args.iterations),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare loading content from the compiled snapshot with parsing content.yaml.
+
+Measures both the content parse on its own, and the time a fresh interpreter
+takes to import the app and call create_app, which is what each worker and
+cron job pays on start up.
+
+    poetry run python -m benchmarks.content_snapshot
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+from app.lib import content
+from benchmarks.timing import print_comparison, summarise, time_calls
+
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+from app import create_app
+create_app("config.Test")
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def _startup_timings(iterations: int) -> list[float]:
+    timings = []
+    for _ in range(iterations):
+        result = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT],
+            capture_output=True,
+            check=True,
+            text=True,
+            env=os.environ,
+        )
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--startup-iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    path = os.path.abspath(content.DEFAULT_CONTENT_PATH)
+    snapshot_path = content.content_snapshot_path(path)
+    had_snapshot = os.path.exists(snapshot_path)
+
+    try:
+        if had_snapshot:
+            os.remove(snapshot_path)
+        yaml_parse = time_calls(
+            lambda: content._parse_content_file(path), args.iterations
+        )
+        yaml_startup = summarise(_startup_timings(args.startup_iterations))
+
+        content.write_content_snapshot(path)
+        snapshot_parse = time_calls(
+            lambda: content._parse_content_file(path), args.iterations
+        )
+        snapshot_startup = summarise(_startup_timings(args.startup_iterations))
+    finally:
+        if not had_snapshot and os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+
+    print_comparison("Parse content (YAML vs snapshot)", yaml_parse, snapshot_parse)
+    print_comparison(
+        "Import app and create_app (YAML vs snapshot)", yaml_startup, snapshot_startup
+    )
+
+
+if __name__ == "__main__":
+    main()
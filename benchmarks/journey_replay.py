@@ -0,0 +1,358 @@
+"""
+Replay synthetic request journeys concurrently through the Flask test client.
+
+Each journey starts at the start page and answers each page it is shown until
+it reaches the end of that branch of the state machine, following redirects
+exactly as a browser would, including sending the request to GOV.UK Pay and
+handling the response. GOV.UK Pay and the delivery fee and country APIs are
+stubbed in-process, S3 and SES are answered by the fake AWS backend with
+--aws-latency and --aws-error-rate (see benchmarks.stubs), and requests are
+written to a throwaway SQLite database unless --database-uri is given.
+
+Reports p50/p95/p99 per page, overall requests per second, and the size of the
+session cookie after each page.
+
+    poetry run python -m benchmarks.journey_replay --journeys 2000 --concurrency 16
+"""
+
+import argparse
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+
+from benchmarks.stubs import path_of, stub_backends
+from benchmarks.timing import summarise
+
+MAX_STEPS = 60
+
+
+# The end of each branch of the journey
+TERMINAL_ENDPOINTS = {
+    "main.subject_access_request",
+    "main.you_have_cancelled_your_request",
+    "main.request_submitted",
+    "main.payment_link_creation_failed",
+    "main.sorry_you_will_have_to_start_again",
+}
+
+# Answers for each page which asks a question. Pages which aren't listed are
+# submitted with only their continue button.
+ANSWERS = {
+    "main.before_you_start": {"ready_to_continue": "y"},
+    "main.is_service_person_alive": {"is_service_person_alive": "no"},
+    "main.service_branch_form": {"service_branch": "BRITISH_ARMY"},
+    "main.were_they_a_commissioned_officer": {"were_they_a_commissioned_officer": "no"},
+    "main.what_was_their_date_of_birth": {
+        "date_of_birth-day": "1",
+        "date_of_birth-month": "1",
+        "date_of_birth-year": "1900",
+    },
+    "main.provide_a_proof_of_death": {"do_you_have_a_proof_of_death": "yes"},
+    "main.upload_a_proof_of_death": {"proof_of_death": "file"},
+    "main.service_person_details": {
+        "forenames": "Tommy",
+        "last_name": "Atkins",
+        "place_of_birth": "London",
+        "service_number": "12345",
+        "regiment": "Royal Fusiliers",
+        "additional_information": "Served in France and Belgium.",
+    },
+    "main.have_you_previously_made_a_request": {
+        "have_you_previously_made_a_request": "no"
+    },
+    "main.choose_your_order_type": {
+        "processing_option": "standard",
+        "submit_standard": "Continue",
+    },
+    "main.your_order_type_british_army_officers": {"processing_option": "full"},
+    "main.your_order_type_other_and_dont_know_officers": {
+        "processing_option": "standard"
+    },
+    "main.your_contact_details": {
+        "requester_first_name": "Jane",
+        "requester_last_name": "Atkins",
+        "requester_email": "jane.atkins@example.com",
+    },
+    "main.what_is_your_address": {
+        "requester_address1": "1 Example Street",
+        "requester_town_city": "London",
+        "requester_postcode": "SW1A 1AA",
+        "requester_country": "United Kingdom",
+    },
+}
+
+# Branches of the state machine, as changes to ANSWERS, and how often each runs
+JOURNEYS = {
+    "digital_army": (
+        4,
+        {},
+    ),
+    "living_subject": (
+        1,
+        {"main.is_service_person_alive": {"is_service_person_alive": "yes"}},
+    ),
+    "royal_navy": (
+        1,
+        {"main.service_branch_form": {"service_branch": "ROYAL_NAVY"}},
+    ),
+    "army_officer": (
+        1,
+        {
+            "main.were_they_a_commissioned_officer": {
+                "were_they_a_commissioned_officer": "yes"
+            }
+        },
+    ),
+    "raf_officer": (
+        1,
+        {
+            "main.service_branch_form": {"service_branch": "ROYAL_AIR_FORCE"},
+            "main.were_they_a_commissioned_officer": {
+                "were_they_a_commissioned_officer": "yes"
+            },
+        },
+    ),
+    "proof_of_death": (
+        2,
+        {
+            "main.what_was_their_date_of_birth": {
+                "date_of_birth-day": "1",
+                "date_of_birth-month": "1",
+                "date_of_birth-year": "1920",
+            }
+        },
+    ),
+    "printed_delivery": (
+        2,
+        {
+            "main.your_contact_details": {
+                "requester_first_name": "Jane",
+                "requester_last_name": "Atkins",
+                "does_not_have_email": "y",
+            }
+        },
+    ),
+}
+
+
+class Results:
+    def __init__(self):
+        self.timings = defaultdict(list)
+        self.session_sizes = defaultdict(list)
+        self.statuses = Counter()
+        self.outcomes = Counter()
+        self.errors = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, page: str, elapsed_ms: float, status: int, session_size: int):
+        with self._lock:
+            self.timings[page].append(elapsed_ms)
+            self.session_sizes[page].append(session_size)
+            self.statuses[status] += 1
+
+    def finish(self, journey: str, endpoint: str | None, error: str | None = None):
+        with self._lock:
+            self.outcomes[(journey, endpoint)] += 1
+            if error:
+                self.errors[f"{journey}: {error}"] += 1
+
+
+class HiddenInputParser(HTMLParser):
+    """Collect a page's hidden inputs, such as the CSRF token, as a browser would submit them."""
+
+    def __init__(self):
+        super().__init__()
+        self.values = {}
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "input" and attrs.get("type") == "hidden" and attrs.get("name"):
+            self.values[attrs["name"]] = attrs.get("value") or ""
+
+
+def _answers_for(journey: str) -> dict:
+    answers = ANSWERS | JOURNEYS[journey][1]
+    # Give each journey its own service person, as identical requests are
+    # treated as duplicates of the first one to reach GOV.UK Pay
+    return answers | {
+        "main.service_person_details": answers["main.service_person_details"]
+        | {"service_number": uuid.uuid4().hex[:12]}
+    }
+
+
+def _form_data(endpoint: str, answers: dict, page_html: bytes) -> dict:
+    parser = HiddenInputParser()
+    parser.feed(page_html.decode())
+    data = parser.values | answers.get(endpoint, {})
+    if data.get("proof_of_death") == "file":
+        data["proof_of_death"] = (io.BytesIO(b"%PDF-1.4\n" + b"0" * 2048), "proof.pdf")
+    return data
+
+
+def run_journey(app, journey: str, results: Results) -> None:
+    try:
+        _walk_journey(app, journey, results)
+    except Exception as e:
+        results.finish(journey, None, f"{type(e).__name__}: {e}")
+
+
+def _walk_journey(app, journey: str, results: Results) -> None:
+    """Walk one journey from the start page until it reaches the end of its branch."""
+    answers = _answers_for(journey)
+    session_cookie = app.config["SESSION_COOKIE_NAME"]
+    cookie_path = app.config["SESSION_COOKIE_PATH"]
+    adapter = app.url_map.bind("localhost")
+    client = app.test_client()
+    url = f"{app.config['SERVICE_URL_PREFIX']}/"
+    endpoint = None
+
+    def request(method: str, url: str, page: str, **kwargs):
+        start = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        cookie = client.get_cookie(session_cookie, path=cookie_path)
+        results.record(
+            f"{method} {page}",
+            elapsed_ms,
+            response.status_code,
+            len(cookie.value) if cookie else 0,
+        )
+        return response
+
+    for _ in range(MAX_STEPS):
+        path = path_of(url)
+        endpoint = adapter.match(path.split("?")[0])[0]
+        response = request("GET", path, endpoint)
+        if response.status_code in (301, 302, 303):
+            url = response.location
+            continue
+        if response.status_code != 200:
+            return results.finish(
+                journey, endpoint, f"GET {endpoint} {response.status_code}"
+            )
+        if endpoint in TERMINAL_ENDPOINTS:
+            return results.finish(journey, endpoint)
+
+        response = request(
+            "POST", path, endpoint, data=_form_data(endpoint, answers, response.data)
+        )
+        if response.status_code not in (301, 302, 303):
+            return results.finish(
+                journey, endpoint, f"POST {endpoint} {response.status_code}"
+            )
+        url = response.location
+
+    results.finish(journey, endpoint, "did not finish")
+
+
+def _journey_mix(count: int) -> list[str]:
+    weighted = [name for name, (weight, _) in JOURNEYS.items() for _ in range(weight)]
+    return [weighted[i % len(weighted)] for i in range(count)]
+
+
+def _print_report(results: Results, elapsed: float) -> None:
+    requests = sum(results.statuses.values())
+    journeys = sum(results.outcomes.values())
+    print(f"\n{journeys} journeys, {requests} requests in {elapsed:.1f}s")
+    print(
+        f"{requests / elapsed:.1f} requests/sec, {journeys / elapsed:.1f} journeys/sec"
+    )
+    print(f"Status codes: {dict(sorted(results.statuses.items()))}")
+
+    print(
+        f"\n{'page':<58} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9} "
+        f"{'session':>8} {'max':>6}"
+    )
+    for page in sorted(results.timings, key=lambda p: (p.split()[1], p.split()[0])):
+        stats = summarise(results.timings[page])
+        sizes = results.session_sizes[page]
+        print(
+            f"{page:<58} {stats['count']:>6} "
+            + " ".join(f"{stats[key]:>7.2f}ms" for key in ("p50", "p95", "p99"))
+            + f" {sum(sizes) / len(sizes):>7.0f}B {max(sizes):>5}B"
+        )
+
+    print("\nJourney outcomes:")
+    for (journey, endpoint), count in sorted(results.outcomes.items()):
+        print(f"  {journey:<18} {endpoint}: {count}")
+    if results.errors:
+        print("\nErrors:")
+        for error, count in results.errors.most_common():
+            print(f"  {error}: {count}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--journeys", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--config", default="config.Test")
+    parser.add_argument(
+        "--aws-latency", type=float, default=0.0, help="seconds per S3 or SES call"
+    )
+    parser.add_argument(
+        "--aws-error-rate",
+        type=float,
+        default=0.0,
+        help="fraction of S3 and SES calls to fail as throttled",
+    )
+    parser.add_argument(
+        "--database-uri",
+        help="defaults to a temporary SQLite database which is removed afterwards",
+    )
+    args = parser.parse_args()
+
+    database_file = None
+    if args.database_uri:
+        os.environ["SQLALCHEMY_DATABASE_URI"] = args.database_uri
+    else:
+        database_file = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        os.environ["SQLALCHEMY_DATABASE_URI"] = (
+            f"sqlite:///{database_file.name}?timeout=30"
+        )
+
+    from app import create_app
+    from app.lib.db.models import db
+
+    app = create_app(args.config)
+    logging.getLogger(app.logger.name).setLevel(logging.CRITICAL)
+
+    try:
+        with app.app_context():
+            db.create_all()
+
+        with stub_backends(app, args.aws_latency, args.aws_error_rate) as (
+            http_backend,
+            aws_backend,
+        ):
+            # Walk each branch once first, so that compiling templates and
+            # filling caches isn't counted
+            for journey in JOURNEYS:
+                run_journey(app, journey, Results())
+
+            results = Results()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                for future in [
+                    executor.submit(run_journey, app, journey, results)
+                    for journey in _journey_mix(args.journeys)
+                ]:
+                    future.result()
+            elapsed = time.perf_counter() - start
+
+        _print_report(results, elapsed)
+        print(f"\nStubbed HTTP calls: {http_backend.calls}")
+        print(f"Fake AWS calls: {dict(sorted(aws_backend.calls.items()))}")
+    finally:
+        if database_file:
+            os.remove(database_file.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Compare the per-request overhead of the journey's view decorators.
+
+"Before" re-creates each decorated view with copies of with_state_machine,
+with_form_prefilled_from_session and update_dynamic_back_link_mapping as they
+were when they inspected the view's signature, copied form_data and rebuilt and
+re-saved the back link mappings on every request. "After" uses the current
+decorators. Both wrap a stub in place of each view body, so only the
+decorators are measured, and both use RoutingStateCursor so the state machine
+itself doesn't affect the comparison (see benchmarks.state_machine for that).
+
+Every view in the app decorated with any of these is covered, and each timed
+call is one GET through all of them with a session from part way through the
+journey.
+
+    poetry run python -m benchmarks.route_overhead
+"""
+
+import argparse
+import inspect
+from enum import Enum
+from functools import update_wrapper, wraps
+
+from flask import g, request, session
+
+from app import create_app
+from app.constants import FALLBACK_COUNTRY_CHOICES
+from app.lib.cache import cache
+from app.lib.decorators.state_machine_decorator import with_state_machine
+from app.lib.decorators.update_dynamic_back_link_mapping import (
+    update_dynamic_back_link_mapping,
+)
+from app.lib.decorators.with_form_prefilled_from_session import (
+    with_form_prefilled_from_session,
+)
+from app.lib.get_country_choices import CACHE_KEY as COUNTRY_CHOICES_CACHE_KEY
+from app.lib.state_machine.transition_table import RoutingStateCursor
+from benchmarks.timing import print_comparison, time_calls
+
+FORM_DATA = {
+    "is_service_person_alive": "no",
+    "service_branch": "BRITISH_ARMY",
+    "were_they_a_commissioned_officer": "no",
+    "service_person_first_name": "Tommy",
+    "service_person_last_name": "Atkins",
+    "service_person_other_last_names": "",
+    "date_of_birth": "1900-01-01",
+    "service_number": "12345",
+    "regiment": "Royal Fusiliers",
+    "place_of_birth": "London",
+    "date_of_death": "1970-01-01",
+    "additional_information": "Served in France " * 20,
+    "do_you_have_a_proof_of_death": "no",
+    "have_you_previously_made_a_request": "no",
+    "requester_first_name": "Jane",
+    "requester_last_name": "Atkins",
+    "requester_email": "jane@example.com",
+    "requester_address1": "1 Example Street",
+    "requester_town_city": "London",
+    "requester_postcode": "SW1A 1AA",
+    "requester_country": "United Kingdom",
+    "processing_option": "standard",
+    "delivery_option": "digital",
+}
+
+
+def _legacy_with_state_machine(function):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        state_machine = RoutingStateCursor()
+        g.state_machine = state_machine
+        try:
+            if "state_machine" in inspect.signature(function).parameters:
+                kwargs["state_machine"] = state_machine
+        except (ValueError, TypeError):
+            pass
+        return function(*args, **kwargs)
+
+    return wrapper
+
+
+def _legacy_with_form_prefilled_from_session(form_class):
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(*args, **kwargs):
+            if request.method == "GET":
+                form_data = session.get("form_data", {})
+                if not isinstance(form_data, dict):
+                    form_data = {}
+                data = {k: v for k, v in form_data.items()}
+                form = form_class(data=data)
+            else:
+                form = form_class()
+            return view_func(form, *args, **kwargs)
+
+        return wrapped
+
+    return decorator
+
+
+def _legacy_update_dynamic_back_link_mapping(*, mappings):
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(*args, **kwargs):
+            dynamic_back_links = session.get("dynamic_back_links", {})
+            str_mappings = {
+                str(k.value if isinstance(k, Enum) else k): str(
+                    v.value if isinstance(v, Enum) else v
+                )
+                for k, v in mappings.items()
+            }
+            dynamic_back_links.update(str_mappings)
+            session["dynamic_back_links"] = dynamic_back_links
+            return view_func(*args, **kwargs)
+
+        return wrapped
+
+    return decorator
+
+
+DECORATORS = {
+    "with_state_machine": (_legacy_with_state_machine, with_state_machine),
+    "with_form_prefilled_from_session": (
+        lambda closure: _legacy_with_form_prefilled_from_session(closure["form_class"]),
+        lambda closure: with_form_prefilled_from_session(closure["form_class"]),
+    ),
+    "update_dynamic_back_link_mapping": (
+        lambda closure: _legacy_update_dynamic_back_link_mapping(
+            mappings=closure["str_mappings"]
+        ),
+        lambda closure: update_dynamic_back_link_mapping(
+            mappings=closure["str_mappings"]
+        ),
+    ),
+}
+
+
+def _decorator_layers(view) -> tuple[list, object]:
+    """Find which of the journey decorators wrap a view, outermost first."""
+    layers = []
+    while hasattr(view, "__wrapped__"):
+        decorator_name = view.__code__.co_qualname.split(".")[0]
+        if decorator_name in DECORATORS:
+            closure = inspect.getclosurevars(view).nonlocals
+            layers.append((decorator_name, closure))
+        view = view.__wrapped__
+    return layers, view
+
+
+def _rebuild(view, legacy: bool):
+    layers, original = _decorator_layers(view)
+
+    def stub(*args, **kwargs):
+        return ""
+
+    # Keep the original signature so with_state_machine sees the same parameters
+    rebuilt = update_wrapper(stub, original)
+    for decorator_name, closure in reversed(layers):
+        legacy_decorator, decorator = DECORATORS[decorator_name]
+        if decorator_name == "with_state_machine":
+            rebuilt = (legacy_decorator if legacy else decorator)(rebuilt)
+        else:
+            rebuilt = (legacy_decorator if legacy else decorator)(closure)(rebuilt)
+    return rebuilt
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app("config.Test")
+    views = [view for view in app.view_functions.values() if _decorator_layers(view)[0]]
+    before = [_rebuild(view, legacy=True) for view in views]
+    after = [_rebuild(view, legacy=False) for view in views]
+
+    def call_all(stacks):
+        for stack in stacks:
+            stack()
+
+    def repeat_session_writes(stacks) -> int:
+        """Count the views which write to the session again when reloaded."""
+        session_writes = 0
+        for stack in stacks:
+            stack()
+            session.modified = False
+            stack()
+            session_writes += session.modified
+        return session_writes
+
+    with app.test_request_context(method="GET"):
+        # Keep the address form from calling the country API while it is timed
+        cache.set(COUNTRY_CHOICES_CACHE_KEY, FALLBACK_COUNTRY_CHOICES, timeout=0)
+        session["form_data"] = FORM_DATA
+        # Visit every view once so the session holds the back link mappings, as
+        # it would part way through the journey
+        call_all(after)
+
+        print(f"Decorated views: {len(views)}")
+        print(
+            "Views writing to the session again when reloaded: "
+            f"before {repeat_session_writes(before)}, after {repeat_session_writes(after)}"
+        )
+        print_comparison(
+            f"One GET through each of the {len(views)} decorated views (decorators only)",
+            time_calls(lambda: call_all(before), args.iterations),
+            time_calls(lambda: call_all(after), args.iterations),
+        )
+
+
+if __name__ == "__main__":
+    main()
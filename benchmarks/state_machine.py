@@ -0,0 +1,52 @@
+"""
+Compare RoutingStateMachine with the precompiled RoutingStateCursor.
+
+Measures creating each per request, and creating each then following the
+guarded continue_from_were_they_a_commissioned_officer_form transition.
+
+    poetry run python -m benchmarks.state_machine
+"""
+
+import argparse
+from types import SimpleNamespace
+
+from app import create_app
+from app.lib.state_machine.state_machine import RoutingStateMachine
+from app.lib.state_machine.transition_table import RoutingStateCursor
+from benchmarks.timing import print_comparison, time_calls
+
+FORM = SimpleNamespace(
+    service_branch=SimpleNamespace(data="BRITISH_ARMY"),
+    were_they_a_commissioned_officer=SimpleNamespace(data="yes"),
+)
+
+
+def _transition(machine_class):
+    machine = machine_class()
+    machine.continue_from_were_they_a_commissioned_officer_form(FORM)
+    return machine.route_for_current_state
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = create_app("config.Test")
+    with app.test_request_context():
+        assert _transition(RoutingStateMachine) == _transition(RoutingStateCursor)
+
+        print_comparison(
+            "Construct (RoutingStateMachine vs RoutingStateCursor)",
+            time_calls(RoutingStateMachine, args.iterations),
+            time_calls(RoutingStateCursor, args.iterations),
+        )
+        print_comparison(
+            "Construct and transition (RoutingStateMachine vs RoutingStateCursor)",
+            time_calls(lambda: _transition(RoutingStateMachine), args.iterations),
+            time_calls(lambda: _transition(RoutingStateCursor), args.iterations),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+In-process stand-ins for the services the app calls, for use by benchmarks.
+
+HTTP calls are answered at the transport adapter, so the app's own request
+code still runs. S3 and SES are answered by the fake AWS backend, so the boto3
+code the app runs in production is measured too.
+"""
+
+import json
+import shutil
+import tempfile
+import threading
+import uuid
+from contextlib import ExitStack, contextmanager
+from unittest.mock import patch
+from urllib.parse import urlparse
+
+from requests import Response
+from requests.adapters import HTTPAdapter
+
+from app.lib.fake_aws import get_fake_aws_backend
+
+GOV_UK_PAY_API_URL = "https://publicapi.payments.service.gov.uk/v1/payments"
+RECORD_COPYING_SERVICE_API_URL = "https://record-copying-service.example.com/"
+
+COUNTRIES = ["France", "Germany", "Ireland", "United Kingdom", "United States"]
+
+
+class StubHTTPBackend:
+    """
+    Answer GOV.UK Pay, delivery fee and country requests.
+
+    Payments are created in the "success" state and their next_url is the
+    return_url, as though the user had paid straight away.
+    """
+
+    def __init__(self, app, delivery_fee_pounds: str = "12.50"):
+        self.gov_uk_pay_url = app.config["GOV_UK_PAY_API_URL"].rstrip("/")
+        self.delivery_fee_url = app.config["DELIVERY_FEE_API_URL"]
+        self.country_url = app.config["COUNTRY_API_URL"]
+        self.delivery_fee_pounds = delivery_fee_pounds
+        self.payments = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def send(self, adapter, request, **kwargs) -> Response:
+        with self._lock:
+            self.calls += 1
+        url = request.url.split("?")[0]
+        if request.method == "POST" and url.rstrip("/") == self.gov_uk_pay_url:
+            return self._respond(request, 201, self._create_payment(request))
+        if request.method == "GET" and url.startswith(f"{self.gov_uk_pay_url}/"):
+            payment = self.payments.get(url.rsplit("/", 1)[-1])
+            if payment is None:
+                return self._respond(request, 404, {"code": "P0200"})
+            return self._respond(request, 200, payment)
+        if url == self.delivery_fee_url:
+            return self._respond(request, 200, self.delivery_fee_pounds)
+        if url == self.country_url:
+            return self._respond(
+                request, 200, [{"Description": country} for country in COUNTRIES]
+            )
+        return self._respond(request, 404, {"error": f"No stub for {request.url}"})
+
+    def _create_payment(self, request) -> dict:
+        payload = json.loads(request.body)
+        payment_id = uuid.uuid4().hex
+        payment = {
+            "payment_id": payment_id,
+            "amount": payload["amount"],
+            "reference": payload["reference"],
+            "description": payload["description"],
+            "email": payload.get("email"),
+            "provider_id": f"provider-{payment_id[:8]}",
+            "state": {"status": "success", "finished": True},
+            "_links": {"next_url": {"href": payload["return_url"], "method": "GET"}},
+        }
+        with self._lock:
+            self.payments[payment_id] = payment
+        return payment
+
+    @staticmethod
+    def _respond(request, status_code: int, body) -> Response:
+        response = Response()
+        response.status_code = status_code
+        response._content = json.dumps(body).encode()
+        response.headers["Content-Type"] = "application/json"
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+
+@contextmanager
+def stub_backends(app, aws_latency: float = 0.0, aws_error_rate: float = 0.0):
+    """
+    Point the app at stubbed GOV.UK Pay and Record Copying Service, and at a
+    fake S3 and SES in a temporary directory with the given latency and error
+    rate.
+
+    Yields the HTTP and AWS backends so callers can report what was called.
+    """
+    fake_aws_directory = tempfile.mkdtemp(prefix="fake-aws-")
+    app.config.update(
+        GOV_UK_PAY_API_URL=GOV_UK_PAY_API_URL,
+        GOV_UK_PAY_API_KEY="benchmark",
+        DELIVERY_FEE_API_URL=f"{RECORD_COPYING_SERVICE_API_URL}GetDeliveryPrice",
+        COUNTRY_API_URL=f"{RECORD_COPYING_SERVICE_API_URL}GetCountry",
+        PROOF_OF_DEATH_BUCKET_NAME="benchmark-proof-of-death",
+        EMAIL_FROM="benchmark@example.com",
+        EMAIL_FROM_NAME="Benchmark",
+        DYNAMICS_INBOX="dynamics@example.com",
+        AWS_BACKEND="fake",
+        FAKE_AWS_DIR=fake_aws_directory,
+        FAKE_AWS_LATENCY=aws_latency,
+        FAKE_AWS_ERROR_RATE=aws_error_rate,
+    )
+    http_backend = StubHTTPBackend(app)
+    aws_backend = get_fake_aws_backend(fake_aws_directory, aws_latency, aws_error_rate)
+
+    def send(adapter, request, **kwargs):
+        return http_backend.send(adapter, request, **kwargs)
+
+    with ExitStack() as stack:
+        stack.callback(shutil.rmtree, fake_aws_directory, ignore_errors=True)
+        stack.enter_context(patch.object(HTTPAdapter, "send", send))
+        yield http_backend, aws_backend
+
+
+def path_of(url: str) -> str:
+    """Return the path and query of a URL, for passing to the test client."""
+    parsed = urlparse(url)
+    return f"{parsed.path}?{parsed.query}" if parsed.query else parsed.path
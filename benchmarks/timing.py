@@ -0,0 +1,42 @@
+import statistics
+import time
+
+
+def time_calls(function, iterations: int = 200) -> dict:
+    """Call function repeatedly and return latency statistics in milliseconds."""
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return summarise(timings)
+
+
+def summarise(timings: list[float]) -> dict:
+    if not timings:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+    ordered = sorted(timings)
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": _percentile(ordered, 50),
+        "p95": _percentile(ordered, 95),
+        "p99": _percentile(ordered, 99),
+    }
+
+
+def _percentile(ordered: list[float], percentile: int) -> float:
+    index = max(0, min(len(ordered) - 1, round(percentile / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def print_comparison(label: str, before: dict, after: dict) -> None:
+    print(f"\n{label}")
+    print(f"{'':>8} {'mean':>10} {'p50':>10} {'p95':>10} {'p99':>10}")
+    for name, stats in (("before", before), ("after", after)):
+        print(
+            f"{name:>8} "
+            + " ".join(f"{stats[key]:>8.3f}ms" for key in ("mean", "p50", "p95", "p99"))
+        )
+    if after["mean"]:
+        print(f"speed-up: {before['mean'] / after['mean']:.1f}x (mean)")
@@ -0,0 +1,18 @@
+"""
+Command to compile content.yaml into a snapshot which loads faster than the YAML.
+
+This is intended to be run as part of the build, so that app workers and cron
+jobs don't have to parse the YAML when they start. If the snapshot is missing or
+was built from a different version of content.yaml, the YAML is parsed instead.
+"""
+
+from app.lib.content import DEFAULT_CONTENT_PATH, write_content_snapshot
+
+
+def main() -> None:
+    snapshot_path = write_content_snapshot(DEFAULT_CONTENT_PATH)
+    print(f"Content snapshot written to {snapshot_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import json
 import os
+import tempfile
 
 from redis import Redis
 
@@ -64,11 +65,44 @@ class Production(Features):
     CACHE_IGNORE_ERRORS: bool = True
     CACHE_DIR: str = os.environ.get("CACHE_DIR", "/tmp")
     CACHE_REDIS_URL: str = os.environ.get("CACHE_REDIS_URL", "")
+    PAGE_CACHE_ENABLED: bool = strtobool(os.getenv("PAGE_CACHE_ENABLED", "True"))
+    PAGE_CACHE_TIMEOUT: int = int(os.environ.get("PAGE_CACHE_TIMEOUT", "300"))
+
+    TEMPLATE_BYTECODE_CACHE_TYPE: str = os.environ.get(
+        "TEMPLATE_BYTECODE_CACHE_TYPE", ""
+    )
+    TEMPLATE_BYTECODE_CACHE_DIR: str = os.environ.get(
+        "TEMPLATE_BYTECODE_CACHE_DIR", "/tmp/jinja2-bytecode"
+    )
+    TEMPLATE_BYTECODE_CACHE_REDIS_URL: str = os.environ.get(
+        "TEMPLATE_BYTECODE_CACHE_REDIS_URL", CACHE_REDIS_URL
+    )
+    TEMPLATE_BYTECODE_CACHE_TIMEOUT: int = int(
+        os.environ.get("TEMPLATE_BYTECODE_CACHE_TIMEOUT", "604800")
+    )
+    TEMPLATE_WARM_UP: bool = strtobool(os.getenv("TEMPLATE_WARM_UP", "True"))
 
     GA4_ID: str = os.environ.get("GA4_ID", "")
 
+    CONTENT_AUTO_RELOAD: bool = strtobool(os.getenv("CONTENT_AUTO_RELOAD", "False"))
+
     GOV_UK_PAY_API_KEY: str = os.environ.get("GOV_UK_PAY_API_KEY", "")
     GOV_UK_PAY_API_URL: str = os.environ.get("GOV_UK_PAY_API_URL", "")
+    GOV_UK_PAY_STATUS_CACHE_ENABLED: bool = strtobool(
+        os.getenv("GOV_UK_PAY_STATUS_CACHE_ENABLED", "True")
+    )
+    GOV_UK_PAY_UNFINISHED_STATUS_CACHE_TIMEOUT: int = int(
+        os.environ.get("GOV_UK_PAY_UNFINISHED_STATUS_CACHE_TIMEOUT", "3")
+    )
+    GOV_UK_PAY_FINISHED_STATUS_CACHE_TIMEOUT: int = int(
+        os.environ.get("GOV_UK_PAY_FINISHED_STATUS_CACHE_TIMEOUT", "86400")
+    )
+    GOV_UK_PAY_STATUS_LOCK_TIMEOUT: int = int(
+        os.environ.get("GOV_UK_PAY_STATUS_LOCK_TIMEOUT", "15")
+    )
+    GOV_UK_PAY_STATUS_WAIT_TIMEOUT: float = float(
+        os.environ.get("GOV_UK_PAY_STATUS_WAIT_TIMEOUT", "5")
+    )
 
     SQLALCHEMY_DATABASE_URI: str = os.environ.get("SQLALCHEMY_DATABASE_URI", "")
     SQLALCHEMY_TRACK_MODIFICATIONS: bool = strtobool(
@@ -87,6 +121,17 @@ class Production(Features):
         SESSION_REDIS = Redis.from_url(SESSION_REDIS_URL)
 
     AWS_DEFAULT_REGION: str = os.environ.get("AWS_DEFAULT_REGION", "eu-west-2")
+    AWS_MAX_POOL_CONNECTIONS: int = int(
+        os.environ.get("AWS_MAX_POOL_CONNECTIONS", "10")
+    )
+    AWS_RETRY_MODE: str = os.environ.get("AWS_RETRY_MODE", "standard")
+    AWS_MAX_ATTEMPTS: int = int(os.environ.get("AWS_MAX_ATTEMPTS", "3"))
+    AWS_BACKEND: str = os.environ.get("AWS_BACKEND", "aws")
+    FAKE_AWS_DIR: str = os.environ.get(
+        "FAKE_AWS_DIR", os.path.join(tempfile.gettempdir(), "fake-aws")
+    )
+    FAKE_AWS_LATENCY: float = float(os.environ.get("FAKE_AWS_LATENCY", "0"))
+    FAKE_AWS_ERROR_RATE: float = float(os.environ.get("FAKE_AWS_ERROR_RATE", "0"))
     PROOF_OF_DEATH_BUCKET_NAME: str = os.environ.get("PROOF_OF_DEATH_BUCKET_NAME", "")
     PROOF_OF_DEATH_HOLDING_PREFIX: str = os.environ.get(
         "PROOF_OF_DEATH_HOLDING_PREFIX", "holding/"
@@ -94,10 +139,48 @@ class Production(Features):
     PROOF_OF_DEATH_SUBMITTED_PREFIX: str = os.environ.get(
         "PROOF_OF_DEATH_SUBMITTED_PREFIX", "submitted/"
     )
+    PROOF_OF_DEATH_UPLOAD_MODE: str = os.environ.get(
+        "PROOF_OF_DEATH_UPLOAD_MODE", "server"
+    )
+    PROOF_OF_DEATH_UPLOAD_EXPIRY: int = int(
+        os.environ.get("PROOF_OF_DEATH_UPLOAD_EXPIRY", "900")
+    )
+    PROOF_OF_DEATH_SPOOL_DIR: str = os.environ.get(
+        "PROOF_OF_DEATH_SPOOL_DIR",
+        os.path.join(tempfile.gettempdir(), "proof-of-death-uploads"),
+    )
+    PROOF_OF_DEATH_UPLOAD_WORKERS: int = int(
+        os.environ.get("PROOF_OF_DEATH_UPLOAD_WORKERS", "2")
+    )
+    PROOF_OF_DEATH_BATCH_PROMOTION: bool = strtobool(
+        os.getenv("PROOF_OF_DEATH_BATCH_PROMOTION", "False")
+    )
+    PROOF_OF_DEATH_PROMOTION_CONCURRENCY: int = int(
+        os.environ.get("PROOF_OF_DEATH_PROMOTION_CONCURRENCY", "8")
+    )
     MAX_UPLOAD_ATTEMPTS: int = int(os.environ.get("MAX_UPLOAD_ATTEMPTS", "3"))
+    S3_MULTIPART_THRESHOLD: int = int(
+        os.environ.get("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024))
+    )
+    S3_MULTIPART_CHUNKSIZE: int = int(
+        os.environ.get("S3_MULTIPART_CHUNKSIZE", str(8 * 1024 * 1024))
+    )
+    S3_MAX_CONCURRENCY: int = int(os.environ.get("S3_MAX_CONCURRENCY", "4"))
+    S3_UPLOAD_TRACK_MEMORY: bool = strtobool(
+        os.getenv("S3_UPLOAD_TRACK_MEMORY", "False")
+    )
 
     EMAIL_FROM: str = os.environ.get("EMAIL_FROM", "")
     EMAIL_FROM_NAME: str = os.environ.get("EMAIL_FROM_NAME", "")
+    SES_MAX_SEND_RATE: float = float(os.environ.get("SES_MAX_SEND_RATE", "14"))
+    SES_RATE_LIMIT_REDIS_URL: str = os.environ.get(
+        "SES_RATE_LIMIT_REDIS_URL", CACHE_REDIS_URL
+    )
+    SES_BULK_CHUNK_SIZE: int = int(os.environ.get("SES_BULK_CHUNK_SIZE", "50"))
+    EMAIL_TEMPLATE_MODE: str = os.environ.get("EMAIL_TEMPLATE_MODE", "jinja")
+    EMAIL_TEMPLATE_PREFIX: str = os.environ.get(
+        "EMAIL_TEMPLATE_PREFIX", "request-service-record-"
+    )
     DYNAMICS_INBOX: str = os.environ.get("DYNAMICS_INBOX", "")
 
     DELIVERY_FEE_API_URL: str = (
@@ -108,6 +191,52 @@ class Production(Features):
     )
     MOD_COPYING_API_URL: str = os.environ.get("MOD_COPYING_API_URL", "")
 
+    BACKGROUND_JOBS_ENABLED: bool = strtobool(
+        os.getenv("BACKGROUND_JOBS_ENABLED", "False")
+    )
+    BACKGROUND_JOB_POLL_INTERVAL: float = float(
+        os.environ.get("BACKGROUND_JOB_POLL_INTERVAL", "2")
+    )
+    BACKGROUND_JOB_BATCH_SIZE: int = int(
+        os.environ.get("BACKGROUND_JOB_BATCH_SIZE", "50")
+    )
+    BACKGROUND_JOB_CONCURRENCY: int = int(
+        os.environ.get("BACKGROUND_JOB_CONCURRENCY", "1")
+    )
+    EXPIRE_PAYMENTS_CHUNK_SIZE: int = int(
+        os.environ.get("EXPIRE_PAYMENTS_CHUNK_SIZE", "500")
+    )
+    EXPIRY_EMAIL_CONCURRENCY: int = int(os.environ.get("EXPIRY_EMAIL_CONCURRENCY", "4"))
+    ARCHIVE_AFTER_DAYS: int = int(os.environ.get("ARCHIVE_AFTER_DAYS", "180"))
+    ARCHIVE_BATCH_SIZE: int = int(os.environ.get("ARCHIVE_BATCH_SIZE", "500"))
+    BACKGROUND_JOB_MAX_ATTEMPTS: int = int(
+        os.environ.get("BACKGROUND_JOB_MAX_ATTEMPTS", "10")
+    )
+    BACKGROUND_JOB_RETRY_DELAY: int = int(
+        os.environ.get("BACKGROUND_JOB_RETRY_DELAY", "60")
+    )
+    BACKGROUND_JOB_MAX_RETRY_DELAY: int = int(
+        os.environ.get("BACKGROUND_JOB_MAX_RETRY_DELAY", "21600")
+    )
+    BACKGROUND_JOB_CLAIM_TIMEOUT: int = int(
+        os.environ.get("BACKGROUND_JOB_CLAIM_TIMEOUT", "300")
+    )
+    BACKGROUND_JOB_RETENTION_DAYS: int = int(
+        os.environ.get("BACKGROUND_JOB_RETENTION_DAYS", "30")
+    )
+
+    HTTP_CONNECT_TIMEOUT: float = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "3.05"))
+    HTTP_READ_TIMEOUT: float = float(os.environ.get("HTTP_READ_TIMEOUT", "10"))
+    HTTP_RETRIES: int = int(os.environ.get("HTTP_RETRIES", "2"))
+    HTTP_RETRY_BACKOFF_FACTOR: float = float(
+        os.environ.get("HTTP_RETRY_BACKOFF_FACTOR", "0.3")
+    )
+    HTTP_POOL_MAXSIZE: int = int(os.environ.get("HTTP_POOL_MAXSIZE", "10"))
+    HTTP_SLOW_REQUEST_MS: int = int(os.environ.get("HTTP_SLOW_REQUEST_MS", "2000"))
+    HTTP_UPSTREAM_OVERRIDES: dict = json.loads(
+        os.environ.get("HTTP_UPSTREAM_OVERRIDES", "{}")
+    )
+
 
 class Staging(Production):
     DEBUG: bool = strtobool(os.getenv("DEBUG", "False"))
@@ -124,6 +253,8 @@ class Develop(Production):
 
     CACHE_DEFAULT_TIMEOUT: int = int(os.environ.get("CACHE_DEFAULT_TIMEOUT", "1"))
 
+    CONTENT_AUTO_RELOAD: bool = strtobool(os.getenv("CONTENT_AUTO_RELOAD", "True"))
+
     SESSION_COOKIE_SECURE: bool = strtobool(os.getenv("SESSION_COOKIE_SECURE", "True"))
 
 
@@ -141,6 +272,12 @@ class Test(Production):
     CACHE_TYPE: str = "SimpleCache"
     CACHE_DEFAULT_TIMEOUT: int = 1
 
+    PAGE_CACHE_ENABLED: bool = False
+
+    GOV_UK_PAY_STATUS_CACHE_ENABLED: bool = False
+
+    TEMPLATE_WARM_UP: bool = False
+
     FORCE_HTTPS: bool = False
     PREFERRED_URL_SCHEME: str = "http"
 
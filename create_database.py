@@ -1,7 +1,24 @@
+"""
+Migrate the database schema to the latest revision, or to the revision given
+with --revision, reverting any migrations after it.
+"""
+
+import argparse
+
+from app.lib.db.migrations import current_revision, downgrade, upgrade
 from app.lib.db.models import db
 from main import app
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--revision", type=int, default=None)
+    args = parser.parse_args()
+
     with app.app_context():
-        db.create_all()
-        print("Database tables created")
+        if args.revision is not None and args.revision < current_revision(db.engine):
+            reverted = downgrade(db.engine, args.revision)
+            print(f"Reverted migrations: {reverted}")
+        else:
+            applied = upgrade(db.engine, args.revision)
+            print(f"Applied migrations: {applied}")
+        print(f"Database is at revision {current_revision(db.engine)}")
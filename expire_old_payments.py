@@ -1,71 +1,162 @@
 """
 Command to expire Dynamics payments older than 30 days.
 
-This is intended to be run as a cron job.
+This is intended to be run as a cron job. Payments are expired a chunk at a
+time with one UPDATE ... RETURNING each, so several copies of this can run at
+once without emailing anyone twice. Their payees are emailed in batches of
+SES_BULK_CHUNK_SIZE.
 """
 
 import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
 
 from flask import current_app
+from sqlalchemy import Row, select, update
 
 from app import create_app
-from app.lib.aws import send_email
+from app.lib.batch_workers import drain, lock_next_batch_query
 from app.lib.db.constants import EXPIRED_STATUS, NEW_STATUS
 from app.lib.db.models import DynamicsPayment, db
+from app.lib.emails import (
+    PAYMENT_LINK_EXPIRED_EMAIL,
+    email_metrics,
+    send_bulk_templated_email,
+)
 
 
-def expire_old_payments(days: int = 30) -> int:
-    cutoff = datetime.now(tz=timezone.utc) - timedelta(days=days)
+class ExpirySummary(NamedTuple):
+    expired: int
+    emails_sent: int
+    emails_failed: int
+
 
-    payments = (
-        db.session.query(DynamicsPayment)
-        .filter(DynamicsPayment.status == NEW_STATUS)
-        .filter(DynamicsPayment.created_at < cutoff)
-        .order_by(DynamicsPayment.created_at)
-        .all()
+def _expire_chunk(cutoff: datetime, chunk_size: int) -> list[Row]:
+    """
+    Mark up to `chunk_size` unpaid payments created before the cutoff as
+    expired in one statement, returning the details needed to email each payee.
+    """
+    claimable = lock_next_batch_query(
+        select(DynamicsPayment.id)
+        .where(DynamicsPayment.status == NEW_STATUS)
+        .where(DynamicsPayment.created_at < cutoff)
+        .order_by(DynamicsPayment.created_at),
+        chunk_size,
     )
+    expired = db.session.execute(
+        update(DynamicsPayment)
+        .where(DynamicsPayment.id.in_(claimable))
+        # Without row locks another worker may have expired some since they
+        # were selected
+        .where(DynamicsPayment.status == NEW_STATUS)
+        .values(status=EXPIRED_STATUS)
+        .returning(
+            DynamicsPayment.id,
+            DynamicsPayment.case_number,
+            DynamicsPayment.payee_email,
+            DynamicsPayment.first_name,
+            DynamicsPayment.last_name,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.session.commit()
+    return expired
 
-    expired_count = 0
-    for payment in payments:
-        try:
-            payment.status = EXPIRED_STATUS
-            db.session.commit()
-            expired_count += 1
-            name = (
-                f"{payment.first_name or ''} {payment.last_name or ''}".strip()
-                or "customer"
+
+def _expiry_email(payment: Row) -> tuple[str, dict]:
+    name = f"{payment.first_name or ''} {payment.last_name or ''}".strip() or "customer"
+    return payment.payee_email, {"name": name, "case_number": payment.case_number}
+
+
+def _send_expiry_emails(payments: list[Row]) -> int:
+    """Email a batch of payees that their payment has expired. Returns the number sent."""
+    results = send_bulk_templated_email(
+        PAYMENT_LINK_EXPIRED_EMAIL, [_expiry_email(payment) for payment in payments]
+    )
+    for payment, sent in zip(payments, results):
+        if not sent:
+            current_app.logger.error(
+                "Failed to send expiry email for dynamics payment %s",
+                payment.id,
             )
-            if not send_email(
-                to=payment.payee_email,
-                subject="Your payment link has expired",
-                body=(
-                    f"Dear {name},\n\n"
-                    f"Your payment link for your service record request ({payment.case_number}) has expired. "
-                    "Please contact us if you still need to make this payment.\n\n"
-                    "Thank you,\n"
-                    "Request a military service record team\n"
-                    "The National Archives"
-                ),
-            ):
-                current_app.logger.error(
-                    "Failed to send expiry email for dynamics payment %s",
-                    payment.id,
-                )
+    return sum(results)
+
+
+def expire_old_payments(
+    days: int = 30, chunk_size: int | None = None, concurrency: int | None = None
+) -> ExpirySummary:
+    """
+    Expire unpaid payments a chunk at a time, emailing the payees of each chunk
+    in batches from a pool of EXPIRY_EMAIL_CONCURRENCY threads at no more than
+    SES_MAX_SEND_RATE emails a second.
+    """
+    app = current_app._get_current_object()
+    cutoff = datetime.now(tz=timezone.utc) - timedelta(days=days)
+    chunk_size = chunk_size or app.config.get("EXPIRE_PAYMENTS_CHUNK_SIZE")
+    email_batch_size = app.config.get("SES_BULK_CHUNK_SIZE")
+    counts = Counter()
+    counts_lock = threading.Lock()
+
+    def send(payments: list[Row]) -> int:
+        with app.app_context():
+            return _send_expiry_emails(payments)
+
+    def run_chunk() -> int:
+        try:
+            expired = _expire_chunk(cutoff, chunk_size)
         except Exception as e:
             db.session.rollback()
-            current_app.logger.error(
-                "Error expiring dynamics payment %s: %s", payment.id, e
+            app.logger.error("Error expiring dynamics payments: %s", e)
+            return 0
+        sent = sum(
+            email_pool.map(
+                send,
+                [
+                    expired[start : start + email_batch_size]
+                    for start in range(0, len(expired), email_batch_size)
+                ],
             )
+        )
+        app.logger.info(
+            "Expired %s Dynamics payments, sent %s of their emails",
+            len(expired),
+            sent,
+        )
+        with counts_lock:
+            counts["expired"] += len(expired)
+            counts["sent"] += sent
+            counts["failed"] += len(expired) - sent
+        return len(expired)
+
+    with ThreadPoolExecutor(
+        max_workers=app.config.get("EXPIRY_EMAIL_CONCURRENCY")
+    ) as email_pool:
+        drain(run_chunk, concurrency or app.config.get("BACKGROUND_JOB_CONCURRENCY"))
 
-    return expired_count
+    return ExpirySummary(counts["expired"], counts["sent"], counts["failed"])
 
 
 def main() -> None:
     app = create_app(os.getenv("CONFIG", "config.Production"))
     with app.app_context():
-        expired_count = expire_old_payments()
-        app.logger.info("Expired %s Dynamics payments", expired_count)
+        summary = expire_old_payments()
+        app.logger.info(
+            "Expired %s Dynamics payments: %s emails sent, %s failed",
+            summary.expired,
+            summary.emails_sent,
+            summary.emails_failed,
+        )
+        metrics = email_metrics()
+        app.logger.info(
+            "Sent %s emails a second, %s throttled by SES, "
+            "waited %ss for the send rate",
+            metrics["per_second"],
+            metrics["throttled"],
+            metrics["rate_limit_wait"],
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+"""
+Command to move proofs of death for paid requests to the submitted prefix, and
+delete ones which were never paid for.
+
+This is intended to be run as a cron job. The holding prefix is listed a page
+at a time, and each page's files are looked up against paid and sent requests
+at once. Files for those requests are copied to the submitted prefix from
+PROOF_OF_DEATH_PROMOTION_CONCURRENCY threads, and files for no paid request are
+deleted once they are older than PERMANENT_SESSION_LIFETIME, as the journey
+they were uploaded in has ended. Both are deleted from the holding prefix with
+as few DeleteObjects calls as possible.
+
+With PROOF_OF_DEATH_BATCH_PROMOTION set, paid requests leave their proof of
+death for this to move rather than moving it one at a time as they are sent.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+
+from app import create_app
+from app.lib.aws import (
+    delete_s3_objects,
+    get_client,
+    list_s3_objects,
+    proof_of_death_holding_prefix,
+    proof_of_death_submitted_key,
+)
+from app.lib.db.constants import PAID_STATUS, SENT_STATUS
+from app.lib.db.models import ArchivedServiceRecordRequest, ServiceRecordRequest, db
+
+PROMOTED_STATUSES = (PAID_STATUS, SENT_STATUS)
+
+
+def _paid_proofs_of_death(filenames: list[str]) -> set[str]:
+    """Which of these files are the proof of death of a paid or sent request, including archived ones."""
+    found = set()
+    for model in (ServiceRecordRequest, ArchivedServiceRecordRequest):
+        found.update(
+            filename
+            for (filename,) in db.session.query(model.proof_of_death).filter(
+                model.proof_of_death.in_(filenames),
+                model.status.in_(PROMOTED_STATUSES),
+            )
+        )
+    db.session.commit()
+    return found
+
+
+def _copy(s3, bucket_name: str, key_name: str, destination_key: str) -> str | None:
+    try:
+        s3.copy_object(
+            Bucket=bucket_name,
+            Key=destination_key,
+            CopySource={"Bucket": bucket_name, "Key": key_name},
+        )
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def promote_proofs_of_death(
+    concurrency: int | None = None, max_age: int | None = None
+) -> dict[str, int | float]:
+    """
+    Promote the proofs of death of paid requests and delete abandoned ones.
+    Returns the number of files listed, promoted, purged, kept and failed, and
+    how many seconds it took.
+    """
+    app = current_app._get_current_object()
+    counts = dict.fromkeys(("listed", "promoted", "purged", "kept", "failed"), 0)
+    bucket_name = app.config.get("PROOF_OF_DEATH_BUCKET_NAME")
+    holding_prefix = proof_of_death_holding_prefix()
+    if not bucket_name or not holding_prefix:
+        # Without a holding prefix the whole bucket would be listed, including
+        # files which have already been submitted
+        app.logger.error("Proof of death bucket configuration is missing.")
+        return {**counts, "seconds": 0.0}
+
+    cutoff = datetime.now(timezone.utc) - timedelta(
+        seconds=max_age or app.config.get("PERMANENT_SESSION_LIFETIME")
+    )
+    s3 = get_client("s3")
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(
+        max_workers=concurrency
+        or app.config.get("PROOF_OF_DEATH_PROMOTION_CONCURRENCY")
+    ) as executor:
+        for objects in list_s3_objects(bucket_name, holding_prefix):
+            counts["listed"] += len(objects)
+            paid = _paid_proofs_of_death(
+                [obj["Key"][len(holding_prefix) :] for obj in objects]
+            )
+
+            to_promote = {}
+            to_purge = []
+            for obj in objects:
+                if obj["Key"][len(holding_prefix) :] in paid:
+                    to_promote[obj["Key"]] = proof_of_death_submitted_key(obj["Key"])
+                elif obj["LastModified"] < cutoff:
+                    to_purge.append(obj["Key"])
+                else:
+                    counts["kept"] += 1
+
+            copied = []
+            errors = executor.map(
+                lambda keys: _copy(s3, bucket_name, *keys), to_promote.items()
+            )
+            for key_name, error in zip(to_promote, errors):
+                if error:
+                    app.logger.error(
+                        f"Error promoting proof of death {key_name}: {error}"
+                    )
+                    counts["failed"] += 1
+                else:
+                    copied.append(key_name)
+
+            # A file which was copied but not deleted is copied again next time
+            not_deleted = set(delete_s3_objects(bucket_name, copied + to_purge))
+            counts["promoted"] += len(copied)
+            counts["purged"] += len(set(to_purge) - not_deleted)
+            counts["failed"] += len(not_deleted)
+
+    counts["seconds"] = round(time.perf_counter() - start, 3)
+    return counts
+
+
+def main() -> None:
+    app = create_app(os.getenv("CONFIG", "config.Production"))
+    with app.app_context():
+        counts = promote_proofs_of_death()
+        app.logger.info(
+            "Listed %s proofs of death in %ss (%.0f a second): "
+            "%s promoted, %s purged, %s kept, %s failed",
+            counts["listed"],
+            counts["seconds"],
+            counts["listed"] / counts["seconds"] if counts["seconds"] else 0,
+            counts["promoted"],
+            counts["purged"],
+            counts["kept"],
+            counts["failed"],
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Command to register the email templates with SES, for when EMAIL_TEMPLATE_MODE
+is "ses".
+
+Run this on each deploy, before the app sends any email from a new version of a
+template. Versions which are already registered are left as they are, as a
+template is never changed once it has been registered.
+"""
+
+import os
+
+from flask import current_app
+
+from app import create_app
+from app.lib.aws import get_client
+from app.lib.emails import EMAIL_TEMPLATES, ses_template_name, ses_template_source
+
+
+def register_email_templates() -> int:
+    """Register each email template version SES doesn't have yet. Returns the number registered."""
+    ses = get_client("ses")
+    registered = 0
+    for template in EMAIL_TEMPLATES:
+        name = ses_template_name(template)
+        try:
+            ses.get_template(TemplateName=name)
+            continue
+        except ses.exceptions.TemplateDoesNotExistException:
+            pass
+        ses.create_template(
+            Template={
+                "TemplateName": name,
+                "SubjectPart": template.subject,
+                "TextPart": ses_template_source(template),
+            }
+        )
+        current_app.logger.info(f"Registered email template {name}")
+        registered += 1
+    return registered
+
+
+def main() -> None:
+    app = create_app(os.getenv("CONFIG", "config.Production"))
+    with app.app_context():
+        registered = register_email_templates()
+        app.logger.info(
+            "Registered %s of %s email templates", registered, len(EMAIL_TEMPLATES)
+        )
+
+
+if __name__ == "__main__":
+    main()
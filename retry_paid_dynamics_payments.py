@@ -1,52 +1,58 @@
 """
 Command to run to resend paid Dynamics payments to the MOD Copying API.
 
-This is intended to be run as a cron job, to ensure that
-any second payments that were marked as PAID but failed to
-send to the MOD Copying API are retried.
+This is intended to be run as a cron job. Sending each second payment is
+queued in the background_jobs outbox when it is paid, and this runs any of
+those which are due, retrying failures with exponential backoff.
+
+Pass --enqueue-existing once to queue payments which were marked as PAID
+before the outbox existed.
 """
 
 import os
-
-from flask import current_app
+import sys
 
 from app import create_app
-from app.lib.db.constants import PAID_STATUS, SENT_STATUS
+from app.lib.db.constants import PAID_STATUS
 from app.lib.db.models import DynamicsPayment, db
-from app.lib.dynamics_handler import send_payment_to_mod_copying_app
+from app.lib.gov_uk_pay import SEND_PAID_PAYMENT_JOB
+from app.lib.jobs import (
+    enqueue_job,
+    outbox_backlog,
+    run_due_jobs,
+    unfinished_job_payloads,
+)
+
+
+def enqueue_existing_paid_dynamics_payments() -> int:
+    queued_ids = {
+        payload.get("id") for payload in unfinished_job_payloads(SEND_PAID_PAYMENT_JOB)
+    }
+    paid_ids = [
+        id
+        for (id,) in db.session.query(DynamicsPayment.id).filter_by(status=PAID_STATUS)
+        if id not in queued_ids
+    ]
+    for id in paid_ids:
+        enqueue_job(SEND_PAID_PAYMENT_JOB, id=id)
+    db.session.commit()
+    return len(paid_ids)
 
 
 def resend_paid_dynamics_payments() -> int:
-    paid_payments = (
-        db.session.query(DynamicsPayment)
-        .filter_by(status=PAID_STATUS)
-        .order_by(DynamicsPayment.created_at)
-        .all()
-    )
-
-    sent_count = 0
-    for payment in paid_payments:
-        try:
-            if send_payment_to_mod_copying_app(payment):
-                payment.status = SENT_STATUS
-                db.session.commit()
-                sent_count += 1
-            else:
-                db.session.rollback()
-        except Exception as exc:
-            db.session.rollback()
-            current_app.logger.error(
-                "Error resending paid dynamics payment %s: %s", payment.id, exc
-            )
-
-    return sent_count
+    return run_due_jobs([SEND_PAID_PAYMENT_JOB])
 
 
 def main() -> None:
     app = create_app(os.getenv("CONFIG", "config.Production"))
     with app.app_context():
+        if "--enqueue-existing" in sys.argv[1:]:
+            queued_count = enqueue_existing_paid_dynamics_payments()
+            app.logger.info("Queued %s existing PAID dynamics payments", queued_count)
         sent_count = resend_paid_dynamics_payments()
-        app.logger.info("Resent %s PAID status dynamics payments", sent_count)
+        app.logger.info("Ran %s queued paid dynamics payments", sent_count)
+        if backlog := outbox_backlog().get(SEND_PAID_PAYMENT_JOB):
+            app.logger.info("Paid dynamics payments still queued: %s", backlog)
 
 
 if __name__ == "__main__":
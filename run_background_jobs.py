@@ -0,0 +1,56 @@
+"""
+Command to run the background job worker.
+
+This runs until it is stopped, running jobs as they are queued, such as sending
+paid requests to Dynamics and paid Dynamics payments to the MOD Copying API,
+and retrying proof of death uploads which failed in the background.
+Jobs are only queued when BACKGROUND_JOBS_ENABLED is set.
+"""
+
+import os
+import signal
+import time
+
+from flask import current_app
+
+from app import create_app
+from app.lib import (  # noqa: F401 - registers the job handlers
+    gov_uk_pay,
+    proof_of_death_uploads,
+)
+from app.lib.db.models import db
+from app.lib.jobs import run_pending_jobs
+
+
+def run_worker(poll_interval: float) -> None:
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while not stopping:
+        try:
+            ran = run_pending_jobs()
+        except Exception as e:
+            # Keep the worker running through a lost database connection
+            db.session.rollback()
+            current_app.logger.error(f"Error running background jobs: {e}")
+            ran = 0
+        if not ran:
+            time.sleep(poll_interval)
+
+
+def main() -> None:
+    app = create_app(os.getenv("CONFIG", "config.Production"))
+    with app.app_context():
+        app.logger.info("Background job worker started")
+        run_worker(app.config.get("BACKGROUND_JOB_POLL_INTERVAL"))
+        app.logger.info("Background job worker stopped")
+
+
+if __name__ == "__main__":
+    main()
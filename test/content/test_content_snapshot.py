@@ -0,0 +1,60 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from app.lib.content import (
+    clear_content_cache,
+    content_snapshot_path,
+    load_content,
+    write_content_snapshot,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_content_store():
+    clear_content_cache()
+    yield
+    clear_content_cache()
+
+
+@pytest.fixture
+def content_file(tmp_path):
+    path = tmp_path / "content.yaml"
+    path.write_text("app:\n  title: From YAML\n")
+    return path
+
+
+def test_write_content_snapshot_writes_alongside_the_yaml(content_file):
+    snapshot_path = write_content_snapshot(str(content_file))
+
+    assert snapshot_path == str(content_file.with_suffix(".pickle"))
+    assert os.path.exists(snapshot_path)
+
+
+def test_load_content_uses_the_snapshot_without_parsing_yaml(content_file):
+    write_content_snapshot(str(content_file))
+
+    with patch("app.lib.content.yaml.safe_load") as mock_safe_load:
+        content = load_content(str(content_file))
+
+    mock_safe_load.assert_not_called()
+    assert content["app"]["title"] == "From YAML"
+
+
+def test_load_content_ignores_a_stale_snapshot(content_file):
+    write_content_snapshot(str(content_file))
+    content_file.write_text("app:\n  title: Edited\n")
+
+    content = load_content(str(content_file))
+
+    assert content["app"]["title"] == "Edited"
+
+
+def test_load_content_ignores_a_corrupt_snapshot(content_file):
+    with open(content_snapshot_path(str(content_file)), "wb") as file:
+        file.write(b"not a pickle")
+
+    content = load_content(str(content_file))
+
+    assert content["app"]["title"] == "From YAML"
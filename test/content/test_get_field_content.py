@@ -1,6 +1,13 @@
 import unittest
+from unittest.mock import patch
 
-from app.lib.content import get_field_content
+from app.lib.content import (
+    FieldContentNotFound,
+    build_field_index,
+    get_field_bundle,
+    get_field_content,
+    load_content,
+)
 
 
 class TestGetFieldContent(unittest.TestCase):
@@ -58,8 +65,39 @@ class TestGetFieldContent(unittest.TestCase):
 
     def test_missing_field(self):
         """Test requesting a field that doesn't exist"""
-        result = get_field_content(self.test_content, "non_existent_field")
-        self.assertEqual(result, "'non_existent_field' not found in content.")
+        with self.assertRaises(FieldContentNotFound) as context:
+            get_field_content(self.test_content, "non_existent_field")
+        self.assertIn(
+            "'non_existent_field' not found in content.", str(context.exception)
+        )
+
+    def test_get_field_bundle(self):
+        """Test retrieving all of a field's content in one call"""
+        bundle = get_field_bundle(self.test_content, "forenames")
+        self.assertEqual(bundle.name, "forenames")
+        self.assertEqual(bundle.label, "First name")
+        self.assertIsNone(bundle.hint)
+        self.assertEqual(
+            bundle.messages["required"], "The service person's first name is required"
+        )
+
+    def test_get_field_bundle_missing_field(self):
+        """Test requesting the bundle for a field that doesn't exist"""
+        with self.assertRaises(FieldContentNotFound):
+            get_field_bundle(self.test_content, "non_existent_field")
+
+    def test_malformed_field_content_raises(self):
+        """Test that content for a field which is not a mapping is rejected"""
+        with self.assertRaises(ValueError):
+            build_field_index({"forms": {"fields": {"forenames": "First name"}}})
+
+    def test_loaded_content_uses_the_prebuilt_index(self):
+        """Test that content from load_content is looked up via its index"""
+        content = load_content()
+        with patch("app.lib.content.build_field_index") as mock_build_field_index:
+            label = get_field_content(content, "forenames", "label")
+        mock_build_field_index.assert_not_called()
+        self.assertEqual(label, content["forms"]["fields"]["forenames"]["label"])
 
     def test_complex_field_content(self):
         """Test retrieving content from a field with complex data (list)"""
@@ -0,0 +1,88 @@
+import copy
+import os
+
+import pytest
+
+from app.lib.content import (
+    FrozenDict,
+    FrozenList,
+    clear_content_cache,
+    configure_content,
+    load_content,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_content_store():
+    clear_content_cache()
+    configure_content(auto_reload=True)
+    yield
+    clear_content_cache()
+    configure_content(auto_reload=True)
+
+
+@pytest.fixture
+def content_file(tmp_path):
+    path = tmp_path / "content.yaml"
+    path.write_text("app:\n  title: First title\nitems:\n  - one\n  - two\n")
+    return path
+
+
+def _rewrite(path, text):
+    # Bump the mtime explicitly so the change is detected on filesystems with
+    # coarse timestamps
+    stat = os.stat(path)
+    path.write_text(text)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_load_content_returns_the_same_object_while_the_file_is_unchanged(
+    content_file,
+):
+    first = load_content(str(content_file))
+    second = load_content(str(content_file))
+
+    assert first["app"]["title"] == "First title"
+    assert first is second
+
+
+def test_load_content_reloads_when_the_file_changes(content_file):
+    first = load_content(str(content_file))
+    _rewrite(content_file, "app:\n  title: Second title\n")
+
+    second = load_content(str(content_file))
+
+    assert second is not first
+    assert second["app"]["title"] == "Second title"
+
+
+def test_load_content_does_not_reload_when_auto_reload_is_disabled(content_file):
+    configure_content(auto_reload=False)
+    first = load_content(str(content_file))
+    _rewrite(content_file, "app:\n  title: Second title\n")
+
+    assert load_content(str(content_file)) is first
+    assert first["app"]["title"] == "First title"
+
+
+def test_load_content_is_read_only(content_file):
+    content = load_content(str(content_file))
+
+    assert isinstance(content, FrozenDict)
+    assert isinstance(content["items"], FrozenList)
+    with pytest.raises(TypeError):
+        content["app"]["title"] = "Changed"
+    with pytest.raises(TypeError):
+        content["items"].append("three")
+    assert copy.deepcopy(content) is content
+
+
+def test_load_content_missing_file_returns_empty_dict(tmp_path):
+    assert load_content(str(tmp_path / "missing.yaml")) == {}
+
+
+def test_load_content_invalid_yaml_returns_empty_dict(tmp_path):
+    path = tmp_path / "invalid.yaml"
+    path.write_text("app: [unclosed\n")
+
+    assert load_content(str(path)) == {}
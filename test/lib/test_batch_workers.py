@@ -0,0 +1,82 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+from flask import current_app
+
+from app import create_app
+from app.lib.batch_workers import RateLimiter, RedisTokenBucket, drain
+
+
+@pytest.fixture(scope="module")
+def app():
+    return create_app("config.Test")
+
+
+def _batches(remaining: list[int], seen_apps: set):
+    lock = threading.Lock()
+
+    def run_batch() -> int:
+        seen_apps.add(current_app.name)
+        with lock:
+            return remaining.pop() if remaining else 0
+
+    return run_batch
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_drain_runs_batches_until_there_are_none_left(app, concurrency):
+    seen_apps = set()
+
+    with app.app_context():
+        total = drain(_batches([5, 5, 3, 2], seen_apps), concurrency)
+
+    assert total == 15
+    assert seen_apps == {app.name}
+
+
+def test_rate_limiter_spaces_out_calls():
+    with patch("app.lib.batch_workers.time") as mock_time:
+        mock_time.monotonic.return_value = 100.0
+        rate_limiter = RateLimiter(rate=10)
+        for _ in range(3):
+            rate_limiter.wait()
+
+    delays = [call.args[0] for call in mock_time.sleep.call_args_list]
+    assert delays == pytest.approx([0, 0.1, 0.2])
+
+
+def test_rate_limiter_without_a_rate_does_not_wait():
+    with patch("app.lib.batch_workers.time.sleep") as mock_sleep:
+        RateLimiter(rate=None).wait()
+
+    mock_sleep.assert_not_called()
+
+
+def test_rate_limiter_waits_for_several_calls_at_once():
+    with patch("app.lib.batch_workers.time") as mock_time:
+        mock_time.monotonic.return_value = 100.0
+        rate_limiter = RateLimiter(rate=10)
+        assert rate_limiter.wait(5) == 0
+        assert rate_limiter.wait() == pytest.approx(0.5)
+
+
+def test_redis_token_bucket_waits_for_as_long_as_redis_says():
+    mock_redis = MagicMock()
+    mock_redis.register_script.return_value.return_value = b"0.25"
+
+    with patch("app.lib.batch_workers.time.sleep") as mock_sleep:
+        assert RedisTokenBucket(mock_redis, "ses/send-rate", rate=14).wait(50) == 0.25
+
+    mock_redis.register_script.return_value.assert_called_once_with(
+        keys=["ses/send-rate"], args=[14, 50]
+    )
+    mock_sleep.assert_called_once_with(0.25)
+
+
+def test_redis_token_bucket_without_a_rate_does_not_call_redis():
+    mock_redis = MagicMock()
+
+    assert RedisTokenBucket(mock_redis, "ses/send-rate", rate=None).wait() == 0
+
+    mock_redis.register_script.return_value.assert_not_called()
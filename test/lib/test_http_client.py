@@ -0,0 +1,89 @@
+import pytest
+import requests_mock
+
+from app import create_app
+from app.lib import http_client
+
+PAY_URL = "https://pay.example.com/v1/payments"
+
+
+@pytest.fixture
+def app():
+    app = create_app("config.Test")
+    with app.app_context():
+        http_client._sessions.clear()
+        yield app
+    http_client._sessions.clear()
+
+
+def test_session_is_reused_for_each_upstream(app):
+    session = http_client.get_session("gov_uk_pay")
+
+    assert http_client.get_session("gov_uk_pay") is session
+    assert http_client.get_session("mod_copying") is not session
+
+
+def test_unknown_upstream_is_rejected(app):
+    with pytest.raises(ValueError):
+        http_client.get("somewhere_else", PAY_URL)
+
+
+def test_upstream_overrides_are_applied(app):
+    app.config["HTTP_UPSTREAM_OVERRIDES"] = {
+        "gov_uk_pay": {"read_timeout": 20, "retries": 0}
+    }
+
+    settings = http_client.upstream_settings("gov_uk_pay")
+
+    assert settings["read_timeout"] == 20
+    assert settings["retries"] == 0
+    assert settings["connect_timeout"] == app.config["HTTP_CONNECT_TIMEOUT"]
+    assert (
+        http_client.get_session("gov_uk_pay").get_adapter(PAY_URL).max_retries.total
+        == 0
+    )
+
+
+def test_requests_have_connect_and_read_timeouts(app):
+    with requests_mock.Mocker() as mock:
+        mock.get(PAY_URL, json={})
+        http_client.get("gov_uk_pay", PAY_URL)
+
+    assert mock.last_request.timeout == (
+        app.config["HTTP_CONNECT_TIMEOUT"],
+        app.config["HTTP_READ_TIMEOUT"],
+    )
+
+
+def test_only_lookups_retry_posts(app):
+    def retried_methods(upstream):
+        adapter = http_client.get_session(upstream).get_adapter(PAY_URL)
+        return adapter.max_retries.allowed_methods
+
+    assert "GET" in retried_methods("gov_uk_pay")
+    assert "POST" not in retried_methods("gov_uk_pay")
+    assert "POST" not in retried_methods("mod_copying")
+    assert "POST" in retried_methods("record_copying_service")
+
+
+def test_latency_is_recorded_for_each_upstream(app):
+    before = http_client.upstream_latency()["mod_copying"]
+
+    with requests_mock.Mocker() as mock:
+        mock.post(PAY_URL, status_code=500)
+        http_client.post("mod_copying", PAY_URL)
+        mock.post(PAY_URL, status_code=200)
+        http_client.post("mod_copying", PAY_URL)
+
+    after = http_client.upstream_latency()["mod_copying"]
+    assert after["calls"] == before["calls"] + 2
+    assert after["errors"] == before["errors"] + 1
+    assert "p95_ms" in after
+
+
+def test_sessions_are_not_shared_with_forked_processes(app):
+    http_client.get_session("gov_uk_pay")
+
+    http_client._reset_after_fork()
+
+    assert http_client._sessions == {}
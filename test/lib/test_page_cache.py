@@ -0,0 +1,115 @@
+from unittest.mock import patch
+
+import pytest
+from flask import Flask, make_response
+
+from app import create_app
+from app.lib.cache import PAGE_CACHE_ALLOWLIST, cache, cache_page
+
+CANCELLED_URL = "/request-a-military-service-record/you-have-cancelled-your-request/"
+
+
+@pytest.fixture
+def app():
+    app = create_app("config.Test")
+    app.config.update(
+        PAGE_CACHE_ENABLED=True, PAGE_CACHE_TIMEOUT=60, BUILD_VERSION="v1"
+    )
+    with app.app_context():
+        cache.clear()
+    return app
+
+
+@pytest.fixture
+def standalone_app():
+    app = Flask(__name__)
+    app.config.update(CACHE_TYPE="SimpleCache", PAGE_CACHE_ENABLED=True)
+    cache.init_app(app)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["entered_through_index_page"] = True
+    return client
+
+
+def test_allowlisted_page_is_rendered_once(app, client):
+    with patch("app.main.routes.routes.render_template") as mock_render:
+        mock_render.return_value = "<p>cancelled</p>"
+        first = client.get(CANCELLED_URL)
+        second = client.get(CANCELLED_URL)
+
+    assert mock_render.call_count == 1
+    assert first.status_code == second.status_code == 200
+    assert second.data == first.data == b"<p>cancelled</p>"
+    assert second.headers["Cache-Control"] == "no-store"
+
+
+def test_cookie_preferences_and_build_version_vary_the_cache(app, client):
+    with patch("app.main.routes.routes.render_template") as mock_render:
+        mock_render.return_value = "<p>cancelled</p>"
+        client.get(CANCELLED_URL)
+        client.set_cookie("theme", "dark")
+        client.get(CANCELLED_URL)
+        app.config["BUILD_VERSION"] = "v2"
+        client.get(CANCELLED_URL)
+
+    assert mock_render.call_count == 3
+
+
+def test_page_cache_can_be_disabled(app, client):
+    app.config["PAGE_CACHE_ENABLED"] = False
+    with patch("app.main.routes.routes.render_template") as mock_render:
+        mock_render.return_value = "<p>cancelled</p>"
+        client.get(CANCELLED_URL)
+        client.get(CANCELLED_URL)
+
+    assert mock_render.call_count == 2
+
+
+def test_set_cookie_headers_are_not_cached(standalone_app):
+    @standalone_app.route("/shared/")
+    @cache_page
+    def shared():
+        response = make_response("shared")
+        response.set_cookie("tracking", "first-visitor")
+        return response
+
+    client = standalone_app.test_client()
+    with patch("app.lib.cache.PAGE_CACHE_ALLOWLIST", frozenset({"shared"})):
+        first = client.get("/shared/")
+        second = client.get("/shared/")
+
+    assert "Set-Cookie" in first.headers
+    assert second.data == b"shared"
+    assert "Set-Cookie" not in second.headers
+
+
+def test_pages_outside_the_allowlist_are_never_cached(standalone_app):
+    calls = []
+
+    @standalone_app.route("/personal/")
+    @cache_page
+    def personal():
+        calls.append(1)
+        return make_response("personal")
+
+    client = standalone_app.test_client()
+    client.get("/personal/")
+    client.get("/personal/")
+
+    assert "personal" not in PAGE_CACHE_ALLOWLIST
+    assert len(calls) == 2
+
+
+def test_unsuccessful_responses_are_not_cached(app, client):
+    with patch("app.main.routes.routes.render_template") as mock_render:
+        mock_render.side_effect = [("error", 500), "<p>cancelled</p>"]
+        first = client.get(CANCELLED_URL)
+        second = client.get(CANCELLED_URL)
+
+    assert first.status_code == 500
+    assert second.status_code == 200
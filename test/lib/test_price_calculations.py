@@ -189,7 +189,7 @@ def test_prepare_order_summary_data_full_record_check_digital(app_context):
 
 def test_calculate_delivery_fee_api_error(app_context):
     """Test delivery fee calculation when API returns an error."""
-    with patch("app.lib.price_calculations.requests.post") as mock_post:
+    with patch("app.lib.price_calculations.http_client.post") as mock_post:
         mock_post.return_value.raise_for_status.side_effect = (
             requests.exceptions.HTTPError("500 Server Error")
         )
@@ -200,7 +200,7 @@ def test_calculate_delivery_fee_api_error(app_context):
 
 def test_calculate_delivery_fee_api_timeout(app_context):
     """Test delivery fee calculation when API times out."""
-    with patch("app.lib.price_calculations.requests.post") as mock_post:
+    with patch("app.lib.price_calculations.http_client.post") as mock_post:
         mock_post.side_effect = requests.exceptions.Timeout("Request timed out")
 
         with pytest.raises(requests.exceptions.Timeout):
@@ -209,7 +209,7 @@ def test_calculate_delivery_fee_api_timeout(app_context):
 
 def test_calculate_delivery_fee_api_connection_error(app_context):
     """Test delivery fee calculation when API is unreachable."""
-    with patch("app.lib.price_calculations.requests.post") as mock_post:
+    with patch("app.lib.price_calculations.http_client.post") as mock_post:
         mock_post.side_effect = requests.exceptions.ConnectionError("Failed to connect")
 
         with pytest.raises(requests.exceptions.ConnectionError):
@@ -218,7 +218,7 @@ def test_calculate_delivery_fee_api_connection_error(app_context):
 
 def test_calculate_delivery_fee_invalid_json_response(app_context):
     """Test delivery fee calculation when API returns invalid JSON."""
-    with patch("app.lib.price_calculations.requests.post") as mock_post:
+    with patch("app.lib.price_calculations.http_client.post") as mock_post:
         mock_response = mock_post.return_value
         mock_response.raise_for_status.return_value = None
         mock_response.json.side_effect = ValueError("Invalid JSON")
@@ -235,7 +235,7 @@ def test_calculate_amount_when_delivery_fee_api_fails(app_context):
         "requester_country": "United Kingdom",
     }
 
-    with patch("app.lib.price_calculations.requests.post") as mock_post:
+    with patch("app.lib.price_calculations.http_client.post") as mock_post:
         mock_post.side_effect = requests.exceptions.HTTPError("500 Server Error")
 
         with pytest.raises(requests.exceptions.HTTPError):
@@ -257,7 +257,7 @@ def test_prepare_order_summary_data_when_api_fails(app_context):
         "requester_country": "United Kingdom",
     }
 
-    with patch("app.lib.price_calculations.requests.post") as mock_post:
+    with patch("app.lib.price_calculations.http_client.post") as mock_post:
         mock_post.side_effect = requests.exceptions.HTTPError("500 Server Error")
 
         result = prepare_order_summary_data(form_data)
@@ -0,0 +1,61 @@
+import os
+from unittest.mock import patch
+
+import pytest
+from jinja2 import FileSystemBytecodeCache, MemcachedBytecodeCache
+
+from app import create_app
+from app.lib.template_cache import (
+    TEMPLATE_EXTENSIONS,
+    init_template_bytecode_cache,
+    warm_up_templates,
+)
+
+
+@pytest.fixture
+def app():
+    return create_app("config.Test")
+
+
+def test_no_bytecode_cache_by_default(app):
+    assert app.jinja_env.bytecode_cache is None
+
+
+def test_filesystem_bytecode_cache_is_keyed_by_build_version(app, tmp_path):
+    app.config.update(
+        TEMPLATE_BYTECODE_CACHE_TYPE="FileSystemBytecodeCache",
+        TEMPLATE_BYTECODE_CACHE_DIR=str(tmp_path),
+        BUILD_VERSION="v1.2.3",
+    )
+
+    init_template_bytecode_cache(app)
+    app.jinja_env.get_template("main/before-you-start.html")
+
+    assert isinstance(app.jinja_env.bytecode_cache, FileSystemBytecodeCache)
+    cached_files = os.listdir(tmp_path)
+    assert cached_files
+    assert all(name.startswith("__jinja2_v1.2.3_") for name in cached_files)
+
+
+def test_redis_bytecode_cache_is_keyed_by_build_version(app):
+    app.config.update(
+        TEMPLATE_BYTECODE_CACHE_TYPE="RedisBytecodeCache",
+        TEMPLATE_BYTECODE_CACHE_REDIS_URL="redis://localhost:6379/2",
+        BUILD_VERSION="v1.2.3",
+    )
+
+    with patch("app.lib.template_cache.Redis.from_url") as mock_from_url:
+        init_template_bytecode_cache(app)
+
+    mock_from_url.assert_called_once_with("redis://localhost:6379/2")
+    assert isinstance(app.jinja_env.bytecode_cache, MemcachedBytecodeCache)
+    assert app.jinja_env.bytecode_cache.prefix == "jinja2/bytecode/v1.2.3/"
+
+
+def test_warm_up_templates_compiles_app_and_frontend_templates(app):
+    compiled = warm_up_templates(app)
+
+    assert compiled == len(app.jinja_env.list_templates(extensions=TEMPLATE_EXTENSIONS))
+    cached_names = {name for _, name in app.jinja_env.cache.keys()}
+    assert "main/before-you-start.html" in cached_names
+    assert "components/phase-banner/macro.html" in cached_names
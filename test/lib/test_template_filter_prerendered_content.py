@@ -0,0 +1,105 @@
+from unittest.mock import patch
+
+import pytest
+from markupsafe import Markup
+
+from app.lib import template_filters
+from app.lib.template_filters import (
+    inject_unique_survey_link,
+    parse_bold_text,
+    parse_first_birth_year_for_closed_records,
+    parse_markdown_links,
+    prerender_content,
+)
+
+CONTENT = {
+    "pages": {
+        "example": {
+            "paragraphs": [
+                "Read [the guide](https://example.com/guide) first.",
+                "This is **important**.",
+                "Born in or after [FIRST_BIRTH_YEAR_FOR_CLOSED_RECORDS].",
+            ],
+            "feedback": "Give [feedback](https://example.com/survey).",
+        }
+    }
+}
+
+
+@pytest.fixture(autouse=True)
+def prerendered_content():
+    previous = (template_filters._content_strings, template_filters._prerendered)
+    prerender_content(CONTENT)
+    yield
+    template_filters._content_strings, template_filters._prerendered = previous
+
+
+def test_prerender_content_renders_static_filters_up_front():
+    keys = {key[:2] for key in template_filters._prerendered}
+
+    assert (
+        "parse_markdown_links",
+        CONTENT["pages"]["example"]["paragraphs"][0],
+    ) in keys
+    assert ("parse_bold_text", CONTENT["pages"]["example"]["paragraphs"][1]) in keys
+    assert (
+        "parse_first_birth_year_for_closed_records",
+        CONTENT["pages"]["example"]["paragraphs"][2],
+    ) in keys
+
+
+@pytest.mark.parametrize(
+    "render",
+    [
+        lambda s: parse_markdown_links(s),
+        lambda s: parse_markdown_links(s, new_tab=False),
+        lambda s: parse_bold_text(s),
+        lambda s: parse_first_birth_year_for_closed_records(s),
+        lambda s: inject_unique_survey_link(s, current_endpoint="main.start"),
+    ],
+)
+def test_prerendered_output_matches_the_filter(render):
+    for s in CONTENT["pages"]["example"]["paragraphs"]:
+        prerendered = render(s)
+        prerender_content()
+        assert prerendered == render(s)
+        prerender_content(CONTENT)
+
+
+def test_content_strings_are_returned_as_markup_from_the_table():
+    s = CONTENT["pages"]["example"]["paragraphs"][0]
+
+    first = parse_markdown_links(s)
+
+    assert isinstance(first, Markup)
+    assert parse_markdown_links(s) is first
+
+
+def test_endpoint_dependent_output_is_stored_per_endpoint():
+    s = CONTENT["pages"]["example"]["feedback"]
+
+    start = inject_unique_survey_link(s, current_endpoint="main.start")
+    before = inject_unique_survey_link(s, current_endpoint="main.before_you_start")
+
+    assert "current_page=start" in start
+    assert "current_page=before_you_start" in before
+    assert inject_unique_survey_link(s, current_endpoint="main.start") is start
+
+
+def test_birth_year_output_is_keyed_by_current_year():
+    s = CONTENT["pages"]["example"]["paragraphs"][2]
+
+    with patch.object(template_filters, "_current_year", return_value=2030):
+        assert "1915" in parse_first_birth_year_for_closed_records(s)
+    with patch.object(template_filters, "_current_year", return_value=2031):
+        assert "1916" in parse_first_birth_year_for_closed_records(s)
+
+
+def test_dynamic_strings_fall_back_to_the_filter():
+    s = "Not [from content](https://example.com)"
+
+    result = parse_markdown_links(s)
+
+    assert not isinstance(result, Markup)
+    assert result.startswith('Not <a href="https://example.com"')
+    assert not any(key[1] == s for key in template_filters._prerendered)
@@ -0,0 +1,51 @@
+import inspect
+from unittest.mock import patch
+
+import pytest
+from flask import Flask, g
+
+from app.lib.decorators.state_machine_decorator import with_state_machine
+from app.lib.state_machine.transition_table import RoutingStateCursor
+
+
+@pytest.fixture
+def flask_app():
+    return Flask(__name__)
+
+
+def test_injects_state_machine_when_the_view_accepts_it(flask_app):
+    @with_state_machine
+    def view(state_machine):
+        return state_machine
+
+    with flask_app.test_request_context():
+        state_machine = view()
+
+        assert isinstance(state_machine, RoutingStateCursor)
+        assert g.state_machine is state_machine
+
+
+def test_does_not_inject_state_machine_when_the_view_does_not_accept_it(flask_app):
+    @with_state_machine
+    def view(*args, **kwargs):
+        return kwargs
+
+    with flask_app.test_request_context():
+        assert view() == {}
+        assert isinstance(g.state_machine, RoutingStateCursor)
+
+
+def test_resolves_the_view_signature_once_when_decorating(flask_app):
+    def view(state_machine):
+        return state_machine
+
+    with patch(
+        "app.lib.decorators.state_machine_decorator.inspect.signature",
+        wraps=inspect.signature,
+    ) as mock_signature:
+        decorated = with_state_machine(view)
+        with flask_app.test_request_context():
+            decorated()
+            decorated()
+
+    mock_signature.assert_called_once_with(view)
@@ -140,3 +140,18 @@ class TestUpdateDynamicBackLinkMapping:
             view()
 
             assert session["dynamic_back_links"] == {"a": "/a", "b": "/b"}
+
+    def test_does_not_modify_session_when_mappings_are_unchanged(self, flask_app):
+        """Should leave the session unmodified when it already holds the mappings."""
+        with flask_app.test_request_context():
+            session["dynamic_back_links"] = {"test": "/test"}
+            session.modified = False
+
+            @update_dynamic_back_link_mapping(mappings={"test": "/test"})
+            def view():
+                return "success"
+
+            view()
+
+            assert session.modified is False
+            assert session["dynamic_back_links"] == {"test": "/test"}
@@ -0,0 +1,57 @@
+import pytest
+from flask import Flask, session
+from flask_wtf import FlaskForm
+from wtforms import StringField
+
+from app.lib.decorators.with_form_prefilled_from_session import (
+    with_form_prefilled_from_session,
+)
+
+
+class NameForm(FlaskForm):
+    name = StringField()
+
+
+@pytest.fixture
+def flask_app():
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY="test-secret-key", WTF_CSRF_ENABLED=False)
+    return app
+
+
+def test_prefills_the_form_from_session_on_get(flask_app):
+    @with_form_prefilled_from_session(NameForm)
+    def view(form):
+        return form
+
+    with flask_app.test_request_context(method="GET"):
+        session["form_data"] = {"name": "Tommy Atkins", "unrelated": "value"}
+
+        form = view()
+
+        assert form.name.data == "Tommy Atkins"
+
+
+def test_editing_the_form_does_not_change_the_session(flask_app):
+    @with_form_prefilled_from_session(NameForm)
+    def view(form):
+        form.name.data = "Changed"
+        return form
+
+    with flask_app.test_request_context(method="GET"):
+        session["form_data"] = {"name": "Tommy Atkins"}
+
+        view()
+
+        assert session["form_data"] == {"name": "Tommy Atkins"}
+
+
+def test_ignores_session_form_data_which_is_not_a_dict(flask_app):
+    @with_form_prefilled_from_session(NameForm)
+    def view(form):
+        return form
+
+    with flask_app.test_request_context(method="GET"):
+        session["form_data"] = "not a dict"
+
+        assert view().name.data is None
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from app.lib.db.constants import EXPIRED_STATUS, NEW_STATUS, PAID_STATUS, SENT_STATUS
+from app.lib.db.db_handler import (
+    get_dynamics_payment,
+    get_gov_uk_dynamics_payment,
+    get_service_record_request,
+)
+from app.lib.db.models import (
+    ArchivedDynamicsPayment,
+    ArchivedGOVUKDynamicsPayment,
+    ArchivedServiceRecordRequest,
+    DynamicsPayment,
+    GOVUKDynamicsPayment,
+    ServiceRecordRequest,
+    db,
+)
+from archive_old_records import archive_old_records
+
+MODELS = (
+    ArchivedGOVUKDynamicsPayment,
+    ArchivedDynamicsPayment,
+    ArchivedServiceRecordRequest,
+    GOVUKDynamicsPayment,
+    DynamicsPayment,
+    ServiceRecordRequest,
+)
+
+
+@pytest.fixture(scope="module")
+def app():
+    return create_app("config.Test")
+
+
+@pytest.fixture()
+def db_session(app):
+    with app.app_context():
+        db.create_all()
+        yield db.session
+        db.session.rollback()
+        for model in MODELS:
+            db.session.query(model).delete()
+        db.session.commit()
+
+
+def _created(days_ago: int) -> datetime:
+    return datetime.now() - timedelta(days=days_ago)
+
+
+def _paid(status: str, days_ago: int) -> datetime | None:
+    return _created(days_ago) if status in (PAID_STATUS, SENT_STATUS) else None
+
+
+def _request(
+    id: str, status: str, days_ago: int, paid_days_ago: int | None = None
+) -> ServiceRecordRequest:
+    return ServiceRecordRequest(
+        id=id,
+        record_hash=f"hash-{id}",
+        requester_email="jane@example.com",
+        status=status,
+        created_at=_created(days_ago),
+        payment_date=_paid(status, paid_days_ago or days_ago),
+    )
+
+
+def _payment(id: str, status: str, days_ago: int) -> DynamicsPayment:
+    return DynamicsPayment(
+        id=id,
+        case_number=f"CASE-{id}",
+        reference=f"REF-{id}",
+        net_amount=1000,
+        total_amount=1000,
+        payee_email="jane@example.com",
+        status=status,
+        created_at=_created(days_ago),
+        payment_date=_paid(status, days_ago),
+    )
+
+
+def test_only_old_sent_and_expired_rows_are_archived(db_session):
+    db_session.add_all(
+        [
+            _request("old-sent", SENT_STATUS, 200),
+            _request("old-paid", PAID_STATUS, 200),
+            _request("recent-sent", SENT_STATUS, 10),
+            _request("recently-paid", SENT_STATUS, 200, paid_days_ago=10),
+            _payment("old-expired", EXPIRED_STATUS, 200),
+            _payment("old-new", NEW_STATUS, 200),
+        ]
+    )
+    db_session.commit()
+
+    assert archive_old_records(days=180, batch_size=1) == {
+        "service_record_requests": 1,
+        "dynamics_payments": 1,
+    }
+
+    assert {id for (id,) in db_session.query(ServiceRecordRequest.id)} == {
+        "old-paid",
+        "recent-sent",
+        "recently-paid",
+    }
+    assert [id for (id,) in db_session.query(DynamicsPayment.id)] == ["old-new"]
+    archived = db_session.get(ArchivedServiceRecordRequest, "old-sent")
+    assert archived.record_hash == "hash-old-sent"
+    assert archived.archived_at is not None
+    assert db_session.get(ArchivedDynamicsPayment, "old-expired") is not None
+
+
+def test_payment_attempts_are_archived_with_their_payment(db_session):
+    db_session.add(_payment("payment-1", SENT_STATUS, 200))
+    db_session.add(
+        GOVUKDynamicsPayment(
+            id="attempt-1", dynamics_payment_id="payment-1", gov_uk_payment_id="pay-1"
+        )
+    )
+    db_session.commit()
+
+    archive_old_records(days=180)
+
+    assert db_session.query(GOVUKDynamicsPayment).count() == 0
+    assert (
+        db_session.get(ArchivedGOVUKDynamicsPayment, "attempt-1").gov_uk_payment_id
+        == "pay-1"
+    )
+
+
+def test_lookups_by_id_fall_back_to_the_archive(db_session):
+    db_session.add(_request("record-1", SENT_STATUS, 200))
+    db_session.add(_payment("payment-1", EXPIRED_STATUS, 200))
+    db_session.add(
+        GOVUKDynamicsPayment(
+            id="attempt-1", dynamics_payment_id="payment-1", gov_uk_payment_id="pay-1"
+        )
+    )
+    db_session.commit()
+
+    archive_old_records(days=180)
+
+    assert get_service_record_request("record-1").status == SENT_STATUS
+    assert get_dynamics_payment("payment-1").status == EXPIRED_STATUS
+    assert get_gov_uk_dynamics_payment("attempt-1").dynamics_payment_id == "payment-1"
+    assert get_service_record_request("not-a-record") is None
@@ -1,4 +1,7 @@
 import io
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -6,10 +9,14 @@ from flask import current_app
 from werkzeug.datastructures import FileStorage
 
 from app import create_app
+from app.lib import aws
 from app.lib.aws import (
+    create_proof_of_death_upload,
+    get_client,
     move_proof_of_death_to_submitted,
     upload_file_to_s3,
     upload_proof_of_death,
+    verify_proof_of_death_upload,
 )
 
 
@@ -35,7 +42,9 @@ def app():
 @pytest.fixture()
 def context(app):
     with app.app_context():
+        aws._clients.clear()
         yield
+    aws._clients.clear()
 
 
 def test_upload_file_to_s3_valid_file_returns_filename(context):
@@ -47,10 +56,7 @@ def test_upload_file_to_s3_valid_file_returns_filename(context):
     mock_s3 = MagicMock()
     mock_s3.upload_fileobj = MagicMock(return_value=None)
 
-    mock_session = MagicMock()
-    mock_session.client.return_value = mock_s3
-
-    with patch("app.lib.aws.get_boto3_session", return_value=mock_session):
+    with patch("app.lib.aws.get_client", return_value=mock_s3) as mock_get_client:
         result = upload_file_to_s3(
             file=fs,
             bucket_name="test-bucket",
@@ -59,7 +65,7 @@ def test_upload_file_to_s3_valid_file_returns_filename(context):
 
     assert isinstance(result, str)
     assert result == "override-name.png"
-    mock_session.client.assert_called_once_with("s3")
+    mock_get_client.assert_called_once_with("s3")
     mock_s3.upload_fileobj.assert_called_once()
     # Verify the correct arguments were passed
     call_args = mock_s3.upload_fileobj.call_args
@@ -80,10 +86,7 @@ def test_upload_file_to_s3_pdf_uses_application_pdf_content_type(context):
     mock_s3 = MagicMock()
     mock_s3.upload_fileobj = MagicMock(return_value=None)
 
-    mock_session = MagicMock()
-    mock_session.client.return_value = mock_s3
-
-    with patch("app.lib.aws.get_boto3_session", return_value=mock_session):
+    with patch("app.lib.aws.get_client", return_value=mock_s3) as mock_get_client:
         result = upload_file_to_s3(
             file=fs,
             bucket_name="test-bucket",
@@ -91,6 +94,7 @@ def test_upload_file_to_s3_pdf_uses_application_pdf_content_type(context):
         )
 
     assert result == "override-name.pdf"
+    mock_get_client.assert_called_once_with("s3")
     call_args = mock_s3.upload_fileobj.call_args
     assert call_args.kwargs["ExtraArgs"] == {"ContentType": "application/pdf"}
 
@@ -105,17 +109,14 @@ def test_move_proof_of_death_to_submitted_copies_and_deletes(context):
     mock_s3.copy_object = MagicMock(return_value=None)
     mock_s3.delete_object = MagicMock(return_value=None)
 
-    mock_session = MagicMock()
-    mock_session.client.return_value = mock_s3
-
     try:
-        with patch("app.lib.aws.get_boto3_session", return_value=mock_session):
+        with patch("app.lib.aws.get_client", return_value=mock_s3) as mock_get_client:
             result = move_proof_of_death_to_submitted("holding/proof.png")
     finally:
         current_app.config["ENVIRONMENT_NAME"] = previous_env
 
     assert result is True
-    mock_session.client.assert_called_once_with("s3")
+    mock_get_client.assert_called_once_with("s3")
     mock_s3.copy_object.assert_called_once_with(
         Bucket="proof-bucket",
         Key="submitted/proof.png",
@@ -134,7 +135,7 @@ def test_upload_file_to_s3_invalid_empty_file_returns_none(context):
     )
 
     # Because the function returns early for empty content, boto3 should never be called
-    with patch("app.lib.aws.get_boto3_session") as mock_session:
+    with patch("app.lib.aws.get_client") as mock_get_client:
         result = upload_file_to_s3(
             file=fs,
             bucket_name="test-bucket",
@@ -142,7 +143,7 @@ def test_upload_file_to_s3_invalid_empty_file_returns_none(context):
         )
 
     assert result is None
-    mock_session.assert_not_called()
+    mock_get_client.assert_not_called()
 
 
 def test_upload_file_to_s3_retries_on_failure(context):
@@ -155,20 +156,80 @@ def test_upload_file_to_s3_retries_on_failure(context):
     # Simulate failure on all attempts
     mock_s3.upload_fileobj.side_effect = Exception("S3 error")
 
-    mock_session = MagicMock()
-    mock_session.client.return_value = mock_s3
-
-    with patch("app.lib.aws.get_boto3_session", return_value=mock_session):
+    with patch("app.lib.aws.get_client", return_value=mock_s3) as mock_get_client:
         result = upload_file_to_s3(
             file=fs,
             bucket_name="test-bucket",
         )
 
     assert result is None
+    mock_get_client.assert_called_once_with("s3")
     # Should retry 3 times (MAX_UPLOAD_ATTEMPTS)
     assert mock_s3.upload_fileobj.call_count == 3
 
 
+def test_upload_file_to_s3_streams_the_file_from_the_start_on_each_attempt(context):
+    stream = io.BytesIO(b"some-bytes")
+    fs = FileStorage(stream=stream, filename="test.png", content_type="image/png")
+    uploaded = []
+
+    def upload_fileobj(fileobj, bucket, key, **kwargs):
+        # boto3 may read part of the file and close it before failing
+        uploaded.append(fileobj.read(4) if not uploaded else fileobj.read())
+        fileobj.close()
+        if len(uploaded) == 1:
+            raise Exception("S3 error")
+
+    mock_s3 = MagicMock()
+    mock_s3.upload_fileobj.side_effect = upload_fileobj
+
+    with patch("app.lib.aws.get_client", return_value=mock_s3):
+        result = upload_file_to_s3(file=fs, bucket_name="test-bucket")
+
+    assert result == "test.png"
+    assert uploaded == [b"some", b"some-bytes"]
+    assert not stream.closed
+    assert mock_s3.upload_fileobj.call_args[0][0]._stream is stream
+
+
+def test_upload_file_to_s3_uses_multipart_transfer_config(context, app):
+    fs = FileStorage(
+        stream=io.BytesIO(b"some-bytes"), filename="test.png", content_type="image/png"
+    )
+    mock_s3 = MagicMock()
+
+    with patch("app.lib.aws.get_client", return_value=mock_s3):
+        upload_file_to_s3(file=fs, bucket_name="test-bucket")
+
+    transfer_config = mock_s3.upload_fileobj.call_args.kwargs["Config"]
+    assert transfer_config.multipart_threshold == app.config["S3_MULTIPART_THRESHOLD"]
+    assert transfer_config.multipart_chunksize == app.config["S3_MULTIPART_CHUNKSIZE"]
+    assert transfer_config.max_concurrency == app.config["S3_MAX_CONCURRENCY"]
+
+
+def test_upload_file_to_s3_logs_peak_memory_when_tracking(context, app):
+    fs = FileStorage(
+        stream=io.BytesIO(b"some-bytes"), filename="test.png", content_type="image/png"
+    )
+    mock_s3 = MagicMock()
+    mock_s3.upload_fileobj.side_effect = lambda *args, **kwargs: bytearray(100_000)
+
+    app.config["S3_UPLOAD_TRACK_MEMORY"] = True
+    try:
+        with (
+            patch("app.lib.aws.get_client", return_value=mock_s3),
+            patch.object(app.logger, "info") as mock_info,
+        ):
+            upload_file_to_s3(file=fs, bucket_name="test-bucket")
+    finally:
+        app.config["S3_UPLOAD_TRACK_MEMORY"] = False
+
+    message = mock_info.call_args[0][0]
+    assert "test.png (10 bytes)" in message
+    assert "peak memory" in message
+    assert not tracemalloc.is_tracing()
+
+
 def test_upload_proof_of_death_uses_uuid_for_key_name(context):
     file = FileStorage(
         stream=io.BytesIO(b"image-bytes"),
@@ -180,3 +241,136 @@ def test_upload_proof_of_death_uses_uuid_for_key_name(context):
         result = upload_proof_of_death(file=file)
 
     assert result == "holding/generated-uuid.png"
+
+
+def test_create_proof_of_death_upload_limits_key_and_size(context):
+    current_app.config["ENVIRONMENT_NAME"] = ""
+    mock_s3 = MagicMock()
+    mock_s3.generate_presigned_post.return_value = {
+        "url": "https://proof-bucket.s3.amazonaws.com/",
+        "fields": {"policy": "policy"},
+    }
+
+    try:
+        with (
+            patch("app.lib.aws.get_client", return_value=mock_s3),
+            patch("app.lib.aws.uuid.uuid4", return_value="upload-id"),
+        ):
+            result = create_proof_of_death_upload("https://example.com/upload/")
+    finally:
+        current_app.config["ENVIRONMENT_NAME"] = "test"
+
+    assert result["key_prefix"] == "holding/upload-id/"
+    assert result["url"] == "https://proof-bucket.s3.amazonaws.com/"
+    call_args = mock_s3.generate_presigned_post.call_args.kwargs
+    assert call_args["Bucket"] == "proof-bucket"
+    assert call_args["Key"] == "holding/upload-id/${filename}"
+    assert ["content-length-range", 1, 5 * 1024 * 1024] in call_args["Conditions"]
+    assert {"success_action_redirect": "https://example.com/upload/"} in call_args[
+        "Conditions"
+    ]
+
+
+def test_verify_proof_of_death_upload_moves_file_to_uuid_key(context):
+    current_app.config["ENVIRONMENT_NAME"] = ""
+    mock_s3 = MagicMock()
+    mock_s3.head_object.return_value = {"ContentLength": 1024}
+
+    try:
+        with patch("app.lib.aws.get_client", return_value=mock_s3):
+            result = verify_proof_of_death_upload("holding/upload-id/Certificate.PDF")
+    finally:
+        current_app.config["ENVIRONMENT_NAME"] = "test"
+
+    assert result == "holding/upload-id.pdf"
+    mock_s3.copy_object.assert_called_once_with(
+        Bucket="proof-bucket",
+        Key="holding/upload-id.pdf",
+        CopySource={
+            "Bucket": "proof-bucket",
+            "Key": "holding/upload-id/Certificate.PDF",
+        },
+        ContentType="application/pdf",
+        MetadataDirective="REPLACE",
+    )
+    mock_s3.delete_object.assert_called_once_with(
+        Bucket="proof-bucket", Key="holding/upload-id/Certificate.PDF"
+    )
+
+
+@pytest.mark.parametrize(
+    "key_name, size",
+    [
+        ("holding/upload-id/script.exe", 1024),
+        ("submitted/upload-id/proof.png", 1024),
+        ("holding/upload-id/proof.png", 5 * 1024 * 1024 + 1),
+        ("holding/upload-id/proof.png", 0),
+    ],
+)
+def test_verify_proof_of_death_upload_rejects_disallowed_files(context, key_name, size):
+    current_app.config["ENVIRONMENT_NAME"] = ""
+    mock_s3 = MagicMock()
+    mock_s3.head_object.return_value = {"ContentLength": size}
+
+    try:
+        with patch("app.lib.aws.get_client", return_value=mock_s3):
+            result = verify_proof_of_death_upload(key_name)
+    finally:
+        current_app.config["ENVIRONMENT_NAME"] = "test"
+
+    assert result is None
+    mock_s3.copy_object.assert_not_called()
+
+
+def test_get_client_is_created_once_per_service(context):
+    with patch("app.lib.aws.get_boto3_session") as mock_session:
+        mock_session.return_value.client.side_effect = lambda service, config: (
+            MagicMock(name=service)
+        )
+        s3 = get_client("s3")
+
+        assert get_client("s3") is s3
+        assert get_client("ses") is not s3
+
+    assert mock_session.return_value.client.call_count == 2
+
+
+def test_get_client_is_shared_between_threads(context, app):
+    created = []
+
+    def create_client(service, config):
+        created.append(service)
+        time.sleep(0.01)
+        return MagicMock()
+
+    def get_s3():
+        with app.app_context():
+            return get_client("s3")
+
+    with patch("app.lib.aws.get_boto3_session") as mock_session:
+        mock_session.return_value.client.side_effect = create_client
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            clients = list(executor.map(lambda _: get_s3(), range(8)))
+
+    assert created == ["s3"]
+    assert all(client is clients[0] for client in clients)
+
+
+def test_get_client_uses_pool_and_retry_config(context, app):
+    app.config.update(AWS_MAX_POOL_CONNECTIONS=25, AWS_MAX_ATTEMPTS=5)
+    try:
+        client = get_client("s3")
+    finally:
+        app.config.update(AWS_MAX_POOL_CONNECTIONS=10, AWS_MAX_ATTEMPTS=3)
+
+    assert client.meta.config.max_pool_connections == 25
+    assert client.meta.config.retries == {"mode": "standard", "total_max_attempts": 5}
+    assert client.meta.region_name == "eu-west-2"
+
+
+def test_clients_are_not_shared_with_forked_processes(context):
+    get_client("s3")
+
+    aws._reset_after_fork()
+
+    assert aws._clients == {}
@@ -0,0 +1,360 @@
+from datetime import datetime, timedelta
+from signal import SIGTERM
+from unittest.mock import patch
+
+import pytest
+
+from app import create_app
+from app.lib.db.constants import (
+    COMPLETED_JOB_STATUS,
+    EXPIRED_STATUS,
+    FAILED_JOB_STATUS,
+    PAID_STATUS,
+    QUEUED_JOB_STATUS,
+    RUNNING_JOB_STATUS,
+    SENT_STATUS,
+)
+from app.lib.db.models import (
+    BackgroundJob,
+    DynamicsPayment,
+    ServiceRecordRequest,
+    db,
+)
+from app.lib.gov_uk_pay import (
+    SEND_PAID_PAYMENT_JOB,
+    SEND_PAID_REQUEST_JOB,
+    process_valid_payment,
+    process_valid_request,
+)
+from app.lib.jobs import (
+    JOB_HANDLERS,
+    claim_jobs,
+    enqueue_job,
+    job_handler,
+    outbox_backlog,
+    purge_completed_jobs,
+    retry_delay,
+    run_pending_jobs,
+)
+from run_background_jobs import run_worker
+
+PAYMENT_DATA = {"provider_id": "provider-1", "amount": 4200, "reference": "REF-1"}
+
+
+@pytest.fixture(scope="module")
+def app():
+    app = create_app("config.Test")
+    app.config["BACKGROUND_JOBS_ENABLED"] = True
+    return app
+
+
+@pytest.fixture()
+def db_session(app):
+    with app.app_context():
+        db.create_all()
+        yield db.session
+        db.session.rollback()
+        for model in (BackgroundJob, ServiceRecordRequest, DynamicsPayment):
+            db.session.query(model).delete()
+        db.session.commit()
+
+
+@pytest.fixture()
+def recorded_job():
+    calls = []
+
+    @job_handler("record_call")
+    def record_call(**payload):
+        calls.append(payload)
+
+    yield calls
+    del JOB_HANDLERS["record_call"]
+
+
+@pytest.fixture()
+def record(db_session):
+    record = ServiceRecordRequest(
+        id="record-1", record_hash="hash-1", requester_email="jane@example.com"
+    )
+    db_session.add(record)
+    db_session.commit()
+    return record
+
+
+@pytest.fixture()
+def payment(db_session):
+    payment = DynamicsPayment(
+        id="payment-1",
+        case_number="CASE123",
+        reference="PAY-REF-456",
+        net_amount=1000,
+        total_amount=1000,
+        payee_email="jane@example.com",
+    )
+    db_session.add(payment)
+    db_session.commit()
+    return payment
+
+
+def test_enqueue_job_rejects_unknown_job_types(db_session):
+    with pytest.raises(ValueError):
+        enqueue_job("not_a_job")
+
+
+def test_enqueued_job_is_committed_with_the_caller(db_session, recorded_job):
+    enqueue_job("record_call", id="abc")
+    db_session.rollback()
+
+    assert db_session.query(BackgroundJob).count() == 0
+
+
+def test_run_pending_jobs_runs_queued_jobs(db_session, recorded_job):
+    job = enqueue_job("record_call", id="abc")
+    db_session.commit()
+
+    assert run_pending_jobs() == 1
+    assert recorded_job == [{"id": "abc"}]
+    assert db_session.get(BackgroundJob, job.id).status == COMPLETED_JOB_STATUS
+    assert db_session.get(BackgroundJob, job.id).finished_at is not None
+
+
+def test_run_pending_jobs_skips_jobs_claimed_by_another_worker(
+    db_session, recorded_job
+):
+    job = enqueue_job("record_call")
+    db_session.commit()
+    claim_jobs(limit=10)
+
+    assert run_pending_jobs() == 0
+    assert recorded_job == []
+    assert db_session.get(BackgroundJob, job.id).status == RUNNING_JOB_STATUS
+
+
+def test_process_valid_request_queues_sending_to_dynamics(record, db_session):
+    with (
+        patch("app.lib.gov_uk_pay.send_request_to_dynamics") as mock_send,
+        patch("app.lib.gov_uk_pay.move_proof_of_death_to_submitted") as mock_move,
+    ):
+        process_valid_request("record-1", PAYMENT_DATA)
+        process_valid_request("record-1", PAYMENT_DATA)
+
+    mock_send.assert_not_called()
+    mock_move.assert_not_called()
+    assert db_session.get(ServiceRecordRequest, "record-1").status == PAID_STATUS
+    job = db_session.query(BackgroundJob).one()
+    assert job.job_type == SEND_PAID_REQUEST_JOB
+    assert job.payload == {"id": "record-1"}
+
+
+def test_paid_request_job_sends_to_dynamics(record, db_session):
+    process_valid_request("record-1", PAYMENT_DATA)
+
+    with patch(
+        "app.lib.gov_uk_pay.send_request_to_dynamics", return_value=True
+    ) as mock_send:
+        assert run_pending_jobs() == 1
+
+    mock_send.assert_called_once()
+    assert db_session.get(ServiceRecordRequest, "record-1").status == SENT_STATUS
+    assert db_session.query(BackgroundJob).one().status == COMPLETED_JOB_STATUS
+
+
+def test_paid_request_job_is_retried_when_dynamics_is_not_sent(record, db_session):
+    process_valid_request("record-1", PAYMENT_DATA)
+
+    with patch("app.lib.gov_uk_pay.send_request_to_dynamics", return_value=False):
+        run_pending_jobs()
+
+    assert db_session.get(ServiceRecordRequest, "record-1").status == PAID_STATUS
+    job = db_session.query(BackgroundJob).one()
+    assert job.status == QUEUED_JOB_STATUS
+    assert job.attempts == 1
+
+
+def test_process_valid_payment_queues_sending_to_mod(payment, db_session):
+    with patch("app.lib.gov_uk_pay.send_payment_to_mod_copying_app") as mock_send:
+        process_valid_payment("payment-1", provider_id="provider-1")
+
+    mock_send.assert_not_called()
+    assert db_session.get(DynamicsPayment, "payment-1").status == PAID_STATUS
+    job = db_session.query(BackgroundJob).one()
+    assert job.job_type == SEND_PAID_PAYMENT_JOB
+
+    with patch(
+        "app.lib.gov_uk_pay.send_payment_to_mod_copying_app", return_value=True
+    ) as mock_send:
+        run_pending_jobs()
+
+    mock_send.assert_called_once()
+    assert db_session.get(DynamicsPayment, "payment-1").status == SENT_STATUS
+
+
+def test_process_valid_payment_sends_payment_paid_after_it_expired(payment, db_session):
+    payment.status = EXPIRED_STATUS
+    db_session.commit()
+
+    with patch("app.lib.gov_uk_pay.current_app.logger.error") as mock_log_error:
+        process_valid_payment("payment-1", provider_id="provider-1")
+
+    mock_log_error.assert_called_once()
+    assert db_session.get(DynamicsPayment, "payment-1").status == PAID_STATUS
+    assert db_session.query(BackgroundJob).one().job_type == SEND_PAID_PAYMENT_JOB
+
+    with patch(
+        "app.lib.gov_uk_pay.send_payment_to_mod_copying_app", return_value=True
+    ) as mock_send:
+        run_pending_jobs()
+
+    mock_send.assert_called_once()
+    assert db_session.get(DynamicsPayment, "payment-1").status == SENT_STATUS
+
+
+def test_process_valid_payment_ignores_payment_already_paid(payment, db_session):
+    payment.status = SENT_STATUS
+    db_session.commit()
+
+    process_valid_payment("payment-1", provider_id="provider-1")
+
+    assert db_session.get(DynamicsPayment, "payment-1").status == SENT_STATUS
+    assert db_session.query(BackgroundJob).count() == 0
+
+
+def test_process_valid_request_runs_job_straight_away_when_worker_is_disabled(
+    app, record, db_session
+):
+    app.config["BACKGROUND_JOBS_ENABLED"] = False
+    try:
+        with patch(
+            "app.lib.gov_uk_pay.send_request_to_dynamics", return_value=True
+        ) as mock_send:
+            process_valid_request("record-1", PAYMENT_DATA)
+    finally:
+        app.config["BACKGROUND_JOBS_ENABLED"] = True
+
+    mock_send.assert_called_once()
+    assert db_session.get(ServiceRecordRequest, "record-1").status == SENT_STATUS
+    assert db_session.query(BackgroundJob).one().status == COMPLETED_JOB_STATUS
+
+
+def test_failed_job_is_retried_with_backoff(app, db_session):
+    @job_handler("fail")
+    def fail():
+        raise RuntimeError("Dynamics is down")
+
+    job = enqueue_job("fail")
+    db_session.commit()
+
+    try:
+        for attempt in range(1, app.config["BACKGROUND_JOB_MAX_ATTEMPTS"]):
+            run_pending_jobs()
+            job = db_session.get(BackgroundJob, job.id)
+            assert job.status == QUEUED_JOB_STATUS
+            assert job.attempts == attempt
+            assert job.last_error == "RuntimeError: Dynamics is down"
+            assert job.next_attempt_at > datetime.now()
+            # Make it due again without waiting for the backoff
+            job.next_attempt_at = datetime.now()
+            db_session.commit()
+
+        run_pending_jobs()
+    finally:
+        del JOB_HANDLERS["fail"]
+
+    assert db_session.get(BackgroundJob, job.id).status == FAILED_JOB_STATUS
+
+
+def test_retry_delay_doubles_up_to_the_maximum(app, db_session):
+    app.config.update(BACKGROUND_JOB_RETRY_DELAY=60, BACKGROUND_JOB_MAX_RETRY_DELAY=300)
+
+    assert [retry_delay(attempts).seconds for attempts in range(1, 6)] == [
+        60,
+        120,
+        240,
+        300,
+        300,
+    ]
+
+
+def test_claim_jobs_takes_a_batch_of_due_jobs(db_session, recorded_job):
+    for i in range(3):
+        enqueue_job("record_call", index=i)
+    not_due = enqueue_job("record_call", index=3)
+    not_due.next_attempt_at = datetime.now() + timedelta(hours=1)
+    db_session.commit()
+
+    claimed = claim_jobs(limit=2)
+
+    assert [job.payload["index"] for job in claimed] == [0, 1]
+    assert {job.status for job in claimed} == {RUNNING_JOB_STATUS}
+    assert [job.payload["index"] for job in claim_jobs(limit=10)] == [2]
+
+
+def test_jobs_claimed_by_a_stopped_worker_are_claimed_again(db_session, recorded_job):
+    job = enqueue_job("record_call")
+    db_session.commit()
+    claim_jobs(limit=10)
+    assert claim_jobs(limit=10) == []
+
+    job = db_session.get(BackgroundJob, job.id)
+    job.next_attempt_at = datetime.now() - timedelta(seconds=1)
+    db_session.commit()
+
+    assert [claimed.id for claimed in claim_jobs(limit=10)] == [job.id]
+
+
+def test_outbox_backlog_counts_unfinished_jobs(db_session, recorded_job):
+    enqueue_job("record_call")
+    enqueue_job("record_call")
+    db_session.commit()
+
+    backlog = outbox_backlog()
+
+    assert backlog["record_call"]["count"] == 2
+    assert backlog["record_call"]["oldest"] is not None
+
+
+def test_purge_completed_jobs_deletes_old_completed_jobs(db_session, recorded_job):
+    for index, status, days_ago in [
+        (0, COMPLETED_JOB_STATUS, 40),
+        (1, COMPLETED_JOB_STATUS, 40),
+        (2, COMPLETED_JOB_STATUS, 10),
+        (3, FAILED_JOB_STATUS, 40),
+    ]:
+        job = enqueue_job("record_call", index=index)
+        job.status = status
+        job.finished_at = datetime.now() - timedelta(days=days_ago)
+    enqueue_job("record_call", index=4)
+    db_session.commit()
+
+    assert purge_completed_jobs(days=30, batch_size=1) == 2
+
+    assert {
+        payload["index"] for (payload,) in db_session.query(BackgroundJob.payload)
+    } == {2, 3, 4}
+
+
+def test_worker_keeps_running_after_an_error(app, db_session):
+    def record_handler(signal_number, handler):
+        handlers[signal_number] = handler
+
+    handlers = {}
+    calls = []
+
+    def run_pending_jobs():
+        calls.append(None)
+        if len(calls) == 1:
+            raise RuntimeError("Database went away")
+        handlers[SIGTERM](SIGTERM, None)
+        return 0
+
+    with (
+        patch("run_background_jobs.signal.signal", side_effect=record_handler),
+        patch("run_background_jobs.run_pending_jobs", side_effect=run_pending_jobs),
+        patch("run_background_jobs.time.sleep") as mock_sleep,
+        patch.object(app.logger, "error") as mock_log_error,
+    ):
+        run_worker(poll_interval=2)
+
+    assert len(calls) == 2
+    mock_log_error.assert_called_once()
+    assert mock_sleep.call_count == 2
@@ -1,6 +1,8 @@
 # TODO: Investigate a way to have a separate table/database for testing
 # as these are currently using + dropping the local DB
 
+from datetime import date
+
 import pytest
 
 from app import create_app
@@ -68,6 +70,15 @@ def test_transform_form_data_to_record_normalises_commissioned_officer_status():
     assert transformed["were_they_a_commissioned_officer"] == "unknown"
 
 
+def test_transform_form_data_to_record_parses_dates():
+    transformed = transform_form_data_to_record(
+        {"date_of_birth": "01 January 1950", "date_of_death": ""}
+    )
+
+    assert transformed["date_of_birth"] == date(1950, 1, 1)
+    assert transformed["date_of_death"] == ""
+
+
 def test_get_service_record_request(session):
     id = "testrecordid123"
 
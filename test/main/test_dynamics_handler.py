@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -31,28 +31,28 @@ def context(app):
 
 
 def test_age_over_115_sets_FOIOP(context):
-    dob = "01 January 1900"
+    dob = date(1900, 1, 1)
     r = DummyRecord(dob, None, "standard")
     assert subject_status(r) == "? FOI DIRECT MOD FOIOP1"
 
 
 def test_proof_of_death_sets_FOICD(context):
     recent_year = datetime.now().year - 40
-    dob = f"15 June {recent_year}"
+    dob = date(recent_year, 6, 15)
     r = DummyRecord(dob, "file.png", "standard")
     assert subject_status(r) == "? FOI DIRECT MOD FOICD1"
 
 
 def test_no_evidence_sets_FOICDN_standard(context):
     recent_year = datetime.now().year - 30
-    dob = f"10 March {recent_year}"
+    dob = date(recent_year, 3, 10)
     r = DummyRecord(dob, None, "standard")
     assert subject_status(r) == "? FOI DIRECT MOD FOICDN1"
 
 
 def test_no_evidence_sets_FOICDN_full(context):
     recent_year = datetime.now().year - 25
-    dob = f"20 August {recent_year}"
+    dob = date(recent_year, 8, 20)
     r = DummyRecord(dob, None, "full")
     assert subject_status(r) == "? FOI DIRECT MOD FOICDN2"
 
@@ -67,7 +67,7 @@ def test_generate_tagged_request_includes_commissioned_officer_status(context):
         requester_country="United Kingdom",
         forenames="John",
         last_name="Smith",
-        date_of_birth="01 January 1950",
+        date_of_birth=date(1950, 1, 1),
         were_they_a_commissioned_officer="unknown",
     )
 
@@ -76,7 +76,27 @@ def test_generate_tagged_request_includes_commissioned_officer_status(context):
     assert "<commissioned_officer>unknown</commissioned_officer>" in tagged_request
 
 
-@patch("app.lib.dynamics_handler.requests.post")
+def test_generate_tagged_request_formats_dates_and_amounts(context):
+    record = ServiceRecordRequest(
+        forenames="John",
+        last_name="Smith",
+        date_of_birth=date(1950, 1, 1),
+        date_of_death=date(2001, 11, 5),
+        payment_date=datetime(2024, 3, 15, 14, 30),
+        amount_received=4225,
+    )
+
+    tagged_request = generate_tagged_request(record)
+
+    assert (
+        "<mandatory_birth_date>01 January 1950</mandatory_birth_date>" in tagged_request
+    )
+    assert "<date_of_death>05 November 2001</date_of_death>" in tagged_request
+    assert "<payment_date>15 March 2024</payment_date>" in tagged_request
+    assert "<amount_received>42.25</amount_received>" in tagged_request
+
+
+@patch("app.lib.dynamics_handler.http_client.post")
 def test_send_payment_to_mod_copying_app_payload_format(mock_post, context):
     """Test that the payload sent to MOD Copying API maintains the expected format"""
     # Setup mock response
@@ -120,7 +140,7 @@ def test_send_payment_to_mod_copying_app_payload_format(mock_post, context):
     assert actual_payload == expected_payload
 
 
-@patch("app.lib.dynamics_handler.requests.post")
+@patch("app.lib.dynamics_handler.http_client.post")
 def test_send_payment_to_mod_copying_app_returns_false_on_error(mock_post, context):
     """Test that the function returns False when API returns non-200 status"""
     # Setup mock response with error
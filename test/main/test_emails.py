@@ -0,0 +1,247 @@
+import json
+import re
+from unittest.mock import MagicMock, patch
+
+import pytest
+from botocore.exceptions import ClientError
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+import app.lib.emails as emails
+from app import create_app
+from app.lib.batch_workers import RateLimiter
+from app.lib.emails import (
+    EMAIL_TEMPLATES,
+    PAYMENT_LINK_EMAIL,
+    PAYMENT_LINK_EXPIRED_EMAIL,
+    email_metrics,
+    email_template_source,
+    render_email,
+    send_bulk_templated_email,
+    send_templated_email,
+    ses_template_source,
+)
+from register_email_templates import register_email_templates
+
+PAYMENT_LINK_DATA = {
+    "name": "Jane Doe",
+    "case_number": "CAS123",
+    "amount": "111.66",
+    "payment_url": "https://example.com/pay/1",
+}
+
+
+@pytest.fixture()
+def app(monkeypatch):
+    app = create_app("config.Test")
+    app.config["EMAIL_FROM"] = "noreply@example.com"
+    app.config["EMAIL_FROM_NAME"] = "The National Archives"
+    shared_limiter = MagicMock(wait=MagicMock(return_value=0.0))
+    local_limiter = MagicMock(wait=MagicMock(return_value=0.0))
+    monkeypatch.setattr(emails, "_rate_limiters", (shared_limiter, local_limiter))
+    with app.app_context():
+        emails.reset_email_metrics()
+        yield app
+
+
+def _throttling_error():
+    return ClientError(
+        {"Error": {"Code": "Throttling", "Message": "Maximum sending rate exceeded."}},
+        "SendEmail",
+    )
+
+
+def test_email_templates_only_use_placeholders_ses_can_render(app):
+    for template in EMAIL_TEMPLATES:
+        source = email_template_source(template)
+        assert "{%" not in source and "{#" not in source
+        for placeholder in re.findall(r"{{(.*?)}}", source):
+            assert re.fullmatch(r" [a-z_]+ ", placeholder), placeholder
+
+
+def test_ses_template_source_leaves_values_unescaped(app):
+    source = ses_template_source(PAYMENT_LINK_EXPIRED_EMAIL)
+
+    assert source.startswith("Dear {{{name}}},")
+    assert "({{{case_number}}})" in source
+    assert "{{ " not in source
+
+
+def test_render_payment_link_email(app):
+    body = render_email(PAYMENT_LINK_EMAIL, PAYMENT_LINK_DATA)
+
+    assert body.startswith("Dear Jane Doe,")
+    assert "for CAS123." in body
+    assert "payment of £111.66: https://example.com/pay/1" in body
+
+
+def test_render_payment_link_expired_email(app):
+    body = render_email(
+        PAYMENT_LINK_EXPIRED_EMAIL, {"name": "customer", "case_number": "CAS123"}
+    )
+
+    assert body.startswith("Dear customer,")
+    assert "service record request (CAS123) has expired" in body
+
+
+def test_send_templated_email_renders_jinja_template(app):
+    mock_ses = MagicMock()
+
+    with patch("app.lib.emails.get_client", return_value=mock_ses):
+        assert send_templated_email(
+            "jane@example.com", PAYMENT_LINK_EMAIL, PAYMENT_LINK_DATA
+        )
+
+    kwargs = mock_ses.send_email.call_args.kwargs
+    assert kwargs["Source"] == "The National Archives <noreply@example.com>"
+    assert kwargs["Destination"] == {"ToAddresses": ["jane@example.com"]}
+    assert kwargs["Message"]["Subject"]["Data"] == PAYMENT_LINK_EMAIL.subject
+    assert kwargs["Message"]["Body"]["Text"]["Data"].startswith("Dear Jane Doe,")
+    mock_ses.send_templated_email.assert_not_called()
+    assert email_metrics()["sent"] == 1
+
+
+def test_send_templated_email_uses_ses_template(app):
+    app.config["EMAIL_TEMPLATE_MODE"] = "ses"
+    mock_ses = MagicMock()
+
+    with patch("app.lib.emails.get_client", return_value=mock_ses):
+        assert send_templated_email(
+            "jane@example.com", PAYMENT_LINK_EMAIL, PAYMENT_LINK_DATA
+        )
+
+    kwargs = mock_ses.send_templated_email.call_args.kwargs
+    assert kwargs["Template"] == "request-service-record-payment_link-v2"
+    assert json.loads(kwargs["TemplateData"]) == PAYMENT_LINK_DATA
+    mock_ses.send_email.assert_not_called()
+
+
+def test_send_templated_email_counts_throttling(app):
+    mock_ses = MagicMock()
+    mock_ses.send_email.side_effect = _throttling_error()
+
+    with (
+        patch("app.lib.emails.get_client", return_value=mock_ses),
+        patch("app.lib.emails.current_app.logger.error") as mock_log_error,
+    ):
+        assert not send_templated_email(
+            "jane@example.com", PAYMENT_LINK_EMAIL, PAYMENT_LINK_DATA
+        )
+
+    mock_log_error.assert_called_once()
+    metrics = email_metrics()
+    assert (metrics["sent"], metrics["failed"], metrics["throttled"]) == (0, 1, 1)
+
+
+def test_send_bulk_templated_email_sends_chunks_of_50(app):
+    app.config["EMAIL_TEMPLATE_MODE"] = "ses"
+    messages = [(f"{i}@example.com", {"name": str(i)}) for i in range(120)]
+    mock_ses = MagicMock()
+    mock_ses.send_bulk_templated_email.side_effect = lambda **kwargs: {
+        "Status": [{"Status": "Success"} for _ in kwargs["Destinations"]]
+    }
+
+    with patch("app.lib.emails.get_client", return_value=mock_ses):
+        assert (
+            send_bulk_templated_email(PAYMENT_LINK_EXPIRED_EMAIL, messages)
+            == [True] * 120
+        )
+
+    calls = mock_ses.send_bulk_templated_email.call_args_list
+    assert [len(call.kwargs["Destinations"]) for call in calls] == [50, 50, 20]
+    assert calls[2].kwargs["Destinations"][0] == {
+        "Destination": {"ToAddresses": ["100@example.com"]},
+        "ReplacementTemplateData": '{"name": "100"}',
+    }
+    shared_limiter, _ = emails._rate_limiters
+    assert [call.args[0] for call in shared_limiter.wait.call_args_list] == [50, 50, 20]
+    assert email_metrics()["sent"] == 120
+
+
+def test_send_bulk_templated_email_reports_each_failure(app):
+    app.config["EMAIL_TEMPLATE_MODE"] = "ses"
+    mock_ses = MagicMock()
+    mock_ses.send_bulk_templated_email.return_value = {
+        "Status": [
+            {"Status": "Success"},
+            {"Status": "AccountThrottled", "Error": "Maximum sending rate exceeded."},
+            {"Status": "MessageRejected", "Error": "Email address is not verified."},
+        ]
+    }
+
+    with (
+        patch("app.lib.emails.get_client", return_value=mock_ses),
+        patch("app.lib.emails.current_app.logger.error") as mock_log_error,
+    ):
+        results = send_bulk_templated_email(
+            PAYMENT_LINK_EXPIRED_EMAIL,
+            [(f"{i}@example.com", {}) for i in range(3)],
+        )
+
+    assert results == [True, False, False]
+    assert mock_log_error.call_count == 2
+    metrics = email_metrics()
+    assert (metrics["sent"], metrics["failed"], metrics["throttled"]) == (1, 2, 1)
+
+
+def test_send_bulk_templated_email_without_ses_templates_sends_one_at_a_time(app):
+    mock_ses = MagicMock()
+
+    with patch("app.lib.emails.get_client", return_value=mock_ses):
+        results = send_bulk_templated_email(
+            PAYMENT_LINK_EXPIRED_EMAIL,
+            [(f"{i}@example.com", {"name": "customer"}) for i in range(3)],
+        )
+
+    assert results == [True] * 3
+    assert mock_ses.send_email.call_count == 3
+    mock_ses.send_bulk_templated_email.assert_not_called()
+
+
+def test_rate_limits_in_this_process_when_redis_fails(app):
+    shared_limiter, local_limiter = emails._rate_limiters
+    shared_limiter.wait.side_effect = RedisConnectionError("Connection refused")
+    local_limiter.wait.return_value = 0.5
+
+    with (
+        patch("app.lib.emails.get_client"),
+        patch("app.lib.emails.current_app.logger.warning") as mock_log_warning,
+    ):
+        assert send_templated_email(
+            "jane@example.com", PAYMENT_LINK_EMAIL, PAYMENT_LINK_DATA
+        )
+
+    local_limiter.wait.assert_called_once_with(1)
+    mock_log_warning.assert_called_once()
+    assert email_metrics()["rate_limit_wait"] == 0.5
+
+
+def test_rate_limiters_share_redis_bucket_when_configured(app, monkeypatch):
+    monkeypatch.setattr(emails, "_rate_limiters", None)
+    app.config["SES_RATE_LIMIT_REDIS_URL"] = "redis://localhost:6379/0"
+
+    with patch("app.lib.emails.Redis") as mock_redis:
+        shared_limiter, local_limiter = emails._get_rate_limiters()
+
+    mock_redis.from_url.assert_called_once_with("redis://localhost:6379/0")
+    assert shared_limiter.key == "ses/send-rate"
+    assert shared_limiter.rate == app.config["SES_MAX_SEND_RATE"]
+    assert isinstance(local_limiter, RateLimiter)
+
+
+def test_register_email_templates_creates_missing_versions(app):
+    mock_ses = MagicMock()
+    mock_ses.exceptions.TemplateDoesNotExistException = type(
+        "TemplateDoesNotExistException", (Exception,), {}
+    )
+    mock_ses.get_template.side_effect = [
+        {},
+        mock_ses.exceptions.TemplateDoesNotExistException(),
+    ]
+
+    with patch("register_email_templates.get_client", return_value=mock_ses):
+        assert register_email_templates() == 1
+
+    template = mock_ses.create_template.call_args.kwargs["Template"]
+    assert template["TemplateName"] == "request-service-record-payment_link_expired-v2"
+    assert template["SubjectPart"] == PAYMENT_LINK_EXPIRED_EMAIL.subject
+    assert template["TextPart"] == ses_template_source(PAYMENT_LINK_EXPIRED_EMAIL)
@@ -1,32 +1,14 @@
 from datetime import datetime, timedelta, timezone
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 
 import pytest
 
 from app import create_app
+from app.lib.batch_workers import lock_next_batch_query
 from app.lib.db.constants import EXPIRED_STATUS, NEW_STATUS, PAID_STATUS, SENT_STATUS
 from app.lib.db.models import DynamicsPayment, db
-from expire_old_payments import expire_old_payments
-
-
-class DummyPayment:
-    def __init__(
-        self,
-        case_number: str,
-        reference: str,
-        payment_id: str,
-        email: str,
-        first_name: str = "",
-        last_name: str = "",
-    ):
-        self.id = payment_id
-        self.case_number = case_number
-        self.reference = reference
-        self.payee_email = email
-        self.first_name = first_name
-        self.last_name = last_name
-        self.status = "N"
-        self.created_at = datetime.now(tz=timezone.utc) - timedelta(days=31)
+from app.lib.emails import PAYMENT_LINK_EXPIRED_EMAIL
+from expire_old_payments import ExpirySummary, expire_old_payments
 
 
 @pytest.fixture(scope="module")
@@ -34,12 +16,6 @@ def app():
     return create_app("config.Test")
 
 
-@pytest.fixture()
-def context(app):
-    with app.app_context():
-        yield
-
-
 @pytest.fixture()
 def db_session(app):
     with app.app_context():
@@ -51,93 +27,141 @@ def db_session(app):
         db.session.commit()
 
 
-def _mock_query_chain(mock_db, payments):
-    query = MagicMock()
-    mock_db.session.query.return_value = query
-    query.filter.return_value = query
-    query.order_by.return_value = query
-    query.all.return_value = payments
+def _old_payment(id: str, **kwargs) -> DynamicsPayment:
+    return DynamicsPayment(
+        id=id,
+        case_number=f"CASE-{id}",
+        reference=f"REF-{id}",
+        net_amount=1000,
+        delivery_amount=0,
+        total_amount=1000,
+        payee_email=f"{id}@example.com",
+        status=NEW_STATUS,
+        created_at=datetime.now() - timedelta(days=31),
+        **kwargs,
+    )
 
 
-def test_expire_old_payments_updates_status_and_sends_email(context):
-    payments = [
-        DummyPayment(
-            case_number="CASE-1",
-            reference="REF-1",
-            payment_id="pmt-1",
-            email="one@example.com",
-            first_name="Jane",
-            last_name="Doe",
-        ),
-        DummyPayment(
-            case_number="CASE-2",
-            reference="REF-2",
-            payment_id="pmt-2",
-            email="two@example.com",
-            first_name="",
-            last_name="",
-        ),
+def _send_all(sent=True):
+    return lambda template, messages: [sent] * len(messages)
+
+
+def _messages(mock_send):
+    return [message for call in mock_send.call_args_list for message in call.args[1]]
+
+
+def test_expire_old_payments_updates_status_and_sends_email(db_session):
+    db_session.add_all(
+        [
+            _old_payment("pmt-1", first_name="Jane", last_name="Doe"),
+            _old_payment("pmt-2"),
+        ]
+    )
+    db_session.commit()
+
+    with patch(
+        "expire_old_payments.send_bulk_templated_email", side_effect=_send_all()
+    ) as mock_send:
+        summary = expire_old_payments(days=30)
+
+    assert summary == ExpirySummary(expired=2, emails_sent=2, emails_failed=0)
+    assert db_session.get(DynamicsPayment, "pmt-1").status == EXPIRED_STATUS
+    assert db_session.get(DynamicsPayment, "pmt-2").status == EXPIRED_STATUS
+    mock_send.assert_called_once()
+    assert mock_send.call_args.args[0] == PAYMENT_LINK_EXPIRED_EMAIL
+    assert sorted(_messages(mock_send)) == [
+        ("pmt-1@example.com", {"name": "Jane Doe", "case_number": "CASE-pmt-1"}),
+        ("pmt-2@example.com", {"name": "customer", "case_number": "CASE-pmt-2"}),
     ]
 
+
+def test_expire_old_payments_logs_when_email_fails(db_session):
+    db_session.add(_old_payment("pmt-3"))
+    db_session.commit()
+
     with (
-        patch("expire_old_payments.db") as mock_db,
-        patch("expire_old_payments.send_email", return_value=True) as mock_send_email,
+        patch(
+            "expire_old_payments.send_bulk_templated_email",
+            side_effect=_send_all(False),
+        ),
+        patch("expire_old_payments.current_app.logger.error") as mock_log_error,
     ):
-        _mock_query_chain(mock_db, payments)
+        summary = expire_old_payments(days=30)
 
-        expired_count = expire_old_payments(days=30)
-
-    assert expired_count == 2
-    assert payments[0].status == EXPIRED_STATUS
-    assert payments[1].status == EXPIRED_STATUS
-    assert mock_db.session.commit.call_count == 2
-    assert mock_send_email.call_count == 2
+    assert summary == ExpirySummary(expired=1, emails_sent=0, emails_failed=1)
+    assert db_session.get(DynamicsPayment, "pmt-3").status == EXPIRED_STATUS
+    mock_log_error.assert_called_once()
 
 
-def test_expire_old_payments_logs_when_email_fails(context):
-    payment = DummyPayment(
-        case_number="CASE-3",
-        reference="REF-3",
-        payment_id="pmt-3",
-        email="three@example.com",
-    )
+def test_expire_old_payments_rolls_back_on_commit_error(db_session):
+    db_session.add(_old_payment("pmt-4"))
+    db_session.commit()
 
     with (
-        patch("expire_old_payments.db") as mock_db,
-        patch("expire_old_payments.send_email", return_value=False),
+        patch("expire_old_payments.send_bulk_templated_email") as mock_send,
+        patch.object(db_session, "commit", side_effect=Exception("db commit failed")),
         patch("expire_old_payments.current_app.logger.error") as mock_log_error,
     ):
-        _mock_query_chain(mock_db, [payment])
-
-        expired_count = expire_old_payments(days=30)
+        summary = expire_old_payments(days=30)
 
-    assert expired_count == 1
-    assert payment.status == EXPIRED_STATUS
-    assert mock_db.session.commit.call_count == 1
+    assert summary.expired == 0
+    assert db_session.get(DynamicsPayment, "pmt-4").status == NEW_STATUS
+    mock_send.assert_not_called()
     mock_log_error.assert_called_once()
 
 
-def test_expire_old_payments_rolls_back_on_commit_error(context):
-    payment = DummyPayment(
-        case_number="CASE-4",
-        reference="REF-4",
-        payment_id="pmt-4",
-        email="four@example.com",
-    )
+def test_expire_old_payments_works_through_chunks(db_session):
+    db_session.add_all([_old_payment(f"pmt-{i}") for i in range(5)])
+    db_session.commit()
+
+    with patch(
+        "expire_old_payments.send_bulk_templated_email", side_effect=_send_all()
+    ) as mock_send:
+        assert expire_old_payments(days=30, chunk_size=2).expired == 5
+        assert expire_old_payments(days=30, chunk_size=2).expired == 0
+
+    assert len(_messages(mock_send)) == 5
+
+
+def test_expire_old_payments_skips_payments_expired_by_another_worker(db_session):
+    db_session.add(_old_payment("pmt-5"))
+    db_session.commit()
+
+    def lock_next_batch_query_then_expire_elsewhere(query, limit):
+        # As another worker without row locks would between select and update
+        db_session.query(DynamicsPayment).update(
+            {"status": EXPIRED_STATUS}, synchronize_session=False
+        )
+        return lock_next_batch_query(query, limit)
 
     with (
-        patch("expire_old_payments.db") as mock_db,
-        patch("expire_old_payments.send_email", return_value=True),
-        patch("expire_old_payments.current_app.logger.error") as mock_log_error,
+        patch(
+            "expire_old_payments.lock_next_batch_query",
+            side_effect=lock_next_batch_query_then_expire_elsewhere,
+        ),
+        patch("expire_old_payments.send_bulk_templated_email") as mock_send,
     ):
-        _mock_query_chain(mock_db, [payment])
-        mock_db.session.commit.side_effect = Exception("db commit failed")
+        assert expire_old_payments(days=30).expired == 0
 
-        expired_count = expire_old_payments(days=30)
+    mock_send.assert_not_called()
 
-    assert expired_count == 0
-    assert mock_db.session.rollback.call_count == 1
-    mock_log_error.assert_called_once()
+
+def test_expire_old_payments_sends_batches_of_emails_in_parallel(
+    app, db_session, monkeypatch
+):
+    db_session.add_all([_old_payment(f"pmt-{i}") for i in range(6)])
+    db_session.commit()
+    monkeypatch.setitem(app.config, "EXPIRY_EMAIL_CONCURRENCY", 3)
+    monkeypatch.setitem(app.config, "SES_BULK_CHUNK_SIZE", 2)
+
+    with patch(
+        "expire_old_payments.send_bulk_templated_email",
+        side_effect=lambda template, messages: [True, False][: len(messages)],
+    ) as mock_send:
+        summary = expire_old_payments(days=30, chunk_size=4)
+
+    assert summary == ExpirySummary(expired=6, emails_sent=3, emails_failed=3)
+    assert [len(call.args[1]) for call in mock_send.call_args_list] == [2, 2, 2]
 
 
 def test_expire_old_payments_uses_30_day_cutoff_and_only_new_status(db_session):
@@ -212,12 +236,14 @@ def test_expire_old_payments_uses_30_day_cutoff_and_only_new_status(db_session):
 
     with (
         patch("expire_old_payments.datetime") as mock_datetime,
-        patch("expire_old_payments.send_email", return_value=True) as mock_send_email,
+        patch(
+            "expire_old_payments.send_bulk_templated_email", side_effect=_send_all()
+        ) as mock_send,
     ):
         mock_datetime.now.return_value = fixed_now
-        expired_count = expire_old_payments(days=30)
+        summary = expire_old_payments(days=30)
 
-    assert expired_count == 1
+    assert summary.expired == 1
 
     p31_new = db_session.get(DynamicsPayment, "pmt-31-days-new")
     p30_new = db_session.get(DynamicsPayment, "pmt-30-days-new")
@@ -230,4 +256,4 @@ def test_expire_old_payments_uses_30_day_cutoff_and_only_new_status(db_session):
     assert p29_new.status == NEW_STATUS
     assert p31_paid.status == PAID_STATUS
     assert p31_sent.status == SENT_STATUS
-    mock_send_email.assert_called_once()
+    assert len(_messages(mock_send)) == 1
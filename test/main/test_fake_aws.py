@@ -0,0 +1,206 @@
+import io
+from unittest.mock import patch
+
+import pytest
+from botocore.exceptions import ClientError
+from werkzeug.datastructures import FileStorage
+
+import app.lib.emails as emails
+from app import create_app
+from app.lib.aws import (
+    delete_s3_objects,
+    get_client,
+    list_s3_objects,
+    move_proof_of_death_to_submitted,
+    send_email,
+    upload_proof_of_death,
+    upload_spooled_proof_of_death,
+    verify_proof_of_death_upload,
+)
+from app.lib.emails import (
+    PAYMENT_LINK_EMAIL,
+    PAYMENT_LINK_EXPIRED_EMAIL,
+    email_metrics,
+    send_bulk_templated_email,
+    send_templated_email,
+)
+from app.lib.fake_aws import get_fake_aws_backend
+from register_email_templates import register_email_templates
+
+BUCKET_NAME = "proof-of-death"
+
+
+@pytest.fixture()
+def app(tmp_path, monkeypatch):
+    app = create_app("config.Test")
+    app.config.update(
+        AWS_BACKEND="fake",
+        FAKE_AWS_DIR=str(tmp_path),
+        PROOF_OF_DEATH_BUCKET_NAME=BUCKET_NAME,
+        EMAIL_FROM="noreply@example.com",
+        EMAIL_FROM_NAME="The National Archives",
+    )
+    monkeypatch.setattr(emails, "_rate_limiters", (None, emails.RateLimiter(None)))
+    with app.app_context():
+        emails.reset_email_metrics()
+        yield app
+
+
+@pytest.fixture()
+def backend(app):
+    return get_fake_aws_backend(
+        app.config["FAKE_AWS_DIR"],
+        app.config["FAKE_AWS_LATENCY"],
+        app.config["FAKE_AWS_ERROR_RATE"],
+    )
+
+
+def test_upload_proof_of_death_saves_the_file(backend):
+    key_name = upload_proof_of_death(
+        FileStorage(io.BytesIO(b"%PDF-1.4"), filename="proof.pdf")
+    )
+
+    assert key_name.startswith("holding/") and key_name.endswith(".pdf")
+    assert backend.read_object(BUCKET_NAME, key_name) == b"%PDF-1.4"
+    head = get_client("s3").head_object(Bucket=BUCKET_NAME, Key=key_name)
+    assert head["ContentType"] == "application/pdf"
+    assert backend.calls["s3.PutObject"] == 1
+
+
+def test_upload_spooled_proof_of_death_uploads_in_parts(app, backend, tmp_path):
+    app.config.update(
+        S3_MULTIPART_THRESHOLD=5 * 1024 * 1024, S3_MULTIPART_CHUNKSIZE=5 * 1024 * 1024
+    )
+    content = bytes(range(256)) * (24 * 1024)
+    spool_path = tmp_path / "spooled.png"
+    spool_path.write_bytes(content)
+
+    assert upload_spooled_proof_of_death(str(spool_path), "holding/spooled.png")
+
+    assert backend.read_object(BUCKET_NAME, "holding/spooled.png") == content
+    assert backend.calls["s3.UploadPart"] == 2
+    assert backend.calls["s3.CompleteMultipartUpload"] == 1
+
+
+def test_verify_and_move_proof_of_death(backend):
+    get_client("s3").put_object(
+        Bucket=BUCKET_NAME, Key="holding/upload-id/proof.jpg", Body=b"jpeg"
+    )
+
+    key_name = verify_proof_of_death_upload("holding/upload-id/proof.jpg")
+
+    assert key_name == "holding/upload-id.jpg"
+    assert backend.list_keys(BUCKET_NAME) == ["holding/upload-id.jpg"]
+    head = get_client("s3").head_object(Bucket=BUCKET_NAME, Key=key_name)
+    assert head["ContentType"] == "image/jpeg"
+
+    assert move_proof_of_death_to_submitted(key_name)
+    assert backend.list_keys(BUCKET_NAME) == ["submitted/upload-id.jpg"]
+
+
+def test_list_and_delete_objects_a_page_at_a_time(backend):
+    s3 = get_client("s3")
+    for number in range(5):
+        s3.put_object(Bucket=BUCKET_NAME, Key=f"holding/{number}.pdf", Body=b"pdf")
+    s3.put_object(Bucket=BUCKET_NAME, Key="submitted/0.pdf", Body=b"pdf")
+
+    pages = list(
+        s3.get_paginator("list_objects_v2").paginate(
+            Bucket=BUCKET_NAME, Prefix="holding/", PaginationConfig={"PageSize": 2}
+        )
+    )
+    assert [len(page["Contents"]) for page in pages] == [2, 2, 1]
+
+    keys = [
+        obj["Key"] for page in list_s3_objects(BUCKET_NAME, "holding/") for obj in page
+    ]
+    assert keys == [f"holding/{number}.pdf" for number in range(5)]
+    assert delete_s3_objects(BUCKET_NAME, keys) == []
+    assert backend.list_keys(BUCKET_NAME) == ["submitted/0.pdf"]
+
+
+def test_sent_emails_are_recorded(backend):
+    assert send_email(to="jane@example.com", subject="Subject", body="Body £1")
+
+    [email] = backend.sent_emails()
+    assert email["Source"] == "The National Archives <noreply@example.com>"
+    assert email["ToAddresses"] == ["jane@example.com"]
+    assert (email["Subject"], email["Body"]) == ("Subject", "Body £1")
+
+
+def test_bulk_templated_emails_are_rendered_from_registered_templates(app, backend):
+    app.config["EMAIL_TEMPLATE_MODE"] = "ses"
+    messages = [
+        ("jane@example.com", {"name": "Jane Doe", "case_number": "CAS1"}),
+        ("john@example.com", {"name": "John Doe", "case_number": "CAS2"}),
+    ]
+
+    assert send_bulk_templated_email(PAYMENT_LINK_EXPIRED_EMAIL, messages) == [
+        False,
+        False,
+    ]
+    assert register_email_templates() == 2
+    assert register_email_templates() == 0
+    assert send_bulk_templated_email(PAYMENT_LINK_EXPIRED_EMAIL, messages) == [
+        True,
+        True,
+    ]
+
+    sent = backend.sent_emails()
+    assert [email["ToAddresses"] for email in sent] == [
+        ["jane@example.com"],
+        ["john@example.com"],
+    ]
+    assert sent[1]["Subject"] == PAYMENT_LINK_EXPIRED_EMAIL.subject
+    assert sent[1]["Body"].startswith("Dear John Doe,")
+    assert "(CAS2)" in sent[1]["Body"]
+    assert backend.calls["ses.SendBulkTemplatedEmail"] == 2
+
+
+def test_templated_emails_are_the_same_from_jinja_and_ses(app, backend):
+    register_email_templates()
+    data = {
+        "name": "Pat O'Brien",
+        "case_number": "CAS<1>",
+        "amount": "111.66",
+        "payment_url": 'https://example.com/pay?id=1&ref="2"',
+    }
+
+    for mode in ("jinja", "ses"):
+        app.config["EMAIL_TEMPLATE_MODE"] = mode
+        assert send_templated_email("jane@example.com", PAYMENT_LINK_EMAIL, data)
+
+    jinja_email, ses_email = backend.sent_emails()
+    assert ses_email["Body"] == jinja_email["Body"]
+    assert "Dear Pat O'Brien," in ses_email["Body"]
+    assert 'https://example.com/pay?id=1&ref="2"' in ses_email["Body"]
+
+
+def test_injected_errors_are_retried_then_raised(app, tmp_path):
+    app.config.update(FAKE_AWS_ERROR_RATE=1.0, AWS_MAX_ATTEMPTS=2)
+    backend = get_fake_aws_backend(str(tmp_path), 0.0, 1.0)
+    spool_path = tmp_path / "spooled.pdf"
+    spool_path.write_bytes(b"%PDF-1.4")
+
+    with patch("botocore.endpoint.time.sleep"):
+        with pytest.raises(ClientError, match="SlowDown"):
+            upload_spooled_proof_of_death(str(spool_path), "holding/spooled.pdf")
+        assert not send_templated_email(
+            "jane@example.com",
+            PAYMENT_LINK_EXPIRED_EMAIL,
+            {"name": "Jane Doe", "case_number": "CAS1"},
+        )
+
+    assert backend.calls["s3.PutObject"] == 2
+    assert backend.calls["ses.SendEmail"] == 2
+    assert backend.list_keys(BUCKET_NAME) == []
+    assert email_metrics()["throttled"] == 1
+
+
+def test_injected_latency_delays_each_request(app, tmp_path):
+    app.config["FAKE_AWS_LATENCY"] = 0.25
+
+    with patch("app.lib.fake_aws.time.sleep") as mock_sleep:
+        get_client("s3").put_object(Bucket=BUCKET_NAME, Key="holding/a.pdf", Body=b"a")
+
+    mock_sleep.assert_called_once_with(0.25)
@@ -3,7 +3,9 @@ from unittest.mock import MagicMock, patch
 import pytest
 
 from app import create_app
+from app.lib.cache import cache
 from app.lib.gov_uk_pay import (
+    PAYMENT_LOCK_KEY,
     GOVUKPayAPIClient,
     create_payment,
 )
@@ -16,7 +18,7 @@ def test_app():
         yield app
 
 
-@patch("app.lib.gov_uk_pay.requests.post")
+@patch("app.lib.gov_uk_pay.http_client.post")
 def test_create_payment_success(mock_post, test_app):
     mock_response = MagicMock()
     mock_response.json.return_value = {
@@ -32,7 +34,7 @@ def test_create_payment_success(mock_post, test_app):
         assert result["_links"]["next_url"]["href"] == "http://pay"
 
 
-@patch("app.lib.gov_uk_pay.requests.post")
+@patch("app.lib.gov_uk_pay.http_client.post")
 def test_create_payment_failure(mock_post, test_app):
     mock_response = MagicMock()
     mock_response.raise_for_status.side_effect = Exception("fail")
@@ -62,3 +64,87 @@ def test_govuk_pay_client_payment_status_none(test_app):
         client = GOVUKPayAPIClient()
         client.data = {"state": {"status": None}}
         assert client.is_payment_successful() is False
+
+
+@pytest.fixture
+def cached_app():
+    app = create_app("config.Test")
+    app.config.update(
+        GOV_UK_PAY_STATUS_CACHE_ENABLED=True,
+        GOV_UK_PAY_UNFINISHED_STATUS_CACHE_TIMEOUT=3,
+        GOV_UK_PAY_FINISHED_STATUS_CACHE_TIMEOUT=86400,
+        GOV_UK_PAY_STATUS_WAIT_TIMEOUT=0.2,
+    )
+    with app.app_context():
+        cache.clear()
+        yield app
+
+
+@patch.object(GOVUKPayAPIClient, "get")
+def test_get_payment_is_cached(mock_get, cached_app):
+    mock_get.return_value = {"state": {"status": "success"}}
+
+    assert GOVUKPayAPIClient().get_payment("abc123") == mock_get.return_value
+    client = GOVUKPayAPIClient()
+    client.get_payment("abc123")
+
+    assert client.is_payment_successful() is True
+    mock_get.assert_called_once_with(path="/abc123")
+
+
+@pytest.mark.parametrize(
+    "status, timeout",
+    [("created", 3), ("started", 3), ("success", 86400), ("cancelled", 86400)],
+)
+@patch.object(GOVUKPayAPIClient, "get")
+def test_get_payment_cache_timeout_depends_on_status(
+    mock_get, status, timeout, cached_app
+):
+    mock_get.return_value = {"state": {"status": status}}
+
+    with patch.object(cache, "set") as mock_set:
+        GOVUKPayAPIClient().get_payment("abc123")
+
+    assert mock_set.call_args.kwargs["timeout"] == timeout
+
+
+@patch.object(GOVUKPayAPIClient, "get")
+def test_get_payment_waits_for_concurrent_lookup(mock_get, cached_app):
+    cache.add(PAYMENT_LOCK_KEY.format("abc123"), True, timeout=60)
+
+    with patch.object(
+        cache, "get", side_effect=[None, {"state": {"status": "started"}}]
+    ):
+        data = GOVUKPayAPIClient().get_payment("abc123")
+
+    assert data == {"state": {"status": "started"}}
+    mock_get.assert_not_called()
+
+
+@patch.object(GOVUKPayAPIClient, "get")
+def test_get_payment_fetches_after_waiting_too_long(mock_get, cached_app):
+    mock_get.return_value = {"state": {"status": "started"}}
+    cache.add(PAYMENT_LOCK_KEY.format("abc123"), True, timeout=60)
+
+    assert GOVUKPayAPIClient().get_payment("abc123") == mock_get.return_value
+    mock_get.assert_called_once()
+    assert cache.get(PAYMENT_LOCK_KEY.format("abc123")) is True
+
+
+@patch.object(GOVUKPayAPIClient, "get")
+def test_get_payment_releases_its_lock(mock_get, cached_app):
+    mock_get.return_value = {"state": {"status": "started"}}
+
+    GOVUKPayAPIClient().get_payment("abc123")
+
+    assert cache.get(PAYMENT_LOCK_KEY.format("abc123")) is None
+
+
+@patch.object(GOVUKPayAPIClient, "get")
+def test_get_payment_is_not_cached_when_disabled(mock_get, test_app):
+    mock_get.return_value = {"state": {"status": "success"}}
+
+    GOVUKPayAPIClient().get_payment("abc123")
+    GOVUKPayAPIClient().get_payment("abc123")
+
+    assert mock_get.call_count == 2
@@ -0,0 +1,153 @@
+from datetime import date, datetime
+
+import pytest
+import sqlalchemy as sa
+
+from app.lib.db.migrations import (
+    current_revision,
+    downgrade,
+    head_revision,
+    migrations,
+    upgrade,
+)
+from app.lib.db.models import db
+
+
+@pytest.fixture()
+def engine(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+def _payment(reference: str) -> dict:
+    return {
+        "id": reference,
+        "case_number": "CASE123",
+        "reference": reference,
+        "net_amount": 1000,
+        "total_amount": 1000,
+        "payee_email": "jane@example.com",
+        "status": "N",
+    }
+
+
+def _insert_payments(engine, *references):
+    with engine.begin() as connection:
+        connection.execute(
+            db.metadata.tables["dynamics_payments"].insert(),
+            [_payment(reference) for reference in references],
+        )
+
+
+def test_migrations_match_the_models(engine):
+    assert upgrade(engine) == [migration.revision for migration in migrations()]
+    assert current_revision(engine) == head_revision()
+
+    inspector = sa.inspect(engine)
+    for table in db.metadata.sorted_tables:
+        assert {column["name"] for column in inspector.get_columns(table.name)} == {
+            column.name for column in table.columns
+        }
+        assert {index["name"] for index in inspector.get_indexes(table.name)} >= {
+            index.name for index in table.indexes
+        }
+
+
+def test_upgrade_only_applies_new_migrations(engine):
+    upgrade(engine, 1)
+
+    assert current_revision(engine) == 1
+    assert upgrade(engine) == list(range(2, head_revision() + 1))
+    assert upgrade(engine) == []
+
+
+def test_downgrade_reverts_migrations_after_the_revision(engine):
+    upgrade(engine)
+
+    assert downgrade(engine, 1) == list(range(head_revision(), 1, -1))
+    assert current_revision(engine) == 1
+    assert "uq_dynamics_payments_reference" not in {
+        index["name"] for index in sa.inspect(engine).get_indexes("dynamics_payments")
+    }
+
+    downgrade(engine, 0)
+    assert sa.inspect(engine).get_table_names() == ["schema_migrations"]
+
+
+def test_upgrade_adopts_tables_created_without_migrations(engine):
+    migrations()[0].module.metadata.create_all(engine)
+    _insert_payments(engine, "REF-1")
+
+    assert upgrade(engine) == list(range(1, head_revision() + 1))
+    with engine.connect() as connection:
+        assert connection.scalar(sa.text("SELECT count(*) FROM dynamics_payments")) == 1
+
+
+def test_duplicate_references_are_rejected(engine):
+    upgrade(engine)
+    _insert_payments(engine, "REF-1")
+
+    with pytest.raises(sa.exc.IntegrityError):
+        _insert_payments(engine, "REF-1")
+
+
+def test_unique_reference_migration_fails_on_existing_duplicates(engine):
+    upgrade(engine, 1)
+    _insert_payments(engine, "REF-1")
+    with engine.begin() as connection:
+        connection.execute(
+            db.metadata.tables["dynamics_payments"].insert(),
+            {**_payment("REF-1"), "id": "other"},
+        )
+
+    with pytest.raises(RuntimeError, match="REF-1"):
+        upgrade(engine)
+    assert current_revision(engine) == 1
+
+
+def test_request_dates_and_amounts_are_converted(engine):
+    upgrade(engine, 2)
+    with engine.begin() as connection:
+        connection.execute(
+            sa.text(
+                "INSERT INTO service_record_requests"
+                " (id, record_hash, status, date_of_birth, payment_date, amount_received)"
+                " VALUES ('record-1', 'hash-1', 'P', '01 January 1950', '15 March 2024', '42.25')"
+            )
+        )
+
+    upgrade(engine, 3)
+    with engine.connect() as connection:
+        record = connection.execute(
+            db.metadata.tables["service_record_requests"].select()
+        ).one()
+    assert record.date_of_birth == date(1950, 1, 1)
+    assert record.date_of_death is None
+    assert record.payment_date == datetime(2024, 3, 15)
+    assert record.amount_received == 4225
+
+    downgrade(engine, 2)
+    with engine.connect() as connection:
+        record = connection.execute(
+            sa.text(
+                "SELECT date_of_birth, payment_date, amount_received"
+                " FROM service_record_requests"
+            )
+        ).one()
+    assert tuple(record) == ("01 January 1950", "15 March 2024", "42.25")
+
+
+def test_request_conversion_stops_on_unparseable_values(engine):
+    upgrade(engine, 2)
+    with engine.begin() as connection:
+        connection.execute(
+            sa.text(
+                "INSERT INTO service_record_requests (id, record_hash, status, date_of_birth)"
+                " VALUES ('record-1', 'hash-1', 'N', 'not a date')"
+            )
+        )
+
+    with pytest.raises(RuntimeError, match="record-1"):
+        upgrade(engine)
+    assert current_revision(engine) == 2
@@ -4,6 +4,7 @@ import pytest
 from flask import session
 
 from app import create_app
+from app.lib.db.db_handler import DuplicateDynamicsPaymentError
 from app.main.routes.shared_payment_routes import handle_gov_uk_pay_response
 
 
@@ -36,17 +37,11 @@ def client(app):
     return app.test_client()
 
 
-@patch("app.main.routes.dynamics_payment_routes.db")
-@patch("app.main.routes.dynamics_payment_routes.send_email")
+@patch("app.main.routes.dynamics_payment_routes.send_templated_email")
 @patch("app.main.routes.dynamics_payment_routes.add_dynamics_payment")
-def test_payment_creation_endpoint(
-    mock_add_payment, mock_send_email, mock_db, client, app
-):
+def test_payment_creation_endpoint(mock_add_payment, mock_send_email, client, app):
     # Mock the payment creation to avoid real DB usage
     mock_add_payment.return_value = DummyPayment()
-    mock_db.session.commit.return_value = None
-    # Mock the query to check for existing payment - should return None for new payment
-    mock_db.session.query.return_value.filter_by.return_value.first.return_value = None
     mock_send_email.return_value = True
 
     rv = client.post(
@@ -69,6 +64,28 @@ def test_payment_creation_endpoint(
     assert "TEST-ID" in data["message"]
 
 
+@patch("app.main.routes.dynamics_payment_routes.send_templated_email")
+@patch("app.main.routes.dynamics_payment_routes.add_dynamics_payment")
+def test_payment_creation_endpoint_rejects_duplicate_reference(
+    mock_add_payment, mock_send_email, client, app
+):
+    mock_add_payment.side_effect = DuplicateDynamicsPaymentError("PAY-0125-33-123")
+
+    rv = client.post(
+        f"{app.config.get('SERVICE_URL_PREFIX')}/create-payment/",
+        json={
+            "case_number": "CAS123",
+            "net_amount": 75.00,
+            "reference": "PAY-0125-33-123",
+            "payee_email": "john.doe@gmail.com",
+        },
+    )
+
+    assert rv.status_code == 500
+    assert "already exists" in rv.get_json()["error"]
+    mock_send_email.assert_not_called()
+
+
 @patch("app.main.routes.dynamics_payment_routes.get_dynamics_payment")
 def test_make_payment_page_renders(mock_get_payment, client, app):
     dummy = DummyPayment()
@@ -0,0 +1,190 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app import create_app
+from app.lib import aws
+from app.lib.db.constants import NEW_STATUS, PAID_STATUS, SENT_STATUS
+from app.lib.db.models import ArchivedServiceRecordRequest, ServiceRecordRequest, db
+from app.lib.gov_uk_pay import send_paid_request
+from promote_proofs_of_death import promote_proofs_of_death
+
+
+@pytest.fixture(scope="module")
+def app():
+    app = create_app("config.Test")
+    app.config.update(
+        PROOF_OF_DEATH_BUCKET_NAME="proof-bucket",
+        PROOF_OF_DEATH_HOLDING_PREFIX="holding/",
+        PROOF_OF_DEATH_SUBMITTED_PREFIX="submitted/",
+        PERMANENT_SESSION_LIFETIME=86400,
+    )
+    return app
+
+
+@pytest.fixture()
+def db_session(app):
+    with app.app_context():
+        db.create_all()
+        yield db.session
+        db.session.rollback()
+        for model in (ArchivedServiceRecordRequest, ServiceRecordRequest):
+            db.session.query(model).delete()
+        db.session.commit()
+
+
+@pytest.fixture()
+def s3():
+    s3 = MagicMock()
+    s3.delete_objects.return_value = {}
+    with (
+        patch("app.lib.aws.get_client", return_value=s3),
+        patch("promote_proofs_of_death.get_client", return_value=s3),
+    ):
+        yield s3
+
+
+def _object(key: str, hours_ago: int) -> dict:
+    return {
+        "Key": key,
+        "LastModified": datetime.now(timezone.utc) - timedelta(hours=hours_ago),
+    }
+
+
+def _request(id: str, status: str, proof_of_death: str) -> ServiceRecordRequest:
+    return ServiceRecordRequest(
+        id=id,
+        record_hash=f"hash-{id}",
+        requester_email="jane@example.com",
+        status=status,
+        proof_of_death=proof_of_death,
+    )
+
+
+def _deleted_keys(s3) -> list[str]:
+    return [
+        obj["Key"]
+        for call in s3.delete_objects.call_args_list
+        for obj in call.kwargs["Delete"]["Objects"]
+    ]
+
+
+def test_paid_proofs_of_death_are_promoted_and_old_orphans_purged(db_session, s3):
+    db_session.add_all(
+        [
+            _request("paid", PAID_STATUS, "paid.pdf"),
+            _request("sent", SENT_STATUS, "sent.png"),
+            _request("new", NEW_STATUS, "new.pdf"),
+        ]
+    )
+    db_session.commit()
+    s3.get_paginator.return_value.paginate.return_value = [
+        {"Contents": [_object("holding/paid.pdf", 1), _object("holding/new.pdf", 1)]},
+        {
+            "Contents": [
+                _object("holding/sent.png", 48),
+                _object("holding/abandoned.pdf", 48),
+                _object("holding/upload-id/direct.pdf", 48),
+            ]
+        },
+    ]
+
+    counts = promote_proofs_of_death()
+
+    s3.get_paginator.assert_called_once_with("list_objects_v2")
+    s3.get_paginator.return_value.paginate.assert_called_once_with(
+        Bucket="proof-bucket", Prefix="holding/"
+    )
+    assert sorted(call.kwargs["Key"] for call in s3.copy_object.call_args_list) == [
+        "submitted/paid.pdf",
+        "submitted/sent.png",
+    ]
+    assert sorted(_deleted_keys(s3)) == [
+        "holding/abandoned.pdf",
+        "holding/paid.pdf",
+        "holding/sent.png",
+        "holding/upload-id/direct.pdf",
+    ]
+    assert {key: counts[key] for key in counts if key != "seconds"} == {
+        "listed": 5,
+        "promoted": 2,
+        "purged": 2,
+        "kept": 1,
+        "failed": 0,
+    }
+
+
+def test_archived_requests_are_promoted(db_session, s3):
+    db_session.add(
+        ArchivedServiceRecordRequest(
+            id="archived",
+            record_hash="hash-archived",
+            status=SENT_STATUS,
+            proof_of_death="archived.pdf",
+            archived_at=datetime.now(),
+        )
+    )
+    db_session.commit()
+    s3.get_paginator.return_value.paginate.return_value = [
+        {"Contents": [_object("holding/archived.pdf", 48)]}
+    ]
+
+    assert promote_proofs_of_death()["promoted"] == 1
+    s3.copy_object.assert_called_once_with(
+        Bucket="proof-bucket",
+        Key="submitted/archived.pdf",
+        CopySource={"Bucket": "proof-bucket", "Key": "holding/archived.pdf"},
+    )
+
+
+def test_failed_copies_are_left_in_holding(db_session, s3):
+    db_session.add(_request("paid", PAID_STATUS, "paid.pdf"))
+    db_session.commit()
+    s3.get_paginator.return_value.paginate.return_value = [
+        {"Contents": [_object("holding/paid.pdf", 1)]}
+    ]
+    s3.copy_object.side_effect = ConnectionError("S3 is down")
+
+    counts = promote_proofs_of_death()
+
+    assert counts["promoted"] == 0
+    assert counts["failed"] == 1
+    assert _deleted_keys(s3) == []
+
+
+def test_delete_s3_objects_deletes_up_to_1000_at_a_time(app, s3):
+    keys = [f"holding/{i}.pdf" for i in range(2500)]
+    s3.delete_objects.side_effect = [
+        {},
+        {"Errors": [{"Key": "holding/1500.pdf", "Message": "Access Denied"}]},
+        {},
+    ]
+
+    with app.app_context():
+        failed = aws.delete_s3_objects("proof-bucket", keys)
+
+    assert [
+        len(call.kwargs["Delete"]["Objects"])
+        for call in s3.delete_objects.call_args_list
+    ] == [1000, 1000, 500]
+    assert failed == ["holding/1500.pdf"]
+
+
+def test_batch_promotion_leaves_moving_to_the_job(app, db_session):
+    record = _request("paid", PAID_STATUS, "paid.pdf")
+    db_session.add(record)
+    db_session.commit()
+    app.config["PROOF_OF_DEATH_BATCH_PROMOTION"] = True
+
+    try:
+        with (
+            patch("app.lib.gov_uk_pay.move_proof_of_death_to_submitted") as mock_move,
+            patch("app.lib.gov_uk_pay.send_request_to_dynamics", return_value=True),
+        ):
+            assert send_paid_request(record)
+    finally:
+        app.config["PROOF_OF_DEATH_BATCH_PROMOTION"] = False
+
+    mock_move.assert_not_called()
+    assert record.status == SENT_STATUS
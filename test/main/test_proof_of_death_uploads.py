@@ -0,0 +1,199 @@
+import io
+import os
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app import create_app
+from app.lib.db.constants import (
+    COMPLETED_JOB_STATUS,
+    COMPLETED_UPLOAD_STATUS,
+    FAILED_UPLOAD_STATUS,
+    PAID_STATUS,
+    PENDING_UPLOAD_STATUS,
+    QUEUED_JOB_STATUS,
+    SENT_STATUS,
+)
+from app.lib.db.models import (
+    BackgroundJob,
+    ProofOfDeathUpload,
+    ServiceRecordRequest,
+    db,
+)
+from app.lib.dynamics_handler import DynamicsClosureStatus
+from app.lib.gov_uk_pay import SEND_PAID_REQUEST_JOB
+from app.lib.jobs import enqueue_job, run_pending_jobs
+from app.lib.proof_of_death_uploads import (
+    UPLOAD_PROOF_OF_DEATH_JOB,
+    spool_proof_of_death,
+    start_upload,
+)
+
+
+@pytest.fixture(scope="module")
+def app():
+    return create_app("config.Test")
+
+
+@pytest.fixture()
+def db_session(app, tmp_path):
+    app.config["PROOF_OF_DEATH_SPOOL_DIR"] = str(tmp_path)
+    with app.app_context():
+        db.create_all()
+        yield db.session
+        db.session.rollback()
+        for model in (BackgroundJob, ProofOfDeathUpload, ServiceRecordRequest):
+            db.session.query(model).delete()
+        db.session.commit()
+
+
+def _file(content: bytes = b"%PDF-1.4") -> FileStorage:
+    return FileStorage(stream=io.BytesIO(content), filename="certificate.pdf")
+
+
+def _spool(content: bytes = b"%PDF-1.4") -> str:
+    with patch("app.lib.proof_of_death_uploads.start_upload"):
+        return spool_proof_of_death(_file(content))
+
+
+def test_spool_proof_of_death_saves_the_file_and_queues_its_upload(db_session):
+    with patch("app.lib.proof_of_death_uploads.start_upload") as mock_start:
+        key_name = spool_proof_of_death(_file())
+
+    filename = os.path.basename(key_name)
+    assert key_name == f"holding/{filename}"
+    assert filename.endswith(".pdf")
+    upload = db_session.get(ProofOfDeathUpload, filename)
+    assert upload.status == PENDING_UPLOAD_STATUS
+    with open(upload.spool_path, "rb") as spooled:
+        assert spooled.read() == b"%PDF-1.4"
+    job = db_session.query(BackgroundJob).one()
+    assert job.job_type == UPLOAD_PROOF_OF_DEATH_JOB
+    assert job.payload == {"filename": filename, "key_name": key_name}
+    mock_start.assert_called_once_with(job.id)
+
+
+def test_spool_proof_of_death_rejects_empty_files(db_session, tmp_path):
+    assert _spool(b"") is None
+    assert db_session.query(ProofOfDeathUpload).count() == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_upload_job_uploads_the_spooled_file(db_session):
+    key_name = _spool()
+    filename = os.path.basename(key_name)
+    spool_path = db_session.get(ProofOfDeathUpload, filename).spool_path
+
+    with patch(
+        "app.lib.proof_of_death_uploads.upload_spooled_proof_of_death",
+        return_value=True,
+    ) as mock_upload:
+        assert run_pending_jobs() == 1
+
+    mock_upload.assert_called_once_with(spool_path, key_name)
+    upload = db_session.get(ProofOfDeathUpload, filename)
+    assert upload.status == COMPLETED_UPLOAD_STATUS
+    assert upload.uploaded_at is not None
+    assert not os.path.exists(spool_path)
+
+
+def test_upload_job_records_failures_until_the_last_attempt(app, db_session):
+    filename = os.path.basename(_spool())
+    app.config["BACKGROUND_JOB_MAX_ATTEMPTS"] = 2
+
+    try:
+        with patch(
+            "app.lib.proof_of_death_uploads.upload_spooled_proof_of_death",
+            side_effect=ConnectionError("S3 is down"),
+        ):
+            run_pending_jobs()
+            upload = db_session.get(ProofOfDeathUpload, filename)
+            assert upload.status == PENDING_UPLOAD_STATUS
+            assert upload.last_error == "ConnectionError: S3 is down"
+
+            job = db_session.query(BackgroundJob).one()
+            job.next_attempt_at = job.created_at
+            db_session.commit()
+            run_pending_jobs()
+    finally:
+        app.config["BACKGROUND_JOB_MAX_ATTEMPTS"] = 10
+
+    upload = db_session.get(ProofOfDeathUpload, filename)
+    assert upload.status == FAILED_UPLOAD_STATUS
+    assert upload.attempts == 2
+
+
+def test_start_upload_runs_the_job_in_a_thread(db_session):
+    filename = os.path.basename(_spool())
+    job = db_session.query(BackgroundJob).one()
+
+    start_upload(job.id).result(timeout=10)
+
+    db_session.expire_all()
+    assert db_session.get(BackgroundJob, job.id).status == COMPLETED_JOB_STATUS
+    assert (
+        db_session.get(ProofOfDeathUpload, filename).status == COMPLETED_UPLOAD_STATUS
+    )
+
+
+def test_paid_request_waits_for_its_proof_of_death_to_upload(db_session):
+    filename = os.path.basename(_spool())
+    db_session.add(
+        ServiceRecordRequest(
+            id="record-1",
+            record_hash="hash-1",
+            requester_email="jane@example.com",
+            proof_of_death=filename,
+            status=PAID_STATUS,
+        )
+    )
+    request_job = enqueue_job(SEND_PAID_REQUEST_JOB, id="record-1")
+    db_session.commit()
+
+    with patch(
+        "app.lib.gov_uk_pay.send_request_to_dynamics", return_value=True
+    ) as mock_send:
+        run_pending_jobs(job_types=[SEND_PAID_REQUEST_JOB])
+        mock_send.assert_not_called()
+        request_job = db_session.get(BackgroundJob, request_job.id)
+        assert request_job.status == QUEUED_JOB_STATUS
+        assert "has not been uploaded yet" in request_job.last_error
+
+        run_pending_jobs(job_types=[UPLOAD_PROOF_OF_DEATH_JOB])
+        request_job.next_attempt_at = request_job.created_at
+        db_session.commit()
+        run_pending_jobs(job_types=[SEND_PAID_REQUEST_JOB])
+
+    mock_send.assert_called_once()
+    assert db_session.get(ServiceRecordRequest, "record-1").status == SENT_STATUS
+
+
+def test_paid_request_is_sent_without_a_proof_of_death_which_failed_to_upload(
+    db_session,
+):
+    filename = os.path.basename(_spool())
+    db_session.get(ProofOfDeathUpload, filename).status = FAILED_UPLOAD_STATUS
+    db_session.add(
+        ServiceRecordRequest(
+            id="record-1",
+            record_hash="hash-1",
+            requester_email="jane@example.com",
+            date_of_birth=date(1950, 1, 1),
+            proof_of_death=filename,
+            status=PAID_STATUS,
+        )
+    )
+    enqueue_job(SEND_PAID_REQUEST_JOB, id="record-1")
+    db_session.commit()
+
+    with patch("app.lib.dynamics_handler.send_email", return_value=True) as mock_send:
+        run_pending_jobs(job_types=[SEND_PAID_REQUEST_JOB])
+
+    subject = mock_send.call_args.kwargs["subject"]
+    assert DynamicsClosureStatus.FOICDN in subject
+    assert filename not in mock_send.call_args.kwargs["body"]
+    record = db_session.get(ServiceRecordRequest, "record-1")
+    assert record.status == SENT_STATUS
+    assert record.proof_of_death == "EMPTY"
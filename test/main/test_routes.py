@@ -1,4 +1,5 @@
 import unittest
+from unittest.mock import patch
 
 from app import create_app
 
@@ -8,6 +9,9 @@ class MainBlueprintTestCase(unittest.TestCase):
         self.app = create_app("config.Test")
         self.client = self.app.test_client()
         self.domain = "http://localhost"
+        self.upload_url = (
+            f"{self.app.config.get('SERVICE_URL_PREFIX')}/upload-a-proof-of-death/"
+        )
 
     def test_healthcheck_live(self):
         rv = self.client.get("/healthcheck/live/")
@@ -35,3 +39,50 @@ class MainBlueprintTestCase(unittest.TestCase):
         self.assertIn(
             '<h1 class="tna-heading-xl">Request a military service record</h1>', rv.text
         )
+
+    def test_upload_a_proof_of_death_direct_mode_renders_s3_upload_form(self):
+        self.app.config["PROOF_OF_DEATH_UPLOAD_MODE"] = "direct"
+        with self.client.session_transaction(self.upload_url) as session:
+            session["entered_through_index_page"] = True
+
+        rv = self.client.get(self.upload_url)
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertIn('name="success_action_redirect"', rv.text)
+        self.assertIn('name="file"', rv.text)
+        with self.client.session_transaction(self.upload_url) as session:
+            self.assertTrue(
+                session["proof_of_death_upload_prefix"].startswith("holding/")
+            )
+
+    def test_upload_a_proof_of_death_direct_mode_continues_after_upload(self):
+        self.app.config["PROOF_OF_DEATH_UPLOAD_MODE"] = "direct"
+        with self.client.session_transaction(self.upload_url) as session:
+            session["entered_through_index_page"] = True
+            session["proof_of_death_upload_prefix"] = "holding/upload-id/"
+
+        rv = self.client.get(
+            f"{self.upload_url}?bucket=proof-bucket&key=holding/upload-id/proof.pdf&etag=abc"
+        )
+
+        self.assertEqual(rv.status_code, 302)
+        self.assertIn("service-person-details", rv.location)
+        with self.client.session_transaction(self.upload_url) as session:
+            self.assertEqual(session["form_data"]["proof_of_death"], "upload-id.pdf")
+
+    def test_upload_a_proof_of_death_direct_mode_rejects_another_upload_key(self):
+        self.app.config["PROOF_OF_DEATH_UPLOAD_MODE"] = "direct"
+        with self.client.session_transaction(self.upload_url) as session:
+            session["entered_through_index_page"] = True
+            session["proof_of_death_upload_prefix"] = "holding/upload-id/"
+
+        with patch(
+            "app.lib.state_machine.state_machine.verify_proof_of_death_upload"
+        ) as mock_verify:
+            rv = self.client.get(
+                f"{self.upload_url}?key=holding/someone-else/proof.pdf"
+            )
+
+        self.assertEqual(rv.status_code, 200)
+        self.assertIn("could not be uploaded", rv.text)
+        mock_verify.assert_not_called()
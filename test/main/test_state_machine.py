@@ -4,7 +4,7 @@ from types import SimpleNamespace
 from unittest.mock import patch
 
 import pytest
-from flask import session
+from flask import current_app, session
 
 from app import create_app
 from app.constants import MultiPageFormRoutes
@@ -413,6 +413,45 @@ def test_continue_from_upload_a_proof_of_death_where_upload_proof_of_death_retur
     mock_upload.assert_called_once_with(file="an-uploaded-file-object")
 
 
+# In direct upload mode the browser uploads the file straight to S3, so the form holds its key
+# rather than a file, and the upload is verified instead of uploaded.
+@patch(
+    "app.lib.state_machine.state_machine.verify_proof_of_death_upload",
+    return_value="holding/upload-id.pdf",
+)
+@patch("app.lib.state_machine.state_machine.upload_proof_of_death")
+def test_continue_from_upload_a_proof_of_death_where_file_was_uploaded_directly_to_s3(
+    mock_upload, mock_verify, monkeypatch
+):
+    monkeypatch.setitem(current_app.config, "PROOF_OF_DEATH_UPLOAD_MODE", "direct")
+    form = make_form(proof_of_death="holding/upload-id/proof.pdf")
+    sm = RoutingStateMachine()
+    sm.continue_from_upload_a_proof_of_death_form(form=form)
+    assert sm.current_state.id == "service_person_details_form"
+    mock_verify.assert_called_once_with("holding/upload-id/proof.pdf")
+    mock_upload.assert_not_called()
+
+
+# In background upload mode the file is saved to disk to be uploaded later, and the journey
+# continues with the key it will be uploaded as.
+@patch(
+    "app.lib.state_machine.state_machine.spool_proof_of_death",
+    return_value="holding/spooled.pdf",
+)
+@patch("app.lib.state_machine.state_machine.upload_proof_of_death")
+def test_continue_from_upload_a_proof_of_death_in_background_mode_spools_the_file(
+    mock_upload, mock_spool, monkeypatch
+):
+    monkeypatch.setitem(current_app.config, "PROOF_OF_DEATH_UPLOAD_MODE", "background")
+    form = make_form(proof_of_death="an-uploaded-file-object")
+    sm = RoutingStateMachine()
+    sm.continue_from_upload_a_proof_of_death_form(form=form)
+    assert sm.current_state.id == "service_person_details_form"
+    assert form.proof_of_death.data == "spooled.pdf"
+    mock_spool.assert_called_once_with("an-uploaded-file-object")
+    mock_upload.assert_not_called()
+
+
 # In this case we are again testing sm.continue_from_upload_a_proof_of_death_form but there is no
 # need to mock upload_proof_of_death as the form's proof_of_death field is None, simulating
 # the user not uploading a file (e.g. they submitted the form without selecting a file).
@@ -0,0 +1,132 @@
+import itertools
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from flask import session
+from statemachine.exceptions import TransitionNotAllowed
+
+from app import create_app
+from app.lib.db.constants import EXPIRED_STATUS, NEW_STATUS, PAID_STATUS
+from app.lib.state_machine.state_machine import RoutingStateMachine
+from app.lib.state_machine.transition_table import (
+    TRANSITION_TABLE,
+    RoutingStateCursor,
+)
+
+
+@pytest.fixture(autouse=True)
+def app_context():
+    app = create_app("config.Test")
+    with app.test_request_context():
+        yield
+
+
+def _field(value):
+    return SimpleNamespace(data=value)
+
+
+def _form(**data):
+    fields = {
+        "is_service_person_alive": "no",
+        "service_branch": "BRITISH_ARMY",
+        "were_they_a_commissioned_officer": "no",
+        "date_of_birth": date(1900, 1, 1),
+        "does_not_have_email": False,
+        "do_you_have_a_proof_of_death": "yes",
+        "are_you_sure_you_want_to_proceed_without_proof_of_death": "no",
+        "proof_of_death": None,
+    } | data
+    return SimpleNamespace(**{name: _field(value) for name, value in fields.items()})
+
+
+def _forms():
+    """Vary each group of fields that the guards combine, holding the rest at a default."""
+    for alive, branch, officer in itertools.product(
+        ["yes", "no"],
+        [
+            "ROYAL_NAVY",
+            "HOME_GUARD",
+            "BRITISH_ARMY",
+            "ROYAL_AIR_FORCE",
+            "OTHER",
+            "UNKNOWN",
+        ],
+        ["yes", "no"],
+    ):
+        yield _form(
+            is_service_person_alive=alive,
+            service_branch=branch,
+            were_they_a_commissioned_officer=officer,
+        )
+    for birth_year in [1900, 1935, 1990]:
+        yield _form(date_of_birth=date(birth_year, 1, 1))
+    for no_email in [True, False]:
+        yield _form(does_not_have_email=no_email)
+    for has_proof, proceed, proof_of_death in itertools.product(
+        ["yes", "no"], ["yes", "no"], [None, "proof.pdf"]
+    ):
+        yield _form(
+            do_you_have_a_proof_of_death=has_proof,
+            are_you_sure_you_want_to_proceed_without_proof_of_death=proceed,
+            proof_of_death=proof_of_death,
+        )
+
+
+def _outcome(machine, event, *args):
+    try:
+        getattr(machine, event)(*args)
+    except TransitionNotAllowed:
+        return "not allowed"
+    return machine.route_for_current_state
+
+
+@pytest.mark.parametrize("event", sorted(TRANSITION_TABLE))
+@patch(
+    "app.lib.state_machine.state_machine.upload_proof_of_death",
+    return_value="proof.pdf",
+)
+def test_cursor_routes_every_form_like_the_state_machine(mock_upload, event):
+    for form in _forms():
+        expected = _outcome(RoutingStateMachine(), event, form)
+        assert (
+            _outcome(RoutingStateCursor(), event, form) == expected
+        ), f"{event} routed differently for {vars(form)}"
+
+
+@pytest.mark.parametrize(
+    "payment_status", [None, NEW_STATUS, PAID_STATUS, EXPIRED_STATUS]
+)
+def test_cursor_routes_second_payment_links_like_the_state_machine(payment_status):
+    session["payment_status"] = payment_status
+
+    assert _outcome(
+        RoutingStateCursor(), "continue_from_initial_second_payment_link"
+    ) == _outcome(RoutingStateMachine(), "continue_from_initial_second_payment_link")
+
+
+def test_cursor_follows_transitions_from_states_other_than_initial():
+    session["payment_status"] = NEW_STATUS
+    machine = RoutingStateMachine()
+    cursor = RoutingStateCursor()
+
+    for sm in (machine, cursor):
+        sm.continue_from_initial_second_payment_link()
+        sm.continue_from_complete_your_payment_page()
+
+    assert cursor.current_state_id == machine.current_state.id
+    assert cursor.route_for_current_state == machine.route_for_current_state
+
+
+def test_cursor_rejects_events_with_no_transition_from_the_current_state():
+    cursor = RoutingStateCursor()
+    cursor.continue_from_start_form()
+
+    with pytest.raises(TransitionNotAllowed):
+        cursor.continue_from_start_form()
+
+
+def test_transition_table_is_read_only():
+    with pytest.raises(TypeError):
+        TRANSITION_TABLE["continue_from_start_form"] = {}